@@ -0,0 +1,148 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional
+
+
+class SQLiteStore:
+    """
+    Armazenamento simples chave -> bytes em um arquivo SQLite local.
+    Pode ser usado por várias threads (uma conexão protegida por lock).
+
+    ttl_seconds: entradas mais antigas que isso são tratadas como ausentes
+    max_entries: ao passar desse número, remove as entradas menos usadas (LRU)
+    evict_every: a limpeza (TTL + LRU) roda a cada N linhas gravadas, não a
+                 cada put; entre limpezas a tabela pode passar de max_entries
+                 em até N linhas
+    """
+
+    def __init__(self, path: str, table: str = "kv",
+                 ttl_seconds: float | None = None, max_entries: int | None = None,
+                 evict_every: int = 1000):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self._since_evict = 0
+        self._lock = threading.Lock()
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dirname, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                created_at REAL NOT NULL DEFAULT 0,
+                accessed_at REAL NOT NULL DEFAULT 0
+            );
+        """)
+        # tabelas criadas antes de existir TTL/LRU não têm as colunas de tempo
+        columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({self.table})")}
+        for col in ("created_at", "accessed_at"):
+            if col not in columns:
+                self._conn.execute(
+                    f"ALTER TABLE {self.table} ADD COLUMN {col} REAL NOT NULL DEFAULT 0"
+                )
+        # o DELETE do TTL e o ORDER BY do LRU usam índice, não varredura da tabela
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_idx ON {self.table} (accessed_at)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_created_idx ON {self.table} (created_at)"
+        )
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Retorna {key: value} apenas para as chaves encontradas (e não expiradas)."""
+        keys = list(keys)
+        found = {}
+        min_created = time.time() - self.ttl_seconds if self.ttl_seconds else None
+        # SQLite limita o número de parâmetros por consulta
+        chunk = 500
+        with self._lock:
+            for i in range(0, len(keys), chunk):
+                part = keys[i:i + chunk]
+                placeholders = ",".join("?" * len(part))
+                query = f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})"
+                params = list(part)
+                if min_created is not None:
+                    query += " AND created_at >= ?"
+                    params.append(min_created)
+                found.update(self._conn.execute(query, params).fetchall())
+
+            # só mantém o horário de acesso quando há limite de tamanho (LRU)
+            if self.max_entries and found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) "
+                f"VALUES (?, ?, ?, ?)",
+                [(k, v, now, now) for k, v in items.items()],
+            )
+            self._since_evict += len(items)
+            if self._since_evict >= self.evict_every:
+                self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, value: bytes) -> None:
+        self.put_many({key: value})
+
+    def _evict(self) -> None:
+        self._since_evict = 0
+        if self.ttl_seconds:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+        if self.max_entries:
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(f"""
+                    DELETE FROM {self.table} WHERE key IN (
+                        SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?
+                    )
+                """, (excess,))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self),
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import time
+import threading
+import unicodedata
+from typing import Callable, Dict, List, Sequence
+
+try:
+    from cache_store import SQLiteStore
+    from vector_index import DEFAULT_INDEX_DIR, VectorIndex
+    from prompt_builder import normalize_verdict
+except ImportError:  # importado como modules.claim_cache
+    from modules.cache_store import SQLiteStore
+    from modules.vector_index import DEFAULT_INDEX_DIR, VectorIndex
+    from modules.prompt_builder import normalize_verdict
+
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "cache", "claims.sqlite"
+)
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+_SLUG = re.compile(r"[^\w.-]+")
+
+
+def normalize_claim(text: str) -> str:
+    """Forma canônica da manchete: sem acentos/pontuação, minúsculas, espaços simples."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _NON_WORD.sub(" ", text.lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+class ClaimCache:
+    """
+    Cache semântico de veredictos: antes de buscar/classificar uma manchete,
+    procura uma manchete já processada igual (após normalização) ou parecida
+    (similaridade >= `threshold` no VectorIndex) e reaproveita o veredicto
+    e os resultados de busca, informando de onde vieram.
+
+    Cada veredicto pertence a uma `source` (mecanismo/teste/modelo, ex.:
+    'google/test1/llama-3.1-8b-instant') e só é reaproveitado por consultas
+    da mesma source: veredictos de outro prompt ou outro modelo não servem.
+    Registros ficam em SQLite (chave = source + manchete normalizada); os
+    embeddings das manchetes ficam num VectorIndex por source, que fica em
+    memória e vai para o disco a cada `save_seconds` (thread própria) e em
+    close(): put_many não regrava o índice inteiro a cada chamada.
+    """
+
+    def __init__(self, embedder, threshold: float = 0.95, path: str = DEFAULT_CACHE_PATH,
+                 index_name: str | None = None, index_dir: str = DEFAULT_INDEX_DIR,
+                 ttl_seconds: float | None = None, save_seconds: float | None = 60.0):
+        """
+        threshold: similaridade mínima para reaproveitar o veredicto de outra manchete
+        index_name: prefixo dos índices de embeddings (padrão: claims__<modelo>);
+                    cada source tem o seu: <prefixo>__<source>
+        ttl_seconds: validade dos veredictos (None = sem expiração)
+        save_seconds: intervalo entre gravações dos índices alterados
+                      (None = só em save()/close())
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.store = SQLiteStore(path, table="claims", ttl_seconds=ttl_seconds)
+        model = getattr(embedder, "model_name", "default").replace("/", "__")
+        self.index_name = index_name or f"claims__{model}"
+        self.index_dir = index_dir
+        self._indexes: Dict[str, VectorIndex] = {}
+        self._lock = threading.Lock()
+        self.save_seconds = save_seconds
+        self._closed = threading.Event()
+        self._saver = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _record_key(source: str, key: str) -> str:
+        return f"{source}|{key}"
+
+    def _index(self, source: str) -> VectorIndex:
+        with self._lock:
+            if source not in self._indexes:
+                self._indexes[source] = VectorIndex(name=f"{self.index_name}__{_SLUG.sub('_', source)}",
+                                                    index_dir=self.index_dir)
+            return self._indexes[source]
+
+    def _load(self, raw: bytes, source: str) -> Dict | None:
+        record = json.loads(raw)
+        return record if record.get("source") == source else None
+
+    # ---- consulta ----
+    def lookup_many(self, headlines: Sequence[str], source: str) -> List[Dict | None]:
+        """
+        Para cada manchete, o registro reaproveitável de `source` ou None. O
+        registro traz verdict, results, source e created_at do original, mais
+        a proveniência: matched_headline, similarity e match ('exact' ou 'semantic').
+        """
+        keys = [normalize_claim(h) for h in headlines]
+        found = self.store.get_many({self._record_key(source, k) for k in keys})
+        out: List[Dict | None] = [None] * len(keys)
+
+        index = self._index(source)
+        pending = []
+        for i, key in enumerate(keys):
+            raw = found.get(self._record_key(source, key))
+            record = self._load(raw, source) if raw is not None else None
+            if record is not None:
+                out[i] = {**record, "similarity": 1.0, "match": "exact"}
+            elif key and len(index):
+                pending.append(i)
+
+        if pending:
+            # uma única codificação para todas as manchetes sem match exato
+            matches = index.search_texts([keys[i] for i in pending], self.embedder, k=1,
+                                         min_score=self.threshold)
+            candidates = {self._record_key(source, m[0][0]) for m in matches if m}
+            records = self.store.get_many(candidates) if candidates else {}
+            for i, match in zip(pending, matches):
+                raw = records.get(self._record_key(source, match[0][0])) if match else None
+                record = self._load(raw, source) if raw is not None else None
+                if record is not None:
+                    out[i] = {**record, "similarity": match[0][1], "match": "semantic"}
+
+        with self._lock:
+            for record in out:
+                if record is None:
+                    self.misses += 1
+                elif record["match"] == "exact":
+                    self.exact_hits += 1
+                else:
+                    self.semantic_hits += 1
+        return out
+
+    def lookup(self, headline: str, source: str) -> Dict | None:
+        return self.lookup_many([headline], source)[0]
+
+    # ---- gravação ----
+    def put_many(self, items: Sequence[Dict]) -> None:
+        """
+        items: dicts com headline, source (ex.: 'google/test1/llama-3.1-8b')
+        e, opcionalmente, verdict e results (lista de resultados da busca).
+        Itens sem source não são gravados.
+        """
+        records = {}
+        for item in items:
+            key = normalize_claim(item["headline"])
+            if not key or not item.get("source"):
+                continue
+            records[(item["source"], key)] = {
+                "matched_headline": item["headline"],
+                # mesma forma do pipeline e do serviço (e de import_results)
+                "verdict": normalize_verdict(item.get("verdict")),
+                "results": item.get("results"),
+                "source": item.get("source"),
+                "created_at": item.get("created_at", time.time()),
+            }
+        if not records:
+            return
+        self.store.put_many({
+            self._record_key(source, k): json.dumps(v, ensure_ascii=False, default=str).encode("utf-8")
+            for (source, k), v in records.items()
+        })
+        for source in {source for source, _ in records}:
+            # só em memória (o índice fica sujo); o disco fica para o saver/close
+            self._index(source).ensure([k for s, k in records if s == source], self.embedder)
+        self._start_saver()
+
+    def _start_saver(self) -> None:
+        with self._lock:
+            if self._saver is None and self.save_seconds and not self._closed.is_set():
+                self._saver = threading.Thread(target=self._save_periodically, daemon=True)
+                self._saver.start()
+
+    def _save_periodically(self) -> None:
+        while not self._closed.wait(self.save_seconds):
+            try:
+                self.save()
+            except Exception as e:
+                print(f"[ERRO] Falha ao gravar os índices do claim cache: {e}")
+
+    def save(self) -> None:
+        """Grava os índices com manchetes novas (os que não mudaram são pulados)."""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        for index in indexes:
+            index.save()
+
+    def close(self) -> None:
+        """Para a gravação periódica e grava o que faltar."""
+        self._closed.set()
+        if self._saver is not None:
+            self._saver.join()
+        self.save()
+
+    def put(self, headline: str, source: str, verdict: str | None = None,
+            results: list | None = None) -> None:
+        self.put_many([{"headline": headline, "verdict": verdict,
+                        "results": results, "source": source}])
+
+    def resolve_many(self, headlines: Sequence[str], source: str,
+                     compute: Callable[[List[str]], List[Dict]]) -> List[Dict]:
+        """
+        Reaproveita o cache de `source` e chama `compute` só para as manchetes
+        sem match (uma vez por manchete normalizada). `compute(headlines)`
+        devolve, na mesma ordem, dicts com verdict/results; o que ele devolve
+        é gravado no cache e marcado com match='computed'.
+        """
+        cached = self.lookup_many(headlines, source)
+        todo = {}
+        for i, record in enumerate(cached):
+            if record is None:
+                todo.setdefault(normalize_claim(headlines[i]), []).append(i)
+        if not todo:
+            return cached
+
+        firsts = [headlines[idx[0]] for idx in todo.values()]
+        computed = compute(firsts)
+        self.put_many([{**c, "headline": h, "source": source} for h, c in zip(firsts, computed)
+                       if c is not None and c.get("verdict") is not None])
+        for idx, headline, c in zip(todo.values(), firsts, computed):
+            record = None if c is None else {
+                **c, "source": source, "matched_headline": headline, "similarity": 1.0, "match": "computed"}
+            for i in idx:
+                cached[i] = record
+        return cached
+
+    def import_results(self, conn, table: str, source: str) -> int:
+        """
+        Semeia o cache com veredictos já gravados no Postgres
+        (tabelas {test}_results: search_title, response). `source` é quem
+        produziu a tabela (mecanismo/teste/modelo): os veredictos só servem
+        para consultas com a mesma source. Retorna quantos entraram.
+        """
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT DISTINCT ON (search_title) search_title, response
+                FROM {table}
+                WHERE search_title IS NOT NULL AND response IS NOT NULL
+                ORDER BY search_title
+            """)
+            rows = cur.fetchall()
+        self.put_many([{"headline": title, "verdict": response, "source": source}
+                       for title, response in rows])
+        return len(rows)
+
+    def stats(self) -> dict:
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / total, 4) if total else 0.0,
+            "entries": len(self.store),
+        }
@@ -0,0 +1,273 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+try:
+    from embedder import BatchingEmbedder
+    from prefilter import DEFAULT_THRESHOLDS, load_domain_set, prefilter_results
+    from prompt_builder import PROMPT_REGISTRY, build_prompt, normalize_verdict
+    from search_engines import apply_refiner
+except ImportError:  # importado como modules.classify_service
+    from modules.embedder import BatchingEmbedder
+    from modules.prefilter import DEFAULT_THRESHOLDS, load_domain_set, prefilter_results
+    from modules.prompt_builder import PROMPT_REGISTRY, build_prompt, normalize_verdict
+    from modules.search_engines import apply_refiner
+
+
+class LatencyMetrics:
+    """Latências recentes (janela de `window` amostras) por nome, com p50/p99."""
+
+    def __init__(self, window: int = 10_000):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            if error:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            samples = {name: np.fromiter(s, dtype=np.float64) for name, s in self._samples.items()}
+            counts, errors = dict(self._counts), dict(self._errors)
+        out = {}
+        for name, values in samples.items():
+            p50, p99 = np.percentile(values, [50, 99]) if len(values) else (0.0, 0.0)
+            out[name] = {
+                "count": counts[name],
+                "errors": errors.get(name, 0),
+                "p50_ms": round(float(p50) * 1000, 1),
+                "p99_ms": round(float(p99) * 1000, 1),
+                "mean_ms": round(float(values.mean()) * 1000, 1) if len(values) else 0.0,
+            }
+        return out
+
+
+class ClassifyService:
+    """
+    Detector residente: embedder, domínios confiáveis, templates de prompt,
+    mecanismos de busca e a sessão HTTP da LLM são carregados uma vez e
+    reaproveitados entre requisições.
+
+    Os encodes de requisições concorrentes passam por um BatchingEmbedder e
+    viram uma única chamada ao modelo; as buscas de um lote rodam em paralelo
+    no pool de `retrieve_workers` threads (um SearchEngine por thread).
+    """
+
+    def __init__(self, engine_factory: Callable, embedder, llm, mode: str = "test1",
+                 title_refiner=None, claim_cache=None,
+                 credible_domains_file: str = "./data/credible_sources.txt",
+                 thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+                 num_results: int = 10, top_x: int | None = 10, temperature: float = 0.0,
+                 retrieve_workers: int = 8, max_batch: int = 256, max_wait_ms: float = 5.0,
+                 engine_name: str | None = None, llm_model: str | None = None):
+        """
+        mode: modo padrão do prompt_builder (cada requisição pode pedir outro)
+        max_batch / max_wait_ms: limites do micro-batch de embeddings (se `embedder`
+                                 ainda não for um BatchingEmbedder)
+        engine_name / llm_model: identificam os veredictos no claim_cache
+                                 (source = engine/modo/modelo, como no run_pipeline)
+        """
+        if mode not in PROMPT_REGISTRY:
+            raise ValueError(f"Unknown prompt mode '{mode}'")
+        if claim_cache is not None and not (engine_name and llm_model):
+            raise ValueError("claim_cache precisa de engine_name e llm_model")
+        self.engine_factory = engine_factory
+        # serve.py já passa o BatchingEmbedder que o refiner, o claim cache e a
+        # busca federada também usam: todos dividem o mesmo micro-batch
+        if not isinstance(embedder, BatchingEmbedder):
+            embedder = BatchingEmbedder(embedder, max_batch=max_batch, max_wait=max_wait_ms / 1000)
+        self.embedder = embedder
+        self.llm = llm
+        self.mode = mode
+        self.title_refiner = title_refiner
+        self.claim_cache = claim_cache
+        self.credible_domains_file = credible_domains_file
+        self.thresholds = thresholds
+        self.num_results = num_results
+        self.top_x = top_x
+        self.temperature = temperature
+        self.engine_name = engine_name
+        self.llm_model = llm_model
+        self.metrics = LatencyMetrics()
+        self.retrieve_workers = retrieve_workers
+        self._pool = ThreadPoolExecutor(max_workers=retrieve_workers, thread_name_prefix="classify")
+        self._local = threading.local()
+
+    def warm_up(self) -> None:
+        """Carrega tudo que é preguiçoso antes da primeira requisição."""
+        t0 = time.perf_counter()
+        load_domain_set(self.credible_domains_file)
+        self.embedder.encode(["warm up"])
+        build_prompt(mode=self.mode, title_to_check="warm up", results_filtered=[])
+        # um SearchEngine por thread do pool
+        list(self._pool.map(lambda _: self._engine(), range(self.retrieve_workers)))
+        session = getattr(self.llm, "session", None)  # cria a sessão HTTP reaproveitada
+        print(f"[INFO] Serviço aquecido em {time.perf_counter() - t0:.1f}s "
+              f"(sessão LLM: {'ok' if session is not None else '-'})")
+
+    def source(self, mode: str) -> str:
+        """Source dos veredictos de `mode` no claim_cache."""
+        return f"{self.engine_name}/{mode}/{self.llm_model}"
+
+    def _engine(self):
+        if not hasattr(self._local, "engine"):
+            self._local.engine = self.engine_factory()
+        return self._local.engine
+
+    def _timed(self, name: str, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            self.metrics.observe(name, time.perf_counter() - t0, error=True)
+            raise
+        self.metrics.observe(name, time.perf_counter() - t0)
+        return result
+
+    def _gather(self, item: dict) -> dict:
+        """Busca + refinamento + pré-filtro de uma manchete (roda no pool)."""
+        try:
+            results = self._timed("retrieve", self._engine().search, item["headline"], self.num_results)
+            if self.title_refiner is not None:
+                self._timed("refine", apply_refiner, self.title_refiner, results)
+            kept = self._timed("prefilter", prefilter_results, results, item["headline"], self.embedder,
+                               self.credible_domains_file, self.thresholds)
+            kept.sort(key=lambda r: r["similarity"], reverse=True)
+            item["results"] = kept[:self.top_x] if self.top_x else kept
+        except Exception as e:
+            item["error"] = f"{type(e).__name__}: {e}"
+        return item
+
+    def classify_many(self, headlines: List[str], mode: str | None = None) -> List[dict]:
+        mode = mode or self.mode
+        if mode not in PROMPT_REGISTRY:
+            raise ValueError(f"Unknown prompt mode '{mode}'")
+        items = [{"headline": h, "verdict": None, "cached": None, "matched_headline": None,
+                  "similarity": None, "results": None, "error": None}
+                 for h in headlines]
+
+        todo = items
+        if self.claim_cache is not None:
+            # só veredictos do mesmo mecanismo, modo e modelo desta requisição
+            records = self._timed("cache", self.claim_cache.lookup_many, headlines, self.source(mode))
+            todo = []
+            for item, record in zip(items, records):
+                if record is not None and record.get("verdict") is not None:
+                    # proveniência: de qual manchete já classificada veio o veredicto
+                    item.update(verdict=record["verdict"], cached=record["match"],
+                                matched_headline=record.get("matched_headline"),
+                                similarity=record.get("similarity"),
+                                results=record.get("results"))
+                else:
+                    todo.append(item)
+
+        # buscas em paralelo; os pré-filtros simultâneos dividem o mesmo encode
+        list(self._pool.map(self._gather, todo))
+        ready = [item for item in todo if item["error"] is None]
+        prompts = [build_prompt(mode=mode, title_to_check=item["headline"],
+                                results_filtered=item["results"]) for item in ready]
+        if prompts:
+            responses = self._timed("llm", self.llm.generate_many, prompts, self.temperature)
+            for item, response in zip(ready, responses):
+                if isinstance(response, Exception):
+                    item["error"] = f"{type(response).__name__}: {response}"
+                else:
+                    item["verdict"] = normalize_verdict(response)
+
+        if self.claim_cache is not None:
+            self.claim_cache.put_many([
+                {"headline": item["headline"], "verdict": item["verdict"],
+                 "results": item["results"], "source": self.source(mode)}
+                for item in todo if item["verdict"] is not None
+            ])
+        return items
+
+    def classify(self, headline: str, mode: str | None = None) -> dict:
+        return self.classify_many([headline], mode)[0]
+
+    def stats(self) -> dict:
+        stats = {"latency": self.metrics.snapshot(), "embedder": self.embedder.stats()}
+        if hasattr(self.llm, "cache_stats"):
+            stats["llm_cache"] = self.llm.cache_stats()
+        if self.claim_cache is not None:
+            stats["claim_cache"] = self.claim_cache.stats()
+        return stats
+
+
+def create_app(service: ClassifyService, warm_up: bool = True):
+    """
+    App FastAPI com POST /classify, POST /classify/batch, GET /metrics e
+    GET /health. Os endpoints são síncronos: o FastAPI os roda no seu pool
+    de threads, e requisições simultâneas se juntam no BatchingEmbedder.
+    """
+    from contextlib import asynccontextmanager
+
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel, Field
+
+    class ClassifyRequest(BaseModel):
+        headline: str = Field(min_length=1)
+        mode: str | None = None
+        include_results: bool = False
+
+    class BatchRequest(BaseModel):
+        headlines: List[str] = Field(min_length=1)
+        mode: str | None = None
+        include_results: bool = False
+
+    @asynccontextmanager
+    async def lifespan(app):
+        if warm_up:
+            service.warm_up()
+        yield
+        # conexões HTTP do LLM e índices do claim cache ainda não gravados
+        for resource in (service.llm, service.claim_cache):
+            close = getattr(resource, "close", None)
+            if close is not None:
+                close()
+
+    app = FastAPI(title="Fake news detector", lifespan=lifespan)
+
+    def run(endpoint: str, headlines: List[str], mode: str | None, include_results: bool) -> List[dict]:
+        t0 = time.perf_counter()
+        try:
+            items = service.classify_many(headlines, mode)
+        except ValueError as e:
+            service.metrics.observe(endpoint, time.perf_counter() - t0, error=True)
+            raise HTTPException(status_code=400, detail=str(e))
+        service.metrics.observe(endpoint, time.perf_counter() - t0,
+                                error=any(item["error"] for item in items))
+        for item in items:
+            results = item.pop("results") or []
+            item["num_results"] = len(results)
+            if include_results:
+                item["results"] = results
+        return items
+
+    @app.post("/classify")
+    def classify(request: ClassifyRequest):
+        return run("/classify", [request.headline], request.mode, request.include_results)[0]
+
+    @app.post("/classify/batch")
+    def classify_batch(request: BatchRequest):
+        return {"items": run("/classify/batch", request.headlines, request.mode, request.include_results)}
+
+    @app.get("/metrics")
+    def metrics():
+        return service.stats()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "mode": service.mode}
+
+    return app
@@ -0,0 +1,105 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+from typing import Dict, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+SOURCE_FILES = (("Fake.csv", "fake"), ("True.csv", "real"))
+SHUFFLE_SEED = 42
+# mude ao alterar a forma como a tabela é construída, para invalidar os parquets
+BUILD_VERSION = 1
+CACHE_FILENAME = "shuffled.parquet"
+
+
+def _fingerprint(data_dir: str) -> str:
+    """Hash barato das fontes (nome, tamanho, mtime) + versão da construção."""
+    parts = [f"v{BUILD_VERSION}", str(SHUFFLE_SEED)]
+    for name, _ in SOURCE_FILES:
+        st = os.stat(os.path.join(data_dir, name))
+        parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def build_shuffled(data_dir: str = DEFAULT_DATA_DIR) -> pd.DataFrame:
+    """
+    Tabela canônica: Fake.csv + True.csv, sem títulos duplicados, embaralhada
+    com random_state=42. shuffle_id é a posição após o embaralhamento.
+    """
+    frames = []
+    for name, label in SOURCE_FILES:
+        df = pd.read_csv(os.path.join(data_dir, name))
+        df['class'] = label
+        frames.append(df)
+    df = pd.concat(frames, axis=0).drop_duplicates(subset='title')
+    df_shuffled = df.sample(frac=1, random_state=SHUFFLE_SEED).reset_index(drop=True)
+    df_shuffled['shuffle_id'] = df_shuffled.index
+    return df_shuffled
+
+
+def ensure_cache(data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """Garante que o parquet da tabela canônica existe e está atualizado; retorna o caminho."""
+    data_dir = os.path.abspath(data_dir)
+    path = os.path.join(data_dir, CACHE_FILENAME)
+    fingerprint = _fingerprint(data_dir)
+
+    if os.path.exists(path):
+        meta = pq.read_schema(path).metadata or {}
+        if meta.get(b"fingerprint", b"").decode() == fingerprint:
+            return path
+
+    print(f"[INFO] Construindo {path} a partir dos CSVs")
+    table = pa.Table.from_pandas(build_shuffled(data_dir), preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[b"fingerprint"] = fingerprint.encode()
+    meta[b"sources"] = json.dumps([n for n, _ in SOURCE_FILES]).encode()
+    table = table.replace_schema_metadata(meta)
+
+    # escreve em arquivo temporário e renomeia: leitores nunca veem parquet pela metade
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+@lru_cache(maxsize=16)
+def _load(data_dir: str, columns: Tuple[str, ...] | None) -> pd.DataFrame:
+    path = ensure_cache(data_dir)
+    table = pq.read_table(path, columns=list(columns) if columns else None, memory_map=True)
+    return table.to_pandas()
+
+
+def load_shuffled(
+    data_dir: str = DEFAULT_DATA_DIR,
+    columns: Sequence[str] | None = ("shuffle_id", "title", "class"),
+    start_id: int | None = None,
+    end_id: int | None = None,
+) -> pd.DataFrame:
+    """
+    Retorna a tabela embaralhada lendo só as colunas pedidas do parquet
+    (memory-mapped). Sem `columns`, lê tudo (inclusive o texto completo).
+    start_id/end_id filtram o intervalo [start_id, end_id) de shuffle_id.
+
+    O DataFrame é memoizado por processo: não altere o retorno in-place.
+    """
+    cols = tuple(columns) if columns else None
+    if cols and "shuffle_id" not in cols and (start_id is not None or end_id is not None):
+        cols = cols + ("shuffle_id",)
+    df = _load(os.path.abspath(data_dir), cols)
+
+    if start_id is not None:
+        df = df[df['shuffle_id'] >= start_id]
+    if end_id is not None:
+        df = df[df['shuffle_id'] < end_id]
+    return df
+
+
+def shuffle_class_map(data_dir: str = DEFAULT_DATA_DIR) -> Dict[int, str]:
+    """Mapeia shuffle_id -> classe verdadeira ('fake' / 'real')."""
+    df = load_shuffled(data_dir, columns=("shuffle_id", "class"))
+    return dict(zip(df['shuffle_id'].tolist(), df['class'].tolist()))
@@ -0,0 +1,241 @@
+import io
+import time
+import threading
+from typing import Iterable, List, Sequence
+
+
+def _copy_value(v) -> str:
+    """Formata um valor para o formato texto do COPY (\\N = NULL)."""
+    if v is None:
+        return "\\N"
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    s = str(v)
+    return (s.replace("\\", "\\\\")
+             .replace("\t", "\\t")
+             .replace("\n", "\\n")
+             .replace("\r", "\\r"))
+
+
+def copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[tuple]) -> None:
+    """Grava `rows` em `table` com um único COPY FROM STDIN."""
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+
+def insert_values(cur, table: str, columns: Sequence[str], rows: List[tuple],
+                  suffix: str = "", page_size: int = 1000) -> None:
+    """INSERT multi-linha (execute_values) com sufixo opcional (ex.: ON CONFLICT)."""
+    from psycopg2.extras import execute_values
+
+    execute_values(
+        cur,
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s {suffix}",
+        rows,
+        page_size=page_size,
+    )
+
+
+def append_rows(cur, table: str, columns: Sequence[str], rows: List[tuple],
+                method: str = "copy") -> None:
+    if method == "copy":
+        copy_rows(cur, table, columns, rows)
+    else:
+        insert_values(cur, table, columns, rows)
+
+
+def replace_rows(cur, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                 rows: List[tuple], method: str = "copy") -> None:
+    """Apaga as linhas já existentes das chaves presentes em `rows` e grava `rows`."""
+    idx = [list(columns).index(c) for c in key_columns]
+    keys = list({tuple(r[i] for i in idx) for r in rows})
+    if len(key_columns) == 1:
+        cur.execute(f"DELETE FROM {table} WHERE {key_columns[0]} = ANY(%s)",
+                    ([k[0] for k in keys],))
+    else:
+        cond = " AND ".join(f"{c} = %s" for c in key_columns)
+        cur.executemany(f"DELETE FROM {table} WHERE {cond}", keys)
+    append_rows(cur, table, columns, rows, method)
+
+
+def upsert_rows(cur, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                rows: List[tuple], method: str = "copy") -> None:
+    """INSERT ... ON CONFLICT (key) DO UPDATE; com 'copy' passa por uma tabela temporária."""
+    # ON CONFLICT não aceita a mesma chave duas vezes no mesmo comando
+    idx = [list(columns).index(c) for c in key_columns]
+    rows = list({tuple(r[i] for i in idx): r for r in rows}.values())
+
+    keys = ", ".join(key_columns)
+    updates = [c for c in columns if c not in key_columns]
+    if updates:
+        conflict = (f"ON CONFLICT ({keys}) DO UPDATE SET "
+                    + ", ".join(f"{c} = EXCLUDED.{c}" for c in updates))
+    else:
+        conflict = f"ON CONFLICT ({keys}) DO NOTHING"
+
+    if method == "values":
+        insert_values(cur, table, columns, rows, suffix=conflict)
+        return
+
+    stage = f"_stage_{table}"
+    cols = ", ".join(columns)
+    cur.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DELETE ROWS
+        AS SELECT {cols} FROM {table} WITH NO DATA
+    """)
+    copy_rows(cur, stage, columns, rows)
+    cur.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} {conflict}")
+
+
+def ensure_unique_key(conn, table: str, key_columns: Sequence[str], dedupe: bool = False) -> None:
+    """
+    Cria o índice único exigido pelo ON CONFLICT. Se a tabela já tiver
+    chaves duplicadas, levanta ValueError listando-as; com dedupe=True
+    (pedido explícito, ex.: --dedupe) apaga as duplicatas antes, mantendo
+    a linha mais recente.
+    """
+    cols = ", ".join(key_columns)
+    index = f"{table}_{'_'.join(key_columns)}_key"
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_indexes WHERE tablename = %s AND indexname = %s", (table, index))
+        if cur.fetchone() is not None:
+            conn.commit()
+            return
+
+        cur.execute(f"""
+            SELECT {cols}, count(*) FROM {table}
+            GROUP BY {cols} HAVING count(*) > 1
+            ORDER BY count(*) DESC
+        """)
+        duplicates = cur.fetchall()
+        if duplicates and not dedupe:
+            conn.rollback()
+            listed = ", ".join(f"{row[:-1]} x{row[-1]}" for row in duplicates[:20])
+            more = f" (+{len(duplicates) - 20})" if len(duplicates) > 20 else ""
+            raise ValueError(
+                f"{table} tem {len(duplicates)} chaves ({cols}) duplicadas: {listed}{more}. "
+                f"Resolva-as ou rode com --dedupe para manter só a linha mais recente de cada uma."
+            )
+        if duplicates:
+            cur.execute(f"""
+                DELETE FROM {table} a USING {table} b
+                WHERE a.ctid < b.ctid
+                  AND {' AND '.join(f'a.{c} IS NOT DISTINCT FROM b.{c}' for c in key_columns)}
+            """)
+            print(f"[AVISO] {cur.rowcount} linhas duplicadas removidas de {table} (--dedupe)")
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table} ({cols})")
+    conn.commit()
+
+
+class BufferedWriter:
+    """
+    Acumula linhas e grava em lote a cada `flush_rows` linhas ou
+    `flush_seconds` segundos (e no close()).
+
+    method: 'copy' (COPY FROM STDIN) ou 'values' (INSERT multi-linha)
+    key_columns: chave do upsert. Com mode='upsert' usa ON CONFLICT DO UPDATE
+                 (exige índice único, ver ensure_unique_key); com mode='replace'
+                 apaga as linhas existentes das chaves do lote antes de gravar
+                 (para tabelas com várias linhas por chave, ex.: retrieved_news_*).
+    """
+
+    def __init__(self, conn, table: str, columns: Sequence[str],
+                 key_columns: Sequence[str] | None = None, mode: str = "upsert",
+                 method: str = "copy", flush_rows: int = 500, flush_seconds: float = 5.0):
+        if method not in ("copy", "values"):
+            raise ValueError("method deve ser 'copy' ou 'values'")
+        if mode not in ("upsert", "replace"):
+            raise ValueError("mode deve ser 'upsert' ou 'replace'")
+        self.conn = conn
+        self.table = table
+        self.columns = list(columns)
+        self.key_columns = list(key_columns) if key_columns else []
+        self.mode = mode
+        self.method = method
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.written = 0
+
+        self._rows = []
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+        # erro do flush por tempo, relançado no próximo add_many/close
+        self._error = None
+        self._closed = threading.Event()
+        # garante o flush por tempo mesmo quando não chegam linhas novas
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, row: tuple) -> None:
+        self.add_many([row])
+
+    def _raise_pending(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def add_many(self, rows: Iterable[tuple]) -> None:
+        with self._lock:
+            self._raise_pending()
+            self._rows.extend(rows)
+            if len(self._rows) >= self.flush_rows:
+                self.flush()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(min(1.0, self.flush_seconds)):
+            with self._lock:
+                if self._rows and time.monotonic() - self._last_flush >= self.flush_seconds:
+                    try:
+                        self.flush()
+                    except Exception as e:
+                        # as linhas voltaram para o buffer; quem chama vê o erro
+                        print(f"[ERRO] Falha ao gravar lote em {self.table}: {e}")
+                        self._error = e
+
+    def flush(self) -> int:
+        """
+        Grava as linhas pendentes em uma transação. Retorna quantas foram
+        gravadas. Se a gravação falhar, as linhas voltam para o início do
+        buffer (nada se perde) e a exceção é relançada.
+        """
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._last_flush = time.monotonic()
+            if not rows:
+                return 0
+            try:
+                with self.conn.cursor() as cur:
+                    self.write(cur, rows)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                self._rows[:0] = rows
+                raise
+            self.written += len(rows)
+            return len(rows)
+
+    def write(self, cur, rows: List[tuple]) -> None:
+        """Grava `rows` usando o cursor recebido (sem commit)."""
+        if not self.key_columns:
+            append_rows(cur, self.table, self.columns, rows, self.method)
+        elif self.mode == "replace":
+            replace_rows(cur, self.table, self.columns, self.key_columns, rows, self.method)
+        else:
+            upsert_rows(cur, self.table, self.columns, self.key_columns, rows, self.method)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._timer.join()
+        with self._lock:
+            self._error = None  # o flush abaixo tenta de novo as mesmas linhas
+            self.flush()
@@ -1,34 +1,402 @@
 # 🔹 Classe base para embedders
-from typing import List, Dict
-import torch
-from transformers import AutoTokenizer, AutoModel
-from sklearn.metrics.pairwise import cosine_similarity
-from urllib.parse import urlparse
+from typing import TYPE_CHECKING, List, Dict
+import hashlib
+import os
+import time
+import warnings
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 
+import numpy as np
+
+if TYPE_CHECKING:
+    # torch/transformers só são importados quando um modelo é carregado
+    # (importar este módulo não custa os segundos de import do torch)
+    import torch
+
+try:
+    from cache_store import SQLiteStore
+except ImportError:  # importado como modules.embedder
+    from modules.cache_store import SQLiteStore
+
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "cache", "embeddings.sqlite"
+)
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cache", "onnx")
 
 
 class Embedder:
     """Interface para gerar embeddings de textos."""
-    
-    def encode(self, texts: List[str]) -> torch.Tensor:
+
+    def encode(self, texts: List[str]) -> "torch.Tensor":
         """Retorna embeddings para uma lista de textos."""
         raise NotImplementedError("Subclasses devem implementar este método.")
 
+
+class EmbeddingCache:
+    """
+    Cache hash(conteúdo) -> vetor em dois níveis:
+    LRU em memória + SQLite em disco (float16 ou float32).
+    """
+
+    def __init__(self, namespace: str, path: str | None = DEFAULT_CACHE_PATH,
+                 memory_size: int = 50_000, dtype: str = "float32"):
+        if dtype not in ("float16", "float32"):
+            raise ValueError("dtype do cache deve ser 'float16' ou 'float32'")
+        self.namespace = namespace
+        self.dtype = np.dtype(dtype)
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.store = SQLiteStore(path, table="embeddings") if path else None
+        self._key_prefix = f"{self.namespace}\0{self.dtype.name}\0".encode("utf-8")
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(self._key_prefix + text.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for k in keys:
+                v = self._memory.get(k)
+                if v is not None:
+                    self._memory.move_to_end(k)
+                    found[k] = v
+
+        missing = [k for k in keys if k not in found]
+        if self.store is not None and missing:
+            from_disk = {
+                k: np.frombuffer(b, dtype=self.dtype).astype(np.float32)
+                for k, b in self.store.get_many(missing).items()
+            }
+            self._remember(from_disk)
+            found.update(from_disk)
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        self._remember(vectors)
+        if self.store is not None:
+            self.store.put_many({
+                k: np.asarray(v, dtype=self.dtype).tobytes() for k, v in vectors.items()
+            })
+
+    def _remember(self, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for k, v in vectors.items():
+                self._memory[k] = v
+                self._memory.move_to_end(k)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+
+class CachedEmbedder(Embedder):
+    """
+    Parte comum dos backends: cache em dois níveis (EmbeddingCache),
+    deduplicação dos textos e micro-batches ordenados por tamanho.
+    Subclasses definem `dim` e `_embed_batch` (vetores [CLS] normalizados).
+    """
+
+    dim: int
+
+    def __init__(self, model_name: str, batch_size: int, max_length: int, namespace: str,
+                 cache_path: str | None, memory_cache_size: int, cache_dtype: str):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache = EmbeddingCache(
+            namespace=namespace,
+            path=cache_path,
+            memory_size=memory_cache_size,
+            dtype=cache_dtype,
+        )
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError("Subclasses devem implementar este método.")
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        """Roda o modelo em micro-batches ordenados por tamanho (menos padding)."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            out[idx] = self._embed_batch([texts[i] for i in idx])
+        return out
+
+    def encode(self, texts: List[str]) -> "torch.Tensor":
+        import torch
+
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return torch.empty((0, self.dim))
+
+        keys = [self.cache.key(t) for t in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        # textos únicos que ainda não estão no cache
+        pending = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in pending:
+                pending[k] = t
+
+        if pending:
+            vectors = self._forward(list(pending.values()))
+            computed = dict(zip(pending.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+
+        return torch.from_numpy(np.stack([found[k] for k in keys]))
+
+
 # 🔹 Implementação HuggingFace
-class HuggingFaceEmbedder(Embedder):
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+class HuggingFaceEmbedder(CachedEmbedder):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        batch_size: int = 64,
+        max_length: int = 128,
+        cache_path: str | None = DEFAULT_CACHE_PATH,
+        memory_cache_size: int = 50_000,
+        cache_dtype: str = "float32",
+    ):
+        """
+        batch_size: quantidade de textos por forward pass
+        max_length: número máximo de tokens por texto (trunca o resto)
+        cache_path: arquivo SQLite do cache persistente (None desliga o disco)
+        memory_cache_size: número de vetores mantidos no LRU em memória
+        cache_dtype: 'float16' ou 'float32' para os vetores salvos em disco
+        """
+        super().__init__(model_name, batch_size, max_length, f"{model_name}|{max_length}",
+                         cache_path, memory_cache_size, cache_dtype)
+        from transformers import AutoTokenizer, AutoModel
+
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModel.from_pretrained(model_name)
-    
-    def encode(self, texts: List[str]) -> torch.Tensor:
-        # Tokenização
+        self.model.eval()
+        self.dim = self.model.config.hidden_size
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            encoded_input = self.tokenizer(
+                texts,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt",
+            )
+            model_output = self.model(**encoded_input)
+            embeddings = model_output.last_hidden_state[:, 0, :]  # [CLS] token
+            # Normalizando para similaridade coseno
+            embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+            return embeddings.cpu().numpy()
+
+
+def export_onnx(model_name: str, output_dir: str = DEFAULT_ONNX_DIR, quantize: bool = False,
+                opset: int = 17) -> str:
+    """
+    Exporta o modelo para {output_dir}/{modelo}/model.onnx (e model.int8.onnx
+    com quantize=True: quantização dinâmica int8 dos pesos). Reaproveita os
+    arquivos já exportados. Retorna o caminho do .onnx pedido.
+    """
+    model_dir = os.path.join(output_dir, model_name.strip("./").replace("/", "__"))
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoTokenizer, AutoModel
+
+        class ClsEmbedding(torch.nn.Module):
+            """[CLS] normalizado, igual ao HuggingFaceEmbedder."""
+
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, input_ids, attention_mask, token_type_ids=None):
+                kwargs = {"input_ids": input_ids, "attention_mask": attention_mask}
+                if token_type_ids is not None:
+                    kwargs["token_type_ids"] = token_type_ids
+                embeddings = self.model(**kwargs).last_hidden_state[:, 0, :]
+                return torch.nn.functional.normalize(embeddings, p=2, dim=1)
+
+        os.makedirs(model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # atenção "eager": o caminho SDPA gera um grafo com condições fixadas no trace
+        model = AutoModel.from_pretrained(model_name, attn_implementation="eager").eval()
+        sample = tokenizer(["warm up", "a longer sample sentence"], padding=True, return_tensors="pt")
+        input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+        dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+        dynamic_axes["embedding"] = {0: "batch"}
+        tmp_path = f"{fp32_path}.{os.getpid()}.tmp"
+        with torch.inference_mode(), warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # avisos do trace (TracerWarning) são esperados aqui
+            torch.onnx.export(ClsEmbedding(model), tuple(sample[n] for n in input_names), tmp_path,
+                              input_names=input_names, output_names=["embedding"],
+                              dynamic_axes=dynamic_axes, opset_version=opset, dynamo=False)
+        os.replace(tmp_path, fp32_path)
+        tokenizer.save_pretrained(model_dir)
+        print(f"[INFO] {model_name} exportado para {fp32_path}")
+
+    if not quantize:
+        return fp32_path
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+        print(f"[INFO] Modelo int8 salvo em {int8_path}")
+    return int8_path
+
+
+# 🔹 Implementação ONNX Runtime (CPU)
+class OnnxEmbedder(CachedEmbedder):
+    """
+    Mesmo embedding do HuggingFaceEmbedder ([CLS] normalizado) rodando no
+    ONNX Runtime, opcionalmente com pesos int8. O modelo é exportado na
+    primeira vez (export_onnx) e reaproveitado de `onnx_dir` depois.
+
+    Os vetores ficam no cache com namespace próprio do backend: não se
+    misturam com os do PyTorch.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        batch_size: int = 64,
+        max_length: int = 128,
+        quantize: bool = False,
+        intra_op_threads: int | None = None,
+        onnx_dir: str = DEFAULT_ONNX_DIR,
+        cache_path: str | None = DEFAULT_CACHE_PATH,
+        memory_cache_size: int = 50_000,
+        cache_dtype: str = "float32",
+    ):
+        """
+        quantize: usa o modelo com quantização dinâmica int8
+        intra_op_threads: threads do ONNX Runtime por operação (None = padrão do ORT)
+        onnx_dir: onde os modelos exportados ficam guardados
+        (demais parâmetros como no HuggingFaceEmbedder)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        backend = "onnx-int8" if quantize else "onnx"
+        super().__init__(model_name, batch_size, max_length, f"{model_name}|{max_length}|{backend}",
+                         cache_path, memory_cache_size, cache_dtype)
+        self.quantize = quantize
+        self.model_path = export_onnx(model_name, onnx_dir, quantize=quantize)
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(self.model_path))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.model_path, options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.dim = self.session.get_outputs()[0].shape[1]
+        if not isinstance(self.dim, int):
+            self.dim = self._embed_batch(["warm up"]).shape[1]
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
         encoded_input = self.tokenizer(
-            texts, padding=True, truncation=True, return_tensors="pt"
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np",
         )
-        # Extraindo embeddings do [CLS]
-        with torch.no_grad():
-            model_output = self.model(**encoded_input)
-            embeddings = model_output.last_hidden_state[:,0,:]  # [CLS] token
-        # Normalizando para similaridade coseno
-        embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
-        return embeddings
\ No newline at end of file
+        feeds = {name: encoded_input[name].astype(np.int64) for name in self.input_names}
+        return self.session.run(None, feeds)[0].astype(np.float32, copy=False)
+
+
+def load_embedder(model_name: str = "sentence-transformers/all-MiniLM-L6-v2", backend: str = "torch",
+                  **kwargs) -> CachedEmbedder:
+    """
+    backend: 'torch' (HuggingFaceEmbedder), 'onnx' ou 'onnx-int8' (OnnxEmbedder).
+    kwargs vão para o construtor do backend.
+    """
+    if backend == "torch":
+        return HuggingFaceEmbedder(model_name=model_name, **kwargs)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbedder(model_name=model_name, quantize=backend == "onnx-int8", **kwargs)
+    raise ValueError(f"backend de embedder desconhecido: {backend}")
+
+
+class BatchingEmbedder(Embedder):
+    """
+    Junta chamadas concorrentes de encode (várias threads/requisições) em
+    uma única chamada ao embedder: o primeiro pedido espera até `max_wait`
+    segundos pelos próximos, até `max_batch` textos no total.
+    """
+
+    def __init__(self, embedder: Embedder, max_batch: int = 256, max_wait: float = 0.005):
+        self.embedder = embedder
+        self.model_name = getattr(embedder, "model_name", "default")
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.calls = 0
+        self.requests = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="batching-embedder")
+        self._thread.start()
+
+    def encode(self, texts: List[str]) -> "torch.Tensor":
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return self.embedder.encode([])
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            n_texts = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while n_texts < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                n_texts += len(request[0])
+
+            texts = [t for request, _ in batch for t in request]
+            try:
+                import torch
+
+                vectors = torch.as_tensor(np.asarray(self.embedder.encode(texts), dtype=np.float32))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.calls += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+            offset = 0
+            for request, future in batch:
+                future.set_result(vectors[offset:offset + len(request)])
+                offset += len(request)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_batch": round(self.texts / self.calls, 2) if self.calls else 0.0,
+        }
@@ -1,112 +1,214 @@
+import time
+from typing import Dict, Sequence
+from urllib.parse import urljoin, urlsplit
 
-import trafilatura
-from newspaper import Article
-from bs4 import BeautifulSoup
-import json
+import lxml.html
+
+try:
+    from page_fetcher import DEFAULT_HEADERS, get_default_fetcher
+    from page_store import content_hash
+    from help import strip_site_suffix
+except ImportError:  # importado como modules.extract_page_content
+    from modules.page_fetcher import DEFAULT_HEADERS, get_default_fetcher
+    from modules.page_store import content_hash
+    from modules.help import strip_site_suffix
 
 ###############################
 
-headers = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/127.0.0.0 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Accept-Language": "en-US,en;q=0.9,pt-BR;q=0.8",
-    "Referer": "https://www.google.com/",
-}
+# mantido por compatibilidade (os headers agora vivem no PageFetcher)
+headers = DEFAULT_HEADERS
+
+# ordem em que os extratores de corpo são tentados; o primeiro que
+# devolver pelo menos `min_text_len` caracteres encerra a busca
+DEFAULT_BACKENDS = ("trafilatura", "newspaper", "paragraphs")
+
+# incremente ao mudar a extração: os campos guardados no PageStore com
+# versão antiga deixam de ser usados (ver scripts/page_scripts/replay_extract.py)
+EXTRACTOR_VERSION = 2
+
+# chaves da versão anterior (newspaper + bs4 + trafilatura), sempre presentes
+LEGACY_KEYS = ("newspaper_title", "newspaper_meta_description", "newspaper_text",
+               "bs4_title", "bs4_description", "bs4_link", "trafilatura_text")
 
 ###############################
 
-def extract_page_content(url):
-    content = {}
-    
-    article = Article(url, browser_user_agent='Mozilla/5.0', request_timeout=2)
-    article.download()
-    article.parse()
-    
-    try:
-        content['newspaper_title'] = article.title
-        #print ("newspaper.Article.title:\n", article.title)
-    except:
-        print("Failed: newspaper.Article.title")
-    
-    try:
-        content['newspaper_meta_description'] = article.meta_description
-        #print("newspaper.Article.meta_description:\n", article.meta_description)
-    except:
-        print("Failed: newspaper.Article.meta_description")
-    
+
+def _parse_html(html: str):
+    """Parse único da página com lxml (a árvore é compartilhada por todas as etapas)."""
     try:
-        content['newspaper_text'] = article.text
-        #print ("newspaper.Article.text:\n", article.text)
-    except:
-        print("Failed: newspaper.Article.text")
-    
-    
-    
+        return lxml.html.fromstring(html)
+    except ValueError:
+        # lxml recusa str com declaração de encoding (<?xml encoding=...?>)
+        return lxml.html.fromstring(html.encode("utf-8"))
+
+
+def _first(tree, xpath: str) -> str | None:
+    values = tree.xpath(xpath)
+    for v in values:
+        v = (v if isinstance(v, str) else v.text_content()).strip()
+        if v:
+            return v
+    return None
+
+
+def _metadata(tree) -> Dict[str, str | None]:
+    """Título, descrição, URL canônica e nome do site lidos da árvore já parseada."""
+    html_title = _first(tree, "//title")
+    og_title = _first(tree, "//meta[@property='og:title']/@content")
+    description = (_first(tree, "//meta[@property='og:description']/@content")
+                   or _first(tree, "//meta[@name='description']/@content"))
+    canonical = _first(tree, "//link[@rel='canonical']/@href")
+    site_name = _first(tree, "//meta[@property='og:site_name']/@content")
+    return {
+        "html_title": html_title,
+        "og_title": og_title,
+        "title": og_title or html_title,
+        "description": description,
+        "canonical_url": canonical,
+        "site_name": site_name,
+    }
+
+
+def _headline(url: str, meta: dict, state: dict) -> str | None:
+    """
+    Manchete no sentido do antigo newspaper_title: o título do newspaper
+    quando ele rodou; senão og:title/<title> sem o sufixo " - Site" (só se
+    o sufixo for o nome do site ou o domínio da página).
+    """
+    if state.get("newspaper_title"):
+        return state["newspaper_title"]
+    sites = (meta["site_name"], urlsplit(url).hostname,
+             meta["canonical_url"] and urlsplit(urljoin(url, meta["canonical_url"])).hostname)
+    return strip_site_suffix(meta["og_title"] or meta["html_title"], sites)
+
+
+# trafilatura e newspaper são importados pelo extrator que os usa (import caro)
+def _body_trafilatura(url, html, tree, state):
+    import trafilatura
+
+    return trafilatura.extract(tree, url=url, include_comments=False)
+
+
+def _body_newspaper(url, html, tree, state):
+    # newspaper reparseia o HTML por conta própria: só roda como fallback
+    from newspaper import Article
+
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    state["newspaper_title"] = article.title
+    return article.text
+
+
+def _body_paragraphs(url, html, tree, state):
+    paragraphs = (p.text_content().strip() for p in tree.iter("p"))
+    return "\n".join(p for p in paragraphs if p)
+
+
+BODY_EXTRACTORS = {
+    "trafilatura": _body_trafilatura,
+    "newspaper": _body_newspaper,
+    "paragraphs": _body_paragraphs,
+}
+
+
+def extract_page_content(url, html: str | None = None, fetcher=None, store=None,
+                         backends: Sequence[str] = DEFAULT_BACKENDS,
+                         min_text_len: int = 200) -> dict:
+    """
+    Baixa a página uma vez (PageFetcher), faz um único parse com lxml e extrai
+    título, descrição, link canônico e texto a partir da mesma árvore.
+
+    html: HTML já baixado (pula o download)
+    store: PageStore para reaproveitar/guardar os campos extraídos
+           (padrão: o acervo do fetcher; False desliga)
+    backends: extratores de texto, tentados em ordem até um devolver
+              `min_text_len` caracteres (fica o texto mais longo)
+
+    Chaves: title, description, canonical_url, text, text_backend e
+    timings (segundos por etapa). As chaves antigas (LEGACY_KEYS) estão
+    sempre presentes (None quando o download/parse falha): newspaper_title
+    é a manchete sem o sufixo do site, as demais repetem os campos novos.
+    """
+    timings = {}
+    content = {"url": url, "title": None, "description": None, "canonical_url": None,
+               "text": None, "text_backend": None, "timings": timings,
+               **dict.fromkeys(LEGACY_KEYS)}
+    t_start = time.perf_counter()
+
+    if html is None or store is None:
+        fetcher = fetcher or get_default_fetcher()
+        if store is None:
+            store = fetcher.store
+    if store is False:
+        store = None
+    if html is None:
+        t0 = time.perf_counter()
+        html = fetcher.fetch(url)
+        timings["fetch"] = time.perf_counter() - t0
+    if not html:
+        timings["total"] = time.perf_counter() - t_start
+        return content
+
+    chash = content_hash(html) if store is not None else None
+    if store is not None:
+        cached = store.get_extracted(chash, EXTRACTOR_VERSION)
+        if cached is not None:
+            cached["url"] = url
+            cached["timings"] = timings
+            timings["total"] = time.perf_counter() - t_start
+            return cached
+
+    t0 = time.perf_counter()
     try:
-        soup = BeautifulSoup(article.html, "html.parser")
-        
-    except:
-        print("Failed: bs4.BeautifulSoup")
-        soup = None
-    
-    
-    
-    if soup:
-        try:
-            titulo_html = soup.title.get_text(strip=True) if soup.title else None
-            #print("- titulo_html:", titulo_html)
-            content['bs4_title'] = titulo_html
-        except:
-            print("Failed: bs4_title")
-    
-        '''
-        try:
-            titulo_og = soup.find("meta", property="og:title")
-            titulo_og = titulo_og["content"] if titulo_og else None
-            print("- titulo_og:", titulo_og)
-            content['titulo_og'] = titulo_og
-        except:
-            print("Failed: titulo_og")
-        '''
-    
-        try:
-            desc = soup.find("meta", property="og:description")
-            if not desc:
-                desc = soup.find("meta", attrs={"name": "description"})
-            descricao = desc["content"] if desc else None
-            #print("- descricao:", descricao)
-            content['bs4_description'] = descricao
-        except:
-            print("Failed: bs4_description")
-    
-    
+        tree = _parse_html(html)
+    except Exception as e:
+        print(f"Failed: lxml parse ({e})")
+        tree = None
+    timings["parse"] = time.perf_counter() - t0
+    if tree is None:
+        timings["total"] = time.perf_counter() - t_start
+        return content
+
+    t0 = time.perf_counter()
+    meta = _metadata(tree)
+    content.update(title=meta["title"], description=meta["description"],
+                   canonical_url=meta["canonical_url"])
+    timings["metadata"] = time.perf_counter() - t0
+
+    state = {}
+    best = ""
+    for name in backends:
+        t0 = time.perf_counter()
         try:
-            canonical = soup.find("link", rel="canonical")
-            canonical_url = canonical["href"] if canonical else None
-            #print("- canonical_url:", canonical_url)
-            content['bs4_link'] = canonical_url
-        except:
-            print("Failed: bs4_link")        
-    
-        
-        
-        dados = trafilatura.extract(
-            str(soup),
-            output_format="json",
-            include_comments=False
-        )
-    
-        if dados:
-            dados = json.loads(dados)
-        else:
-            dados = {}
-    
-        if dados['text']:
-            #print("- content:", dados['text'])
-            content['trafilatura_text'] = dados['text']
-    
-    return content
\ No newline at end of file
+            text = (BODY_EXTRACTORS[name](url, html, tree, state) or "").strip()
+        except Exception as e:
+            print(f"Failed: {name} ({e})")
+            text = ""
+        timings[name] = time.perf_counter() - t0
+        if len(text) > len(best):
+            best = text
+            content["text_backend"] = name
+        if len(best) >= min_text_len:
+            break
+    content["text"] = best or None
+    if not content["title"] and state.get("newspaper_title"):
+        content["title"] = state["newspaper_title"]
+
+    # chaves antigas
+    content["newspaper_title"] = _headline(url, meta, state)
+    content["newspaper_meta_description"] = content["description"]
+    content["newspaper_text"] = content["text"]
+    content["bs4_title"] = meta["html_title"]
+    content["bs4_description"] = content["description"]
+    content["bs4_link"] = content["canonical_url"]
+    content["trafilatura_text"] = content["text"]
+
+    if store is not None:
+        store.put_extracted(chash, EXTRACTOR_VERSION,
+                            {k: v for k, v in content.items() if k != "timings"})
+        if content["canonical_url"]:
+            store.add_alias(urljoin(url, content["canonical_url"]), url)
+
+    timings["total"] = time.perf_counter() - t_start
+    return content
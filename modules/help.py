@@ -1,4 +1,5 @@
-from typing import List
+import re
+from typing import Iterable, List
 
 
 def load_credible_domains(file_path: str) -> List[str]:
@@ -10,3 +11,45 @@ def load_credible_domains(file_path: str) -> List[str]:
 
 def estimate_tokens(text: str) -> int:
     return int(len(text) / 4)
+
+
+# " - Site", " | Site", " — Site" no fim de títulos de página
+_SUFFIX_SEP = re.compile(r"\s+[-|–—]{1,2}\s+")
+_NON_WORD = re.compile(r"[^\w]+")
+# partes de domínio que não identificam o site
+_HOST_NOISE = {"www", "m", "amp", "com", "org", "net", "gov", "edu", "co", "news"}
+
+
+def _site_keys(sites: Iterable[str | None]) -> set:
+    keys = set()
+    for site in sites:
+        if not site:
+            continue
+        site = site.strip().lower()
+        keys.add(_NON_WORD.sub("", site))
+        if "." in site and " " not in site:
+            # domínio: "edition.cnn.com" também vale como "cnn"
+            keys.update(_NON_WORD.sub("", label) for label in site.split(".")[:-1]
+                        if label not in _HOST_NOISE)
+    return {k for k in keys if len(k) >= 3}
+
+
+def strip_site_suffix(title: str | None, sites: Iterable[str | None]) -> str | None:
+    """
+    Remove do fim do título o nome do site (" - CNN", " | BBC News"), só
+    quando o último segmento corresponde a um dos `sites` (nome do site ou
+    domínio): separadores dentro da própria manchete não são cortados.
+    """
+    if not title:
+        return title
+    title = title.strip()
+    seps = list(_SUFFIX_SEP.finditer(title))
+    keys = _site_keys(sites)
+    if not seps or not keys:
+        return title
+    tail = _NON_WORD.sub("", title[seps[-1].end():].lower())
+    # "The Guardian" ~ theguardian.com / guardian; "BBC News" ~ bbc
+    tails = {t for t in (tail, tail.removeprefix("the")) if len(t) >= 3}
+    if any(t.startswith(k) or k.startswith(t) for t in tails for k in keys):
+        return title[:seps[-1].start()].rstrip()
+    return title
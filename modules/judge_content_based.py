@@ -1,12 +1,60 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
 
-from modules.llm_base import LLM, LOCAL_LLM
-from modules.extract_page_content import extract_page_content
+try:
+    from llm_base import LOCAL_LLM
+    from extract_page_content import extract_page_content
+    from token_budget import TokenCounter, select_passages
+except ImportError:  # importado como modules.judge_content_based
+    from modules.llm_base import LOCAL_LLM
+    from modules.extract_page_content import extract_page_content
+    from modules.token_budget import TokenCounter, select_passages
 
 
 model = "gemma3:12b" # llama3.1:8b // gemma3:12b
-llm = LOCAL_LLM(
-    model=model,
-)
+# máximo de tokens do texto do artigo no prompt (None = texto inteiro)
+TEXT_BUDGET_TOKENS = 1024
+_llm = None
+_llm_lock = threading.Lock()
+_budget_tools = None
+
+
+def get_llm():
+    """LOCAL_LLM do juiz, criado só no primeiro uso (importar o módulo não abre conexões)."""
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            _llm = LOCAL_LLM(
+                model=model,
+            )
+        return _llm
+
+
+def _get_budget_tools():
+    """(embedder, contador de tokens) usados para escolher os trechos do artigo."""
+    global _budget_tools
+    with _llm_lock:
+        if _budget_tools is None:
+            try:
+                from embedder import HuggingFaceEmbedder
+            except ImportError:  # importado como modules.judge_content_based
+                from modules.embedder import HuggingFaceEmbedder
+
+            _budget_tools = (HuggingFaceEmbedder(), TokenCounter())
+        return _budget_tools
+
+
+def fit_content(page_content: dict, sentence: str,
+                budget_tokens: int | None = TEXT_BUDGET_TOKENS) -> dict:
+    """Limita o texto do artigo aos trechos mais relevantes para a sentença."""
+    if not budget_tokens or not page_content.get('text'):
+        return page_content
+    embedder, counter = _get_budget_tools()
+    text = select_passages(page_content['text'], sentence, embedder,
+                           budget_tokens=budget_tokens, counter=counter)
+    return {**page_content, 'text': text}
 
 
 base_prompt = """
@@ -24,12 +72,104 @@ Sentence to be classified: >>> "{}". <<< End of the sentence.
 """
 
 
-def judge_content_based(url , sentence):
+def has_text(page_content: dict | None) -> bool:
+    """True se a extração trouxe texto de artigo para julgar."""
+    return bool(page_content and (page_content.get('text') or '').strip())
+
+
+def build_prompt(page_content: dict, sentence: str) -> str:
+    if not has_text(page_content):
+        # sem texto o modelo julgaria a string "None"
+        raise ValueError("page_content sem texto: não há artigo para julgar")
+    return base_prompt.format(page_content.get('title') or '',
+                              page_content['text'],
+                              sentence,
+                              )
+
+
+def judge_content_based(url , sentence, budget_tokens: int | None = TEXT_BUDGET_TOKENS):
+    """Resposta do juiz ('fake' / 'real' / 'unrelated'); None se a página não tiver texto (como em judge_many)."""
     page_content = extract_page_content(url)
-    prompt = base_prompt.format(page_content['newspaper_title'],
-                                page_content['trafilatura_text'],
-                                sentence,
-                                )
+    if not has_text(page_content):
+        return None
+    page_content = fit_content(page_content, sentence, budget_tokens)
+    prompt = build_prompt(page_content, sentence)
     #print(prompt)
-    response = llm.generate(prompt=prompt, temperature=0.1)
-    return response.strip().lower()
\ No newline at end of file
+    response = get_llm().generate(prompt=prompt, temperature=0.1)
+    return response.strip().lower()
+
+
+_DONE = object()
+
+
+def judge_many(pairs: Iterable[Tuple[str, str]], fetch_workers: int = 16, batch_size: int = 16,
+               queue_size: int = 64, temperature: float = 0.1, llm=None,
+               fetcher=None, budget_tokens: int | None = TEXT_BUDGET_TOKENS) -> List[str | None]:
+    """
+    Julga vários pares (url, sentença) sobrepondo download e inferência:
+    um pool de `fetch_workers` threads baixa/extrai as páginas e as coloca
+    numa fila limitada (`queue_size`); a thread principal consome a fila e
+    envia tudo o que estiver pronto (até `batch_size`) em uma chamada
+    generate_many, enquanto os downloads seguintes continuam. O corte do
+    texto em `budget_tokens` também acontece nas threads de download.
+
+    Retorna as respostas na ordem de `pairs` ('fake' / 'real' / 'unrelated');
+    None quando a página não pôde ser lida ou a chamada ao LLM falhou.
+    """
+    pairs = list(pairs)
+    results: List[str | None] = [None] * len(pairs)
+    if not pairs:
+        return results
+    llm = llm or get_llm()
+    ready = queue.Queue(maxsize=queue_size)
+
+    def fetch(i):
+        url, sentence = pairs[i]
+        try:
+            content = fit_content(extract_page_content(url, fetcher=fetcher),
+                                  sentence, budget_tokens)
+        except Exception as e:
+            print(f"[ERRO] Falha ao extrair {url}: {e}")
+            content = None
+        # bloqueia quando a inferência está atrasada (fila cheia)
+        ready.put((i, content))
+
+    def produce():
+        try:
+            with ThreadPoolExecutor(max_workers=min(fetch_workers, len(pairs))) as pool:
+                list(pool.map(fetch, range(len(pairs))))
+        finally:
+            ready.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    done = False
+    while not done:
+        # tudo o que já está pronto (até batch_size) vai na mesma chamada
+        batch = []
+        item = ready.get()
+        while True:
+            if item is _DONE:
+                done = True
+                break
+            i, content = item
+            if has_text(content):
+                batch.append((i, content))
+            if len(batch) >= batch_size:
+                break
+            try:
+                item = ready.get_nowait()
+            except queue.Empty:
+                break
+
+        if not batch:
+            continue
+        prompts = [build_prompt(content, pairs[i][1]) for i, content in batch]
+        responses = llm.generate_many(prompts, temperature=temperature)
+        for (i, _), response in zip(batch, responses):
+            if isinstance(response, Exception):
+                print(f"[ERRO] LLM falhou para {pairs[i][0]}: {response}")
+            else:
+                results[i] = response.strip().lower()
+
+    return results
@@ -1,73 +1,377 @@
 # modules/llm.py
 import os
+import re
+import time
+import random
+import asyncio
+import threading
+import json
+import hashlib
+import weakref
+import email.utils
 import requests
+import httpx
 from typing import List, Dict
-import re
 
+try:
+    from help import estimate_tokens
+    from cache_store import SQLiteStore
+except ImportError:  # importado como modules.llm_base
+    from modules.help import estimate_tokens
+    from modules.cache_store import SQLiteStore
 
-class LLM:
-    """Classe base simples para chamadas a LLMs via API."""
 
-    def __init__(self, model: str, api_key_env: str, endpoint: str):
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "cache", "llm_responses.sqlite"
+)
+
+
+class ResponseCache:
+    """
+    Cache persistente de respostas, endereçado por hash de
+    (modelo, mensagens, temperatura). Guarda em SQLite com TTL e limite
+    de entradas (LRU); hits/misses ficam em `stats()`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_seconds: float | None = None,
+                 max_entries: int | None = 200_000):
+        self.store = SQLiteStore(path, table="llm_responses",
+                                 ttl_seconds=ttl_seconds, max_entries=max_entries)
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        relevant = {
+            "model": payload.get("model"),
+            "messages": payload.get("messages"),
+            "temperature": payload.get("temperature"),
+        }
+        raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, payload: dict) -> str | None:
+        value = self.store.get(self.key(payload))
+        return value.decode("utf-8") if value is not None else None
+
+    def put(self, payload: dict, response: str) -> None:
+        self.store.put(self.key(payload), response.encode("utf-8"))
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+class AsyncRateLimiter:
+    """Token bucket assíncrono: `per_minute` unidades por minuto (requisições ou tokens)."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        # pedidos maiores que o balde inteiro esperariam para sempre
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def _retry_after(resp, attempt: int, backoff: float) -> float:
+    """Segundos de espera: usa o header Retry-After quando existir, senão backoff exponencial."""
+    value = resp.headers.get("retry-after") if resp is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+            return max(0.0, parsed.timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return backoff * (2 ** attempt) + random.uniform(0, backoff)
+
+
+class _BaseLLM:
+    """
+    Lógica comum de transporte: sessão HTTP reaproveitada, retry com backoff
+    (respeitando Retry-After em 429/5xx) e geração concorrente via httpx.
+    O httpx.AsyncClient (e os limites por minuto) é um por event loop e dura
+    enquanto a instância viver; generate_many usa sempre o mesmo loop, numa
+    thread da instância. close() fecha as conexões.
+    Subclasses definem system_prompt, _build_payload e _parse_response.
+    """
+
+    system_prompt = "You are an assistant for fake news detection."
+
+    def __init__(
+        self,
+        model: str,
+        endpoint: str,
+        headers: Dict[str, str] | None = None,
+        timeout: float = 60.0,
+        max_retries: int = 4,
+        backoff: float = 1.0,
+        max_concurrency: int = 8,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        verify: bool = False,
+        cache: ResponseCache | None = None,
+        cache_path: str | None = DEFAULT_CACHE_PATH,
+        cache_ttl: float | None = None,
+        cache_max_temperature: float = 0.0,
+    ):
+        """
+        timeout: tempo máximo (s) de cada requisição
+        max_retries: novas tentativas em erro de rede, 429 ou 5xx
+        max_concurrency: requisições simultâneas em generate_many
+        requests_per_minute / tokens_per_minute: limites do provedor (None = sem limite)
+        cache / cache_path: cache de respostas (cache_path=None desliga)
+        cache_ttl: validade (s) das respostas em cache (None = sem expiração)
+        cache_max_temperature: só usa o cache até essa temperatura
+                               (acima dela as respostas não são determinísticas)
+        """
         self.model = model
-        self.api_key = os.getenv(api_key_env)
-        if not self.api_key:
-            raise ValueError(f"⚠️ Variável de ambiente {api_key_env} não definida.")
         self.endpoint = endpoint
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        self.headers = headers or {"Content-Type": "application/json"}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.verify = verify
+        self._session = None
+        # loop -> (cliente, semáforo, limitador de requisições, de tokens)
+        self._async_state = weakref.WeakKeyDictionary()
+        self._loop = None
+        self._loop_thread = None
+        self._lock = threading.Lock()
+        if cache is None and cache_path:
+            cache = ResponseCache(cache_path, ttl_seconds=cache_ttl)
+        self.cache = cache
+        self.cache_max_temperature = cache_max_temperature
+
+    # ---- formato da API (subclasses) ----
+    def _build_payload(self, prompt: str, temperature: float) -> dict:
+        raise NotImplementedError("Subclasses devem implementar este método.")
+
+    def _parse_response(self, result: dict) -> str:
+        raise NotImplementedError("Subclasses devem implementar este método.")
+
+    def _messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _cache_get(self, payload: dict) -> str | None:
+        if self.cache is None or payload["temperature"] > self.cache_max_temperature:
+            return None
+        return self.cache.get(payload)
+
+    def _cache_put(self, payload: dict, response: str) -> None:
+        if self.cache is not None and payload["temperature"] <= self.cache_max_temperature:
+            self.cache.put(payload, response)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache is not None else {}
+
+    # ---- síncrono ----
+    @property
+    def session(self) -> requests.Session:
+        # keep-alive: reaproveita a conexão TCP/TLS entre chamadas
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+        return self._session
 
     def generate(self, prompt: str, temperature: float = 0.0) -> str:
         """Gera texto a partir de um prompt, ignorando SSL."""
+        payload = self._build_payload(prompt, temperature)
+        cached = self._cache_get(payload)
+        if cached is not None:
+            return cached
 
-        messages = [
-            {"role": "system", "content": "You are an assistant for fake news detection."},
-            {"role": "user", "content": prompt}
+        for attempt in range(self.max_retries + 1):
+            resp = None
+            try:
+                resp = self.session.post(self.endpoint, json=payload,
+                                         timeout=self.timeout, verify=self.verify)
+                if resp.status_code not in RETRY_STATUS:
+                    resp.raise_for_status()
+                    response = self._parse_response(resp.json())
+                    self._cache_put(payload, response)
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            if attempt == self.max_retries:
+                resp.raise_for_status()
+            time.sleep(_retry_after(resp, attempt, self.backoff))
+
+    # ---- assíncrono ----
+    async def agenerate(self, client: httpx.AsyncClient, prompt: str, temperature: float = 0.0,
+                        semaphore: asyncio.Semaphore | None = None,
+                        request_limiter: AsyncRateLimiter | None = None,
+                        token_limiter: AsyncRateLimiter | None = None) -> str:
+        payload = self._build_payload(prompt, temperature)
+        cached = self._cache_get(payload)
+        if cached is not None:
+            return cached
+
+        for attempt in range(self.max_retries + 1):
+            if request_limiter:
+                await request_limiter.acquire()
+            if token_limiter:
+                await token_limiter.acquire(estimate_tokens(prompt))
+
+            resp = None
+            try:
+                if semaphore:
+                    async with semaphore:
+                        resp = await client.post(self.endpoint, json=payload)
+                else:
+                    resp = await client.post(self.endpoint, json=payload)
+                if resp.status_code not in RETRY_STATUS:
+                    resp.raise_for_status()
+                    response = self._parse_response(resp.json())
+                    self._cache_put(payload, response)
+                    return response
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            if attempt == self.max_retries:
+                resp.raise_for_status()
+            await asyncio.sleep(_retry_after(resp, attempt, self.backoff))
+
+    def _state_for_loop(self) -> tuple:
+        """Cliente httpx, semáforo e limitadores do event loop atual (criados uma vez)."""
+        loop = asyncio.get_running_loop()
+        state = self._async_state.get(loop)
+        if state is None or state[0].is_closed:
+            limits = httpx.Limits(max_connections=self.max_concurrency,
+                                  max_keepalive_connections=self.max_concurrency)
+            state = (
+                httpx.AsyncClient(headers=self.headers, timeout=self.timeout,
+                                  limits=limits, verify=self.verify),
+                asyncio.Semaphore(self.max_concurrency),
+                AsyncRateLimiter(self.requests_per_minute) if self.requests_per_minute else None,
+                AsyncRateLimiter(self.tokens_per_minute) if self.tokens_per_minute else None,
+            )
+            self._async_state[loop] = state
+        return state
+
+    async def agenerate_many(self, prompts: List[str], temperature: float = 0.0) -> list:
+        client, semaphore, request_limiter, token_limiter = self._state_for_loop()
+        tasks = [
+            self.agenerate(client, p, temperature, semaphore, request_limiter, token_limiter)
+            for p in prompts
         ]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _run(self, coro):
+        """Executa `coro` no event loop da instância (thread própria, criada no primeiro uso)."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name="llm-loop", daemon=True)
+                self._loop_thread.start()
+            loop = self._loop
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def generate_many(self, prompts: List[str], temperature: float = 0.0) -> list:
+        """
+        Gera respostas para vários prompts em paralelo (limitado por
+        max_concurrency e pelos limites por minuto). Retorna uma lista na
+        mesma ordem dos prompts; prompts que falharam trazem a exceção.
+        Funciona também com um loop já rodando (ex.: Jupyter), pois as
+        chamadas vão para o loop da instância.
+        """
+        return self._run(self.agenerate_many(prompts, temperature))
+
+    async def aclose(self) -> None:
+        """Fecha o cliente httpx do event loop atual."""
+        state = self._async_state.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].aclose()
+
+    def close(self) -> None:
+        """Fecha a sessão requests, os clientes httpx e o loop da instância."""
+        with self._lock:
+            loop, thread, self._loop, self._loop_thread = self._loop, self._loop_thread, None, None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        # clientes criados em loops de quem chamou agenerate_many
+        for other, state in list(self._async_state.items()):
+            self._async_state.pop(other, None)
+            if other.is_closed():
+                continue
+            if other.is_running():
+                asyncio.run_coroutine_threadsafe(state[0].aclose(), other)
+            else:
+                other.run_until_complete(state[0].aclose())
 
-        payload = {
+
+class LLM(_BaseLLM):
+    """Classe base simples para chamadas a LLMs via API."""
+
+    def __init__(self, model: str, api_key_env: str, endpoint: str, **kwargs):
+        api_key = os.getenv(api_key_env)
+        if not api_key:
+            raise ValueError(f"⚠️ Variável de ambiente {api_key_env} não definida.")
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        super().__init__(model=model, endpoint=endpoint, headers=headers, **kwargs)
+        self.api_key = api_key
+
+    def _build_payload(self, prompt: str, temperature: float) -> dict:
+        return {
             "model": self.model,
-            "messages": messages,
+            "messages": self._messages(prompt),
             "temperature": temperature
         }
 
-        resp = requests.post(self.endpoint, headers=self.headers, json=payload, timeout=60, verify=False)
-        resp.raise_for_status()
-        result = resp.json()
+    def _parse_response(self, result: dict) -> str:
         return result["choices"][0]["message"]["content"].strip()
 
 
 ## Pessoal essa classe faz a mesma coisa q a de cima, depois vejam se precisa ficar!!
-class LOCAL_LLM:
+class LOCAL_LLM(_BaseLLM):
     """Classe base simples para chamadas a LLMs localmente."""
 
-    def __init__(self, model: str, endpoint: str = "http://localhost:11434/api/chat/"):
-        self.model = model        
-        self.endpoint = endpoint
+    system_prompt = "You are a multipurpose assistant."
 
-    def generate(self, prompt: str, temperature: float = 0.0) -> str:
-        """Gera texto a partir de um prompt, ignorando SSL."""
+    def __init__(self, model: str, endpoint: str = "http://localhost:11434/api/chat/", **kwargs):
+        super().__init__(model=model, endpoint=endpoint, **kwargs)
 
-        messages = [
-            {"role": "system", "content": "You are a multipurpose assistant."},
-            {"role": "user", "content": prompt}
-        ]
-
-        payload = {
+    def _build_payload(self, prompt: str, temperature: float) -> dict:
+        return {
             "model": self.model,
-            "messages": messages,
+            "messages": self._messages(prompt),
             "temperature": temperature,
             "stream": False
         }
 
-        resp = requests.post(self.endpoint, json=payload, timeout=60, verify=False)
-        resp.raise_for_status()
-        
-        result = resp.json()
+    def _parse_response(self, result: dict) -> str:
         result = result["message"]["content"].strip()
         result = re.sub(r"""['"“”‘’‹›«»‛‟❛❜❝❞⹂]""", "", result)
-        print (result)
         return result
-
@@ -0,0 +1,203 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/127.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9,pt-BR;q=0.8",
+    "Referer": "https://www.google.com/",
+}
+
+
+class PageFetcher:
+    """
+    Camada de download compartilhada: sessão HTTP com pool de conexões,
+    limite de requisições simultâneas por host e cache negativo para hosts
+    que falharam/estouraram o timeout (evita esperar de novo pelo mesmo host).
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 7.0,
+        per_host_limit: int = 2,
+        pool_size: int = 32,
+        negative_ttl: float = 600.0,
+        max_bytes: int = 5_000_000,
+        headers: Dict[str, str] | None = None,
+        store=None,
+        revalidate_after: float = 7 * 24 * 3600,
+        offline: bool = False,
+    ):
+        """
+        per_host_limit: downloads simultâneos permitidos em um mesmo host
+        negative_ttl: segundos que um host fica bloqueado após falhar
+        max_bytes: páginas maiores que isso são ignoradas
+        store: PageStore onde as páginas baixadas ficam guardadas (None = sem acervo)
+        revalidate_after: idade (s) a partir da qual a página guardada é
+                          revalidada com If-None-Match/If-Modified-Since
+        offline: só usa o acervo, nunca acessa a rede
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.per_host_limit = per_host_limit
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self.store = store
+        self.revalidate_after = revalidate_after
+        self.offline = offline
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._bad_hosts: Dict[str, float] = {}
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc.lower()
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def is_blocked(self, host: str) -> bool:
+        with self._lock:
+            until = self._bad_hosts.get(host)
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del self._bad_hosts[host]
+                return False
+            return True
+
+    def _mark_bad(self, host: str) -> None:
+        with self._lock:
+            self._bad_hosts[host] = time.monotonic() + self.negative_ttl
+
+    def get(self, url: str, headers: Dict[str, str] | None = None) -> requests.Response | None:
+        """
+        GET respeitando o limite por host e o cache negativo. Retorna a
+        resposta (qualquer status) ou None se o host está bloqueado/falhou.
+        """
+        host = self.host_of(url)
+        if not host or self.is_blocked(host):
+            return None
+
+        with self._slot(host):
+            try:
+                resp = self.session.get(url, timeout=self.timeout, headers=headers,
+                                        stream=True, allow_redirects=True)
+                length = resp.headers.get("content-length")
+                if length and length.isdigit() and int(length) > self.max_bytes:
+                    resp.close()
+                    return None
+                resp._content = resp.raw.read(self.max_bytes + 1, decode_content=True)
+                resp._content_consumed = True
+                resp.close()
+                if len(resp._content) > self.max_bytes:
+                    return None
+                return resp
+            except (requests.ConnectionError, requests.Timeout):
+                self._mark_bad(host)
+                return None
+            except requests.RequestException:
+                return None
+
+    def fetch(self, url: str) -> str | None:
+        """
+        HTML de `url`; None em erro, status != 2xx ou conteúdo não-HTML.
+        Com acervo, páginas recentes vêm do disco, as antigas são revalidadas
+        (304 reaproveita a cópia) e, se a rede falhar, a cópia antiga é usada.
+        """
+        cached = self.store.get(url) if self.store is not None else None
+        if cached is not None:
+            if self.offline or time.time() - cached["fetched_at"] < self.revalidate_after:
+                return cached["html"]
+        elif self.offline:
+            return None
+
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        stale = cached["html"] if cached is not None else None
+        resp = self.get(url, headers=headers or None)
+        if resp is None:
+            return stale
+        if resp.status_code == 304 and cached is not None:
+            self.store.touch(url)
+            return stale
+        if resp.status_code >= 500:
+            self._mark_bad(self.host_of(url))
+            return stale
+        if not resp.ok:
+            return None
+        ctype = resp.headers.get("content-type", "")
+        if ctype and "html" not in ctype and "xml" not in ctype:
+            return None
+        if not resp.encoding or resp.encoding.lower() == "iso-8859-1":
+            # requests assume latin-1 quando o header não traz charset
+            resp.encoding = resp.apparent_encoding
+        html = resp.text
+
+        if self.store is not None:
+            self.store.put(url, html, final_url=resp.url,
+                           etag=resp.headers.get("etag"),
+                           last_modified=resp.headers.get("last-modified"))
+        return html
+
+    def fetch_many(self, urls: List[str], max_workers: int = 16) -> List[str | None]:
+        """Baixa várias páginas em paralelo (mantendo a ordem de `urls`)."""
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+            return list(pool.map(self.fetch, urls))
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def get_default_fetcher() -> PageFetcher:
+    """
+    PageFetcher compartilhado pelo processo (criado no primeiro uso), guardando
+    as páginas no acervo padrão (cache/pages.sqlite).
+
+    PAGE_STORE=0 desliga o acervo; PAGE_FETCHER_OFFLINE=1 reexecuta só com
+    as páginas já guardadas, sem acessar a rede.
+    """
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            store = None
+            if os.getenv("PAGE_STORE", "1") != "0":
+                try:
+                    from page_store import PageStore
+                except ImportError:  # importado como modules.page_fetcher
+                    from modules.page_store import PageStore
+                store = PageStore()
+            _default_fetcher = PageFetcher(
+                store=store, offline=os.getenv("PAGE_FETCHER_OFFLINE", "0") == "1"
+            )
+        return _default_fetcher
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterator, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "cache", "pages.sqlite"
+)
+
+# parâmetros de rastreamento que não mudam o conteúdo da página
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid",
+                   "ref", "ref_src", "cmpid", "ocid", "taid", "smid"}
+
+
+def content_hash(html: str) -> str:
+    """Endereço do conteúdo no acervo (sha1 do HTML em UTF-8)."""
+    return hashlib.sha1(html.encode("utf-8")).hexdigest()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Forma canônica da URL usada como chave: esquema/host em minúsculas, sem
+    porta padrão, sem fragmento, sem parâmetros de rastreamento (utm_*, fbclid...),
+    query ordenada e sem barra final no path.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    # http e https apontam para a mesma página na prática
+    return urlunsplit(("https" if scheme in ("http", "https") else scheme,
+                       host, path, urlencode(query), ""))
+
+
+class PageStore:
+    """
+    Acervo local de páginas baixadas: HTML comprimido (zlib), endereçado pelo
+    hash do conteúdo, mais os campos extraídos por versão do extrator.
+
+    Cada URL normalizada (e o link canônico da página, como alias) aponta
+    para um conteúdo. ETag/Last-Modified ficam guardados para revalidação
+    condicional (ver PageFetcher). Acima de `max_bytes` comprimidos, remove
+    as páginas acessadas há mais tempo.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, max_bytes: int | None = 2_000_000_000,
+                 compression_level: int = 6):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url_key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                url TEXT,
+                final_url TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_accessed_idx ON pages (accessed_at);
+            CREATE INDEX IF NOT EXISTS pages_content_idx ON pages (content_hash);
+
+            CREATE TABLE IF NOT EXISTS contents (
+                content_hash TEXT PRIMARY KEY,
+                html BLOB NOT NULL,
+                size INTEGER NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS extracted (
+                content_hash TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (content_hash, version)
+            );
+        """)
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    # ---- páginas ----
+    def get(self, url: str) -> Dict | None:
+        """
+        Página guardada para `url` (ou None): dict com html, url, final_url,
+        etag, last_modified, fetched_at e content_hash.
+        """
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT p.url_key, p.url, p.final_url, p.etag, p.last_modified,
+                       p.fetched_at, p.content_hash, c.html
+                FROM pages p JOIN contents c ON c.content_hash = p.content_hash
+                WHERE p.url_key = ?
+            """, (normalize_url(url),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url_key = ?",
+                               (time.time(), row[0]))
+            self._conn.commit()
+        return {
+            "url": row[1],
+            "final_url": row[2],
+            "etag": row[3],
+            "last_modified": row[4],
+            "fetched_at": row[5],
+            "content_hash": row[6],
+            "html": zlib.decompress(row[7]).decode("utf-8"),
+        }
+
+    def put(self, url: str, html: str, final_url: str | None = None,
+            etag: str | None = None, last_modified: str | None = None) -> str:
+        """Guarda a página (e a URL final após redirects, como alias). Retorna o hash do conteúdo."""
+        raw = html.encode("utf-8")
+        chash = content_hash(html)
+        now = time.time()
+        keys = {normalize_url(url)}
+        if final_url:
+            keys.add(normalize_url(final_url))
+
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM contents WHERE content_hash = ?", (chash,)
+            ).fetchone()
+            if not exists:
+                blob = zlib.compress(raw, self.compression_level)
+                self._conn.execute(
+                    "INSERT INTO contents (content_hash, html, size) VALUES (?, ?, ?)",
+                    (chash, blob, len(blob)),
+                )
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO pages
+                    (url_key, content_hash, url, final_url, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(k, chash, url, final_url or url, etag, last_modified, now, now)
+                  for k in keys])
+            self._evict()
+            self._conn.commit()
+        return chash
+
+    def touch(self, url: str) -> None:
+        """Marca a página como revalidada agora (resposta 304)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url_key = ?",
+                (now, now, normalize_url(url)),
+            )
+            self._conn.commit()
+
+    def add_alias(self, alias_url: str, url: str) -> None:
+        """Faz `alias_url` (ex.: link canônico) apontar para o mesmo conteúdo de `url`."""
+        alias_key, key = normalize_url(alias_url), normalize_url(url)
+        if alias_key == key:
+            return
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR IGNORE INTO pages
+                    (url_key, content_hash, url, final_url, etag, last_modified, fetched_at, accessed_at)
+                SELECT ?, content_hash, ?, final_url, etag, last_modified, fetched_at, accessed_at
+                FROM pages WHERE url_key = ?
+            """, (alias_key, alias_url, key))
+            self._conn.commit()
+
+    # ---- campos extraídos ----
+    def get_extracted(self, content_hash: str, version: int) -> Dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM extracted WHERE content_hash = ? AND version = ?",
+                (content_hash, version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_extracted(self, content_hash: str, version: int, data: Dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extracted (content_hash, version, data) VALUES (?, ?, ?)",
+                (content_hash, version, json.dumps(data, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def iter_pages(self) -> Iterator[Tuple[str, str, str]]:
+        """Percorre o acervo: (url, content_hash, html), um por conteúdo distinto."""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT MIN(url), content_hash FROM pages GROUP BY content_hash
+            """).fetchall()
+        for url, content_hash in rows:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT html FROM contents WHERE content_hash = ?", (content_hash,)
+                ).fetchone()
+            if row:
+                yield url, content_hash, zlib.decompress(row[0]).decode("utf-8")
+
+    # ---- manutenção ----
+    def _evict(self) -> None:
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        while total > self.max_bytes:
+            victims = self._conn.execute("""
+                SELECT p.url_key, p.content_hash, c.size
+                FROM pages p JOIN contents c ON c.content_hash = p.content_hash
+                ORDER BY p.accessed_at ASC LIMIT 500
+            """).fetchall()
+            if not victims:
+                break
+            # remove só o necessário para voltar abaixo do limite
+            excess, freed, seen, chosen = total - self.max_bytes, 0, set(), []
+            for url_key, chash, size in victims:
+                chosen.append((url_key,))
+                if chash not in seen:
+                    seen.add(chash)
+                    freed += size
+                if freed >= excess:
+                    break
+            self._conn.executemany("DELETE FROM pages WHERE url_key = ?", chosen)
+            self._conn.execute("""
+                DELETE FROM contents WHERE content_hash NOT IN (SELECT content_hash FROM pages)
+            """)
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+        self._conn.execute("""
+            DELETE FROM extracted WHERE content_hash NOT IN (SELECT content_hash FROM contents)
+        """)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        with self._lock:
+            urls = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            contents, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM contents"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "urls": urls,
+            "contents": contents,
+            "bytes": size,
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
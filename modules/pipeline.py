@@ -0,0 +1,345 @@
+import time
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence
+
+try:
+    from prefilter import DEFAULT_THRESHOLDS, prefilter_results
+    from prompt_builder import build_prompt, normalize_verdict
+    from retrieval_runner import RateLimiter, search_with_retries
+    from search_engines import apply_refiner
+except ImportError:  # importado como modules.pipeline
+    from modules.prefilter import DEFAULT_THRESHOLDS, prefilter_results
+    from modules.prompt_builder import build_prompt, normalize_verdict
+    from modules.retrieval_runner import RateLimiter, search_with_retries
+    from modules.search_engines import apply_refiner
+
+
+RESULT_COLUMNS = ("search_title", "shuffle_id", "response", "true_class")
+
+_END = object()
+
+
+class Stage:
+    """
+    Etapa do pipeline: `workers` threads leem da fila de entrada, aplicam
+    `fn` e passam o item adiante. Com batch_size > 1, `fn` recebe uma lista
+    com o que já estiver na fila (até batch_size itens) e altera os itens
+    in-place; senão recebe um item por vez.
+
+    Itens são dicts (shuffle_id, headline, results, prompt, response, ...).
+    Itens com erro ou já respondidos (ex.: hit no ClaimCache) atravessam a
+    etapa sem chamar `fn`, exceto em etapas com always=True (persistência).
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, batch_size: int = 1,
+                 queue_size: int | None = None, always: bool = False):
+        """queue_size: tamanho da fila de entrada (None = o padrão do Pipeline)"""
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.queue_size = queue_size
+        self.always = always
+
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _wants(self, item: dict) -> bool:
+        return self.always or (item.get("error") is None and item.get("response") is None)
+
+    def _take(self, inbox: queue.Queue) -> List[dict] | None:
+        """Um item (bloqueante) + o que já estiver pronto na fila, até batch_size."""
+        first = inbox.get()
+        if first is _END:
+            inbox.put(_END)  # os outros workers da etapa também precisam ver o fim
+            return None
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is _END:
+                inbox.put(_END)
+                break
+            batch.append(item)
+        return batch
+
+    def _apply(self, batch: List[dict]) -> None:
+        todo = [item for item in batch if self._wants(item)]
+        had_error = [item.get("error") is not None for item in todo]
+        t0 = time.perf_counter()
+        try:
+            if todo:
+                if self.batch_size > 1:
+                    self.fn(todo)
+                else:
+                    self.fn(todo[0])
+        except Exception as e:
+            for item in todo:
+                item["error"] = f"{self.name}: {e}"
+        busy = time.perf_counter() - t0
+        with self._lock:
+            self.busy_seconds += busy
+            self.skipped += len(batch) - len(todo)
+            for item, had in zip(todo, had_error):
+                if item.get("error") is not None and not had:
+                    self.failed += 1
+                else:
+                    self.processed += 1
+
+    def work(self, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        while True:
+            batch = self._take(inbox)
+            if batch is None:
+                return
+            self._apply(batch)
+            for item in batch:
+                outbox.put(item)  # bloqueia se a próxima etapa estiver atrasada (backpressure)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "busy_seconds": round(self.busy_seconds, 2),
+        }
+
+
+class Pipeline:
+    """
+    Encadeia etapas por filas limitadas: cada etapa roda com a sua
+    concorrência e, quando a seguinte não dá conta, a fila enche e a
+    anterior espera (a memória fica limitada a ~queue_size itens por etapa).
+
+    `run` consome os itens de entrada sob demanda (pode ser um gerador
+    lendo stdin) e devolve os itens prontos conforme saem da última etapa,
+    fora da ordem de entrada.
+    """
+
+    def __init__(self, stages: Sequence[Stage], queue_size: int = 64):
+        if not stages:
+            raise ValueError("Pipeline precisa de pelo menos uma etapa")
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.items_in = 0
+        self.items_out = 0
+        self.elapsed = 0.0
+
+    def run(self, items: Iterable[dict]) -> Iterator[dict]:
+        queues = [queue.Queue(maxsize=s.queue_size or self.queue_size) for s in self.stages]
+        queues.append(queue.Queue(maxsize=self.queue_size))
+        t0 = time.perf_counter()
+        feed_error = []
+
+        def feed():
+            try:
+                for item in items:
+                    queues[0].put(item)
+                    self.items_in += 1
+            except Exception as e:
+                feed_error.append(e)
+            finally:
+                queues[0].put(_END)
+
+        def run_stage(stage, inbox, outbox):
+            workers = [threading.Thread(target=stage.work, args=(inbox, outbox), daemon=True,
+                                        name=f"pipeline-{stage.name}-{i}")
+                       for i in range(stage.workers)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            outbox.put(_END)  # só quando todos os workers da etapa terminaram
+
+        threads = [threading.Thread(target=feed, daemon=True, name="pipeline-feed")]
+        threads += [threading.Thread(target=run_stage, args=(s, queues[i], queues[i + 1]), daemon=True,
+                                     name=f"pipeline-{s.name}")
+                    for i, s in enumerate(self.stages)]
+        for t in threads:
+            t.start()
+
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                break
+            self.items_out += 1
+            yield item
+
+        for t in threads:
+            t.join()
+        self.elapsed += time.perf_counter() - t0
+        if feed_error:
+            raise feed_error[0]
+
+    def stats(self) -> Dict[str, dict]:
+        return {s.name: s.stats() for s in self.stages}
+
+    def report(self) -> str:
+        rate = self.items_out / self.elapsed if self.elapsed else 0.0
+        lines = [f"{self.items_out} itens em {self.elapsed:.1f}s ({rate:.2f}/s)"]
+        for name, st in self.stats().items():
+            lines.append(f"  {name:<10} workers={st['workers']:<3} ok={st['processed']:<6} "
+                         f"erro={st['failed']:<5} pulados={st['skipped']:<6} ocupado={st['busy_seconds']}s")
+        return "\n".join(lines)
+
+
+# ---- etapas do detector ----
+
+def cache_stage(claim_cache, source: str, batch_size: int = 32) -> Stage:
+    """Reaproveita veredictos do ClaimCache (só os de `source`); itens com hit pulam as etapas seguintes."""
+    def lookup(batch):
+        records = claim_cache.lookup_many([item["headline"] for item in batch], source)
+        for item, record in zip(batch, records):
+            if record is not None and record.get("verdict") is not None:
+                item["response"] = record["verdict"]
+                item["results"] = record.get("results")
+                item["cached"] = record["match"]
+                item["matched_headline"] = record["matched_headline"]
+
+    return Stage("cache", lookup, workers=1, batch_size=batch_size)
+
+
+def retrieve_stage(engine_factory: Callable, num_results: int = 10, workers: int = 4,
+                   rate: float | None = None, burst: int = 1, max_retries: int = 2) -> Stage:
+    """
+    Busca web da manchete. engine_factory cria um SearchEngine por thread
+    (o cliente DDGS não é seguro entre threads); use-o sem TitleRefiner
+    para que o refinamento rode na etapa própria.
+    """
+    limiter = RateLimiter(rate, burst) if rate else None
+    local = threading.local()
+
+    def retrieve(item):
+        if not hasattr(local, "engine"):
+            local.engine = engine_factory()
+        item["results"] = search_with_retries(local.engine, item["headline"], num_results,
+                                              limiter, max_retries)
+
+    return Stage("retrieve", retrieve, workers=workers)
+
+
+def refine_stage(title_refiner, workers: int = 4) -> Stage:
+    """Completa os títulos truncados dos resultados (TitleRefiner.refine_many)."""
+    def refine(item):
+        apply_refiner(title_refiner, item["results"])
+
+    return Stage("refine", refine, workers=workers)
+
+
+def prefilter_stage(embedder, credible_domains_file: str = "./data/credible_sources.txt",
+                    thresholds: Sequence[float] = DEFAULT_THRESHOLDS, top_x: int | None = 10,
+                    workers: int = 1) -> Stage:
+    """prefilter_results + os top_x mais similares (mesma seleção do generate_prompts)."""
+    def prefilter(item):
+        kept = prefilter_results(item["results"] or [], item["headline"], embedder,
+                                 credible_domains_file=credible_domains_file, thresholds=thresholds)
+        kept.sort(key=lambda r: r["similarity"], reverse=True)
+        item["results"] = kept[:top_x] if top_x else kept
+
+    return Stage("prefilter", prefilter, workers=workers)
+
+
+def prompt_stage(mode: str = "test1") -> Stage:
+    def prompt(item):
+        item["prompt"] = build_prompt(mode=mode, title_to_check=item["headline"],
+                                      results_filtered=item["results"] or [])
+
+    return Stage("prompt", prompt, workers=1)
+
+
+def classify_stage(llm, batch_size: int = 16, temperature: float = 0.0, workers: int = 1) -> Stage:
+    """
+    Classifica em lotes com llm.generate_many (a concorrência das requisições
+    dentro do lote é a max_concurrency da LLM); falhas ficam em item['error'].
+    """
+    def classify(batch):
+        responses = llm.generate_many([item["prompt"] for item in batch], temperature=temperature)
+        for item, response in zip(batch, responses):
+            if isinstance(response, Exception):
+                item["error"] = f"classify: {response}"
+            else:
+                item["response"] = normalize_verdict(response)
+
+    return Stage("classify", classify, workers=workers, batch_size=batch_size)
+
+
+def persist_stage(writer=None, claim_cache=None, source: str | None = None,
+                  class_map: Dict[int, str] | None = None, batch_size: int = 64) -> Stage:
+    """
+    Grava as respostas novas: no Postgres via BufferedWriter (RESULT_COLUMNS,
+    itens com shuffle_id) e/ou no ClaimCache. Hits do cache não são
+    regravados no cache; no banco só entram os exatos (mesma manchete
+    normalizada): o veredicto de uma manchete apenas parecida ('semantic')
+    não é uma classificação desta e fica só na saída.
+    """
+    def persist(batch):
+        answered = [item for item in batch if item.get("error") is None and item.get("response") is not None]
+        if class_map is not None:
+            for item in answered:
+                # frame_items põe true_class=None quando o DataFrame não tem 'class'
+                if item.get("true_class") is None:
+                    item["true_class"] = class_map.get(item.get("shuffle_id"))
+        if writer is not None:
+            writer.add_many([(item["headline"], item["shuffle_id"], item["response"], item.get("true_class"))
+                             for item in answered
+                             if item.get("shuffle_id") is not None and item.get("cached") != "semantic"])
+        if claim_cache is not None:
+            claim_cache.put_many([{"headline": item["headline"], "verdict": item["response"],
+                                   "results": item.get("results"), "source": source}
+                                  for item in answered if not item.get("cached")])
+
+    return Stage("persist", persist, workers=1, batch_size=batch_size, always=True)
+
+
+def build_detector(engine_factory: Callable, embedder, llm, mode: str = "test1",
+                   title_refiner=None, claim_cache=None, writer=None,
+                   class_map: Dict[int, str] | None = None, source: str | None = None,
+                   credible_domains_file: str = "./data/credible_sources.txt",
+                   num_results: int = 10, top_x: int | None = 10,
+                   retrieve_workers: int = 4, refine_workers: int = 4, prefilter_workers: int = 1,
+                   classify_batch: int = 16, rate: float | None = None, burst: int = 1,
+                   queue_size: int = 64) -> Pipeline:
+    """
+    Pipeline completo do detector:
+    [cache] -> retrieve -> [refine] -> prefilter -> prompt -> classify -> persist.
+    As etapas entre colchetes só entram com claim_cache / title_refiner;
+    com claim_cache, `source` (mecanismo/teste/modelo) é obrigatório.
+    """
+    stages = []
+    if claim_cache is not None:
+        if not source:
+            raise ValueError("claim_cache precisa de source (ex.: 'google/test1/llama-3.1-8b-instant')")
+        stages.append(cache_stage(claim_cache, source))
+    stages.append(retrieve_stage(engine_factory, num_results=num_results, workers=retrieve_workers,
+                                 rate=rate, burst=burst))
+    if title_refiner is not None:
+        stages.append(refine_stage(title_refiner, workers=refine_workers))
+    stages += [
+        prefilter_stage(embedder, credible_domains_file=credible_domains_file, top_x=top_x,
+                        workers=prefilter_workers),
+        prompt_stage(mode),
+        classify_stage(llm, batch_size=classify_batch),
+        persist_stage(writer=writer, claim_cache=claim_cache, source=source, class_map=class_map),
+    ]
+    return Pipeline(stages, queue_size=queue_size)
+
+
+def headline_items(headlines: Iterable[str]) -> Iterator[dict]:
+    """Itens a partir de manchetes soltas (ex.: linhas do stdin), sem shuffle_id."""
+    for line in headlines:
+        line = line.strip()
+        if line:
+            yield {"shuffle_id": None, "headline": line}
+
+
+def frame_items(df) -> Iterator[dict]:
+    """Itens a partir do DataFrame de dataset.load_shuffled (shuffle_id, title[, class])."""
+    classes = df["class"] if "class" in df.columns else [None] * len(df)
+    for shuffle_id, title, true_class in zip(df["shuffle_id"], df["title"], classes):
+        yield {"shuffle_id": int(shuffle_id), "headline": title, "true_class": true_class}
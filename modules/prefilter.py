@@ -1,15 +1,68 @@
-from typing import List, Dict
-from sklearn.metrics.pairwise import cosine_similarity
-from help import load_credible_domains  # se você também modularizar o carregamento de domínios
+import os
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Sequence
+
+import numpy as np
+
+try:
+    from help import load_credible_domains  # se você também modularizar o carregamento de domínios
+except ImportError:  # importado como modules.prefilter
+    from modules.help import load_credible_domains
+
+DEFAULT_THRESHOLDS = (0.85, 0.80, 0.70)
+
+
+@lru_cache(maxsize=8)
+def _domain_set(path: str, mtime_ns: int) -> FrozenSet[str]:
+    return frozenset(_clean_domain(d) for d in load_credible_domains(path))
+
+
+def load_domain_set(file_path: str) -> FrozenSet[str]:
+    """Domínios confiáveis como conjunto, lidos uma vez por processo (relê se o arquivo mudar)."""
+    path = os.path.abspath(file_path)
+    return _domain_set(path, os.stat(path).st_mtime_ns)
+
+
+def _clean_domain(domain: str) -> str:
+    domain = domain.strip().lower().rstrip(".")
+    return domain[4:] if domain.startswith("www.") else domain
+
+
+def is_credible(domain, credible_domains: FrozenSet[str]) -> bool:
+    """True se o domínio ou algum domínio pai (edition.cnn.com -> cnn.com) estiver no conjunto."""
+    if not isinstance(domain, str) or not domain:
+        return False
+    domain = _clean_domain(domain)
+    while domain:
+        if domain in credible_domains:
+            return True
+        _, _, domain = domain.partition(".")
+    return False
+
+
+def select_by_threshold(scores: np.ndarray, thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> np.ndarray:
+    """
+    Máscara dos resultados mantidos: usa o primeiro limiar (na ordem dada)
+    atingido por pelo menos um score; se nenhum for atingido, mantém todos.
+    """
+    if len(scores) == 0:
+        return np.zeros(0, dtype=bool)
+    th = np.asarray(thresholds, dtype=np.float32)
+    reached = np.flatnonzero(th <= scores.max())
+    if len(reached) == 0:
+        return np.ones(len(scores), dtype=bool)
+    return scores >= th[reached[0]]
+
 
 def prefilter_results(
     results: List[Dict],
     original_title: str,
     embedder,
-    credible_domains_file: str = "./data/credible_sources.txt"
+    credible_domains_file: str = "./data/credible_sources.txt",
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
 ) -> List[Dict]:
 
-    credible_domains = load_credible_domains(credible_domains_file)
+    credible_domains = load_domain_set(credible_domains_file)
 
     # --- FILTRAR APENAS refined_title válido ---
     valid_items = []
@@ -25,33 +78,98 @@ def prefilter_results(
     if not valid_items:
         return []
 
-    # --- EMBEDDINGS ---
-    embeddings = embedder.encode(valid_titles)
-    original_emb = embedder.encode([original_title])
-    
-    sim_scores = cosine_similarity(original_emb, embeddings)[0]
-
-    # --- THRESHOLDS ---
-    thresholds = [0.85, 0.80, 0.70]
-    filtered_results = []
-
-    for th in thresholds:
-        filtered_results = []
-        for i, score in enumerate(sim_scores):
-            if score >= th:
-                r = valid_items[i].copy()
-                r["similarity"] = float(score)
-                r["credible"] = r["domain"] in credible_domains
-                filtered_results.append(r)
-        if filtered_results:
-            break
-
-    # Se nada passou no threshold, retorna todos com similarity
-    if not filtered_results:
-        for i, score in enumerate(sim_scores):
-            r = valid_items[i].copy()
-            r["similarity"] = float(score)
-            r["credible"] = r["domain"] in credible_domains
-            filtered_results.append(r)
-
-    return filtered_results
+    # --- EMBEDDINGS (título original + candidatos em uma chamada) ---
+    vectors = np.asarray(embedder.encode([original_title] + valid_titles), dtype=np.float32)
+    query, candidates = vectors[0], vectors[1:]
+    denom = np.linalg.norm(candidates, axis=1) * np.linalg.norm(query)
+    sim_scores = np.divide(candidates @ query, denom,
+                           out=np.zeros(len(candidates), dtype=np.float32), where=denom != 0)
+
+    # --- THRESHOLDS (se nada passar, retorna todos com similarity) ---
+    keep = np.flatnonzero(select_by_threshold(sim_scores, thresholds))
+
+    return [
+        {**valid_items[i],
+         "similarity": float(sim_scores[i]),
+         "credible": is_credible(valid_items[i].get("domain"), credible_domains)}
+        for i in keep
+    ]
+
+
+def prefilter_frame(
+    df,
+    embedder,
+    credible_domains_file: str = "./data/credible_sources.txt",
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    top_x: int | None = 10,
+):
+    """
+    prefilter_results para a tabela inteira de resultados (retrieved_news_*)
+    de uma vez, sem laço por título:
+
+    - remove duplicatas de original_title dentro de cada search_title;
+    - codifica todos os títulos únicos (buscados + refinados) em uma chamada;
+    - calcula a similaridade de cada resultado com o título buscado e aplica
+      a cascata de limiares por grupo com operações vetorizadas;
+    - ordena por similaridade e mantém os `top_x` melhores de cada título.
+
+    Retorna (resultados mantidos, estatísticas por título), ambos DataFrames.
+    """
+    import pandas as pd
+
+    credible_domains = load_domain_set(credible_domains_file)
+    # linhas "placeholder" (busca sem resultado) não têm original_title
+    real = df[df["original_title"].notna()]
+    total_before = real.groupby("search_title").size()
+
+    dedup = real.drop_duplicates(subset=["search_title", "original_title"])
+    after_dedup = dedup.groupby("search_title").size()
+
+    refined = dedup["refined_title"]
+    is_valid = refined.map(lambda t: isinstance(t, str) and t.strip() != "").astype(bool)
+    valid = dedup[is_valid].copy()
+    valid["refined_title"] = valid["refined_title"].str.strip()
+
+    if len(valid):
+        # um único encode para todos os textos distintos
+        codes, uniques = pd.factorize(
+            pd.concat([valid["search_title"], valid["refined_title"]], ignore_index=True)
+        )
+        vectors = np.asarray(embedder.encode(list(uniques)), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms != 0)
+        q_codes, c_codes = codes[:len(valid)], codes[len(valid):]
+        valid["similarity"] = np.einsum("ij,ij->i", vectors[q_codes], vectors[c_codes])
+
+        # limiar de cada grupo: o primeiro (na ordem dada) que o melhor score atinge
+        group_max = valid.groupby("search_title")["similarity"].transform("max").to_numpy()
+        th = np.asarray(thresholds, dtype=np.float32)
+        group_th = np.select([group_max >= t for t in th], th, default=-np.inf)
+        valid = valid[valid["similarity"].to_numpy() >= group_th]
+
+        domains = valid["domain"].unique()
+        credible = {d: is_credible(d, credible_domains) for d in domains}
+        valid["credible"] = valid["domain"].map(credible).fillna(False).astype(bool)
+    else:
+        valid = valid.assign(similarity=pd.Series(dtype=np.float32),
+                             credible=pd.Series(dtype=bool))
+
+    passed = valid.groupby("search_title").size()
+    valid = valid.sort_values(["search_title", "similarity"], ascending=[True, False], kind="stable")
+    if top_x:
+        valid = valid.groupby("search_title", sort=False).head(top_x)
+    kept = valid.groupby("search_title").size()
+
+    # mesmas colunas da tabela *_prefilter_stats gerada pelos notebooks
+    titles = df.groupby("search_title", sort=False)["shuffle_id"].first()
+    stats = pd.DataFrame({"search_title": titles.index, "shuffle_id": titles.to_numpy()})
+
+    def per_title(counts):
+        return stats["search_title"].map(counts).fillna(0).astype(int)
+
+    stats["total_before"] = per_title(total_before)
+    stats["duplicates_removed"] = stats["total_before"] - per_title(after_dedup)
+    stats["non_similar_removed"] = per_title(after_dedup) - per_title(passed)
+    stats["totat_after"] = per_title(passed)
+    stats["top_x_count"] = per_title(kept)
+    return valid.reset_index(drop=True), stats
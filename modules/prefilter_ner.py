@@ -1,7 +1,5 @@
 from typing import List, Dict
-from sklearn.metrics.pairwise import cosine_similarity
 from help import load_credible_domains  # se você também modularizar o carregamento de domínios
-from transformers import pipeline
 
 def prefilter_results(
     results: List[Dict],
@@ -24,6 +22,8 @@ def prefilter_results(
     if not valid_items:
         return []
 
+    from sklearn.metrics.pairwise import cosine_similarity
+
     embeddings = embedder.encode(valid_titles)
     original_emb = embedder.encode([original_title])
     
@@ -262,3 +262,8 @@ def build_prompt(mode: str, title_to_check: str, results_filtered: list):
         raise ValueError(f"Unknown prompt mode '{mode}'")
 
     return PROMPT_REGISTRY[mode](title_to_check, results_filtered)
+
+
+def normalize_verdict(response: str | None) -> str | None:
+    """Forma única do veredicto gravado (pipeline, serviço e claim cache): sem espaços, minúsculas."""
+    return response.strip().lower() if isinstance(response, str) else response
@@ -0,0 +1,140 @@
+from typing import Iterable, List, Set
+
+
+
+PROGRESS_TABLE = "retrieval_progress"
+
+# status possíveis de um shuffle_id
+STATUS_OK = "ok"          # busca retornou resultados e eles foram gravados
+STATUS_EMPTY = "empty"    # busca funcionou mas não retornou nada
+STATUS_FAILED = "failed"  # busca ou insert falharam (pode ser retentado)
+
+DONE_STATUSES = (STATUS_OK, STATUS_EMPTY)
+
+
+def ensure_progress_table(conn) -> None:
+    """Cria a tabela de checkpoint (um registro por engine + shuffle_id)."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} (
+                engine TEXT NOT NULL,
+                shuffle_id INT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INT NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TIMESTAMP NOT NULL DEFAULT now(),
+                PRIMARY KEY (engine, shuffle_id)
+            );
+        """)
+    conn.commit()
+
+
+def record_status(cur, engine: str, rows: Iterable[tuple]) -> None:
+    """
+    Grava (shuffle_id, status, erro) no checkpoint, incrementando attempts.
+    Usa o cursor recebido para ficar na mesma transação do insert dos resultados.
+    """
+    cur.executemany(f"""
+        INSERT INTO {PROGRESS_TABLE} (engine, shuffle_id, status, attempts, last_error, updated_at)
+        VALUES (%s, %s, %s, 1, %s, now())
+        ON CONFLICT (engine, shuffle_id) DO UPDATE SET
+            status = EXCLUDED.status,
+            attempts = {PROGRESS_TABLE}.attempts + 1,
+            last_error = EXCLUDED.last_error,
+            updated_at = now()
+    """, [(engine, int(sid), status, error) for sid, status, error in rows])
+
+
+def backfill_from_results(conn, engine: str, table: str) -> int:
+    """
+    Marca como concluídos os shuffle_ids que já têm linhas em `table` mas
+    nenhum checkpoint (execuções anteriores a esta tabela existir).
+    Linhas placeholder (original_title NULL) contam como 'empty'.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            INSERT INTO {PROGRESS_TABLE} (engine, shuffle_id, status, attempts)
+            SELECT %s, shuffle_id,
+                   CASE WHEN bool_or(original_title IS NOT NULL) THEN %s ELSE %s END,
+                   1
+            FROM {table}
+            WHERE shuffle_id IS NOT NULL
+            GROUP BY shuffle_id
+            ON CONFLICT (engine, shuffle_id) DO NOTHING
+        """, (engine, STATUS_OK, STATUS_EMPTY))
+        inserted = cur.rowcount
+    conn.commit()
+    return inserted
+
+
+def import_failure_reports(conn, engine: str, csv_paths: List[str]) -> int:
+    """
+    Importa os CSVs failed_titles_report_<engine>_*.csv como checkpoints
+    'failed' (sem sobrescrever ids que já estão ok/empty). Só entram as
+    linhas cuja coluna `engine` é `engine`; relatórios antigos, sem essa
+    coluna, não dizem de qual mecanismo são e são ignorados.
+    """
+    import pandas as pd
+
+    frames = []
+    for path in csv_paths:
+        frame = pd.read_csv(path)
+        if "engine" not in frame.columns:
+            print(f"[AVISO] {path} não tem a coluna 'engine' (relatório antigo); ignorado")
+            continue
+        frames.append(frame[frame["engine"] == engine])
+    if not frames:
+        return 0
+    df = pd.concat(frames).drop_duplicates(subset="shuffle_id", keep="last")
+    if df.empty:
+        return 0
+
+    with conn.cursor() as cur:
+        cur.executemany(f"""
+            INSERT INTO {PROGRESS_TABLE} (engine, shuffle_id, status, attempts, last_error)
+            VALUES (%s, %s, %s, 1, %s)
+            ON CONFLICT (engine, shuffle_id) DO UPDATE SET
+                status = EXCLUDED.status,
+                last_error = EXCLUDED.last_error,
+                updated_at = now()
+            WHERE {PROGRESS_TABLE}.status NOT IN %s
+        """, [
+            (engine, int(r.shuffle_id), STATUS_FAILED, str(r.reason), DONE_STATUSES)
+            for r in df.itertuples(index=False)
+        ])
+    conn.commit()
+    return len(df)
+
+
+def done_shuffle_ids(conn, engine: str, start_id: int, end_id: int | None,
+                     max_attempts: int | None = None) -> Set[int]:
+    """
+    shuffle_ids do intervalo que não precisam ser processados de novo:
+    os concluídos (ok/empty) e os que falharam `max_attempts` vezes ou mais
+    (max_attempts=None: só os concluídos, para retentar todas as falhas).
+    """
+    query = f"""
+        SELECT shuffle_id FROM {PROGRESS_TABLE}
+        WHERE engine = %s AND shuffle_id >= %s
+          AND (%s IS NULL OR shuffle_id < %s)
+          AND (status IN %s OR (%s IS NOT NULL AND attempts >= %s))
+    """
+    with conn.cursor() as cur:
+        cur.execute(query, (engine, start_id, end_id, end_id, DONE_STATUSES,
+                            max_attempts, max_attempts))
+        ids = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    return ids
+
+
+def failed_shuffle_ids(conn, engine: str, start_id: int, end_id: int | None) -> Set[int]:
+    """shuffle_ids do intervalo cujo último status é 'failed'."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT shuffle_id FROM {PROGRESS_TABLE}
+            WHERE engine = %s AND status = %s AND shuffle_id >= %s
+              AND (%s IS NULL OR shuffle_id < %s)
+        """, (engine, STATUS_FAILED, start_id, end_id, end_id))
+        ids = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    return ids
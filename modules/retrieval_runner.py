@@ -0,0 +1,311 @@
+import time
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, List, Tuple
+
+try:
+    from db_writer import replace_rows
+    from retrieval_progress import (
+        ensure_progress_table, record_status, STATUS_OK, STATUS_EMPTY, STATUS_FAILED,
+    )
+except ImportError:  # importado como modules.retrieval_runner
+    from modules.db_writer import replace_rows
+    from modules.retrieval_progress import (
+        ensure_progress_table, record_status, STATUS_OK, STATUS_EMPTY, STATUS_FAILED,
+    )
+
+
+# Limites padrão por mecanismo (requisições por segundo, rajada máxima).
+# O Serper aguenta bem mais que o DDGS, que começa a devolver 202/ratelimit
+# com poucas buscas por segundo.
+ENGINE_RATE_LIMITS = {
+    "google": (5.0, 10),
+    "ddgo": (0.5, 2),
+    # FederatedSearchEngine (google + ddgo): cada busca também passa pelo ddgo
+    "federated": (0.5, 2),
+}
+
+INSERT_COLUMNS = (
+    "search_title",
+    "original_title",
+    "refined_title",
+    "snippet",
+    "link",
+    "domain",
+    "shuffle_id",
+)
+
+
+class RateLimiter:
+    """Token bucket thread-safe: no máximo `rate` chamadas/s com rajada `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RetrievalWriter(threading.Thread):
+    """
+    Único escritor no Postgres: recebe (shuffle_id, title, records, status) de
+    vários workers e grava em lotes de `batch_rows` linhas ou a cada
+    `flush_seconds`. Com `engine` definido, o status de cada shuffle_id vai
+    para o checkpoint na mesma transação dos resultados.
+
+    fence: função chamada com o cursor no início de cada transação de
+    gravação; se devolver False o lote é descartado e `fenced` vira True
+    (ex.: o worker perdeu o lease do shard para outro processo).
+    """
+
+    _STOP = object()
+
+    def __init__(self, conn, table: str, engine: str | None = None,
+                 batch_rows: int = 500, flush_seconds: float = 5.0,
+                 fence: Callable | None = None):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.table = table
+        self.engine = engine
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=1000)
+        self.inserted = 0
+        self.failed = []
+        self.fence = fence
+        self.fenced = False
+        self._pending = []
+
+    def submit(self, shuffle_id, title: str, records: List[tuple],
+               status: str = STATUS_OK, error: str | None = None) -> None:
+        self.queue.put((shuffle_id, title, records, status, error))
+
+    def close(self) -> None:
+        self.queue.put(self._STOP)
+        self.join()
+
+    def run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_seconds - (time.monotonic() - last_flush))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is self._STOP:
+                self._flush()
+                return
+            if item is not None:
+                self._pending.append(item)
+
+            n_rows = sum(len(item[2]) for item in self._pending)
+            if n_rows >= self.batch_rows or time.monotonic() - last_flush >= self.flush_seconds:
+                self._flush()
+                last_flush = time.monotonic()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        rows = [rec for item in self._pending for rec in item[2]]
+        try:
+            with self.conn.cursor() as cur:
+                if self.fence is not None and not self.fence(cur):
+                    self.conn.rollback()
+                    self.fenced = True
+                    print(f"[AVISO] Lote de {len(self._pending)} títulos descartado: lease perdido ({self.table})")
+                    self._pending = []
+                    return
+                if rows:
+                    # COPY + remoção prévia das linhas dos mesmos shuffle_ids:
+                    # reprocessar um título substitui em vez de duplicar
+                    replace_rows(cur, self.table, INSERT_COLUMNS, ["shuffle_id"], rows)
+                if self.engine:
+                    record_status(cur, self.engine, [
+                        (shuffle_id, status, error)
+                        for shuffle_id, _, _, status, error in self._pending
+                    ])
+            self.conn.commit()
+            self.inserted += len(rows)
+            print(f"[INFO] Gravados {len(rows)} registros de {len(self._pending)} títulos em {self.table}")
+        except Exception as e:
+            self.conn.rollback()
+            print(f"[ERRO] Falha ao inserir lote em {self.table}: {e}")
+            for shuffle_id, title, _, _, _ in self._pending:
+                self.failed.append({'title': title, 'shuffle_id': shuffle_id, 'reason': f'Insert batch falhou: {e}'})
+            self._record_failures(f'Insert batch falhou: {e}')
+        self._pending = []
+
+    def _record_failures(self, reason: str) -> None:
+        if not self.engine:
+            return
+        try:
+            with self.conn.cursor() as cur:
+                record_status(cur, self.engine, [
+                    (item[0], STATUS_FAILED, reason) for item in self._pending
+                ])
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            print(f"[ERRO] Falha ao gravar checkpoint em {self.table}: {e}")
+
+
+def search_with_retries(engine, query: str, num_results: int, limiter: RateLimiter | None = None,
+                        max_retries: int = 2) -> List[dict]:
+    """
+    engine.search com rate limit e backoff exponencial. Resultados que o
+    mecanismo já tem em cache (CachedSearchEngine.cached) não passam pelo
+    rate limit; LookupError (ex.: SearchCacheMiss no modo offline) não é retentado.
+    """
+    cached = getattr(engine, "cached", None)
+    if cached is not None:
+        hit = cached(query, num_results)
+        if hit is not None:
+            return hit
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            return engine.search(query, num_results=num_results)
+        except LookupError:
+            raise
+        except Exception:
+            if attempt == max_retries:
+                raise
+            # backoff exponencial: provável throttle do provedor
+            time.sleep(2 ** attempt)
+
+
+def build_records(title: str, shuffle_id, results: List[dict]) -> List[tuple]:
+    """Converte os resultados da busca nas tuplas de INSERT_COLUMNS."""
+    return [
+        (
+            title,
+            r.get('title'),
+            r.get('refined_title'),
+            r.get('snippet'),
+            r.get('link'),
+            r.get('domain'),
+            shuffle_id,
+        )
+        for r in results
+    ]
+
+
+def run_retrieval(
+    items: Iterable[Tuple[int, str]],
+    engine_factory: Callable,
+    conn,
+    table: str,
+    num_results: int = 10,
+    workers: int = 4,
+    rate: float = 1.0,
+    burst: int = 1,
+    max_retries: int = 2,
+    insert_placeholder_on_empty: bool = False,
+    batch_rows: int = 500,
+    flush_seconds: float = 5.0,
+    progress_engine: str | None = None,
+    fence: Callable | None = None,
+    stop: Callable[[], bool] | None = None,
+    on_done: Callable[[], None] | None = None,
+):
+    """
+    Executa as buscas de `items` ((shuffle_id, title)) com `workers` threads,
+    respeitando `rate` buscas/s, e grava tudo em `table` por um único escritor.
+
+    engine_factory: cria um SearchEngine; cada thread usa a sua instância
+                    (o cliente DDGS não é seguro entre threads).
+    insert_placeholder_on_empty: grava uma linha só com search_title/shuffle_id
+                                 quando a busca não retorna nada (comportamento
+                                 do retrieval_google).
+    progress_engine: nome do mecanismo na tabela retrieval_progress; quando
+                     definido, o status de cada shuffle_id é registrado.
+    fence: ver RetrievalWriter; com o lease perdido as buscas restantes
+           também são puladas.
+    stop: consultada antes de cada envio; True encerra sem buscar o resto
+          (ex.: heartbeat detectou que o lease foi perdido).
+    on_done: chamada a cada título concluído (progresso real, não o enviado).
+
+    `items` é consumido aos poucos: no máximo 2 * workers títulos ficam em
+    voo, então `stop` e o fence valem para o que ainda não foi buscado.
+
+    Retorna (linhas_inseridas, lista_de_falhas).
+    """
+    limiter = RateLimiter(rate, burst)
+    if progress_engine:
+        ensure_progress_table(conn)
+    writer = RetrievalWriter(conn, table, engine=progress_engine,
+                             batch_rows=batch_rows, flush_seconds=flush_seconds, fence=fence)
+    writer.start()
+
+    local = threading.local()
+    failed_titles = []
+    failed_lock = threading.Lock()
+
+    def fail(title, shuffle_id, reason):
+        with failed_lock:
+            failed_titles.append({'title': title, 'shuffle_id': shuffle_id, 'reason': reason})
+
+    def process(item):
+        shuffle_id, title = item
+        if writer.fenced:
+            return
+        if not hasattr(local, "engine"):
+            local.engine = engine_factory()
+
+        print(f"[INFO] Processando shuffle_id {shuffle_id}: {title[:60]}...")
+        try:
+            results = search_with_retries(local.engine, title, num_results, limiter, max_retries)
+        except Exception as e:
+            print(f"[ERRO] Falha na busca do título (shuffle_id {shuffle_id}): {e}")
+            fail(title, shuffle_id, f'Busca falhou: {e}')
+            writer.submit(shuffle_id, title, [], STATUS_FAILED, f'Busca falhou: {e}')
+            return
+
+        records = build_records(title, shuffle_id, results)
+        status = STATUS_OK
+        if not records:
+            print(f"[AVISO] Nenhum resultado para inserir para shuffle_id {shuffle_id}")
+            fail(title, shuffle_id, 'Nenhum resultado inserido')
+            status = STATUS_EMPTY
+            if insert_placeholder_on_empty:
+                records = [(title, None, None, None, None, None, shuffle_id)]
+
+        writer.submit(shuffle_id, title, records, status)
+
+    def finish(done):
+        for future in done:
+            future.result()  # propaga exceções inesperadas dos workers
+            if on_done is not None:
+                on_done()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            in_flight = set()
+            for item in items:
+                if len(in_flight) >= 2 * workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    finish(done)
+                if writer.fenced or (stop is not None and stop()):
+                    break
+                in_flight.add(pool.submit(process, item))
+            finish(wait(in_flight).done)
+    finally:
+        writer.close()
+
+    return writer.inserted, failed_titles + writer.failed
@@ -0,0 +1,244 @@
+from typing import Dict, List
+
+try:
+    from retrieval_progress import PROGRESS_TABLE, DONE_STATUSES
+except ImportError:  # importado como modules.retrieval_shards
+    from modules.retrieval_progress import PROGRESS_TABLE, DONE_STATUSES
+
+
+SHARD_TABLE = "retrieval_shards"
+
+# status de um shard
+SHARD_PENDING = "pending"  # esperando um worker
+SHARD_LEASED = "leased"    # com um worker (até lease_expires_at; depois pode ser re-arrendado)
+SHARD_DONE = "done"
+SHARD_FAILED = "failed"    # esgotou max_attempts
+
+
+def ensure_shard_table(conn) -> None:
+    """Cria a fila de shards (um registro por engine + faixa de shuffle_id)."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SHARD_TABLE} (
+                engine TEXT NOT NULL,
+                start_id INT NOT NULL,
+                end_id INT NOT NULL,
+                status TEXT NOT NULL DEFAULT '{SHARD_PENDING}',
+                worker TEXT,
+                attempts INT NOT NULL DEFAULT 0,
+                leased_at TIMESTAMP,
+                lease_expires_at TIMESTAMP,
+                processed INT NOT NULL DEFAULT 0,
+                inserted INT NOT NULL DEFAULT 0,
+                failed INT NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TIMESTAMP NOT NULL DEFAULT now(),
+                PRIMARY KEY (engine, start_id)
+            );
+            CREATE INDEX IF NOT EXISTS {SHARD_TABLE}_queue_idx
+                ON {SHARD_TABLE} (engine, status, start_id);
+        """)
+    conn.commit()
+
+
+def plan_shards(conn, engine: str, start_id: int, end_id: int, shard_size: int) -> int:
+    """
+    Divide [start_id, end_id) em shards de `shard_size` ids. Shards que já
+    existem com a mesma faixa não são alterados (replanejar é idempotente);
+    um plano que se sobrepõe a shards existentes com outras faixas (ex.:
+    outro --shard_size) levanta ValueError, pois dois workers buscariam os
+    mesmos ids. Retorna quantos shards há no intervalo.
+    """
+    rows = [(engine, s, min(s + shard_size, end_id)) for s in range(start_id, end_id, shard_size)]
+    planned = {(s, e) for _, s, e in rows}
+    with conn.cursor() as cur:
+        # planos concorrentes esperam um pelo outro; leases esperam só o instante do plano
+        cur.execute(f"LOCK TABLE {SHARD_TABLE} IN SHARE ROW EXCLUSIVE MODE")
+        cur.execute(f"""
+            SELECT start_id, end_id FROM {SHARD_TABLE}
+            WHERE engine = %s AND start_id < %s AND end_id > %s
+            ORDER BY start_id
+        """, (engine, end_id, start_id))
+        conflicts = [row for row in cur.fetchall() if tuple(row) not in planned]
+        if conflicts:
+            conn.rollback()
+            shown = ", ".join(f"[{s}, {e})" for s, e in conflicts[:10])
+            raise ValueError(f"O plano [{start_id}, {end_id}) com shards de {shard_size} ids se sobrepõe a "
+                             f"{len(conflicts)} shards existentes de {engine} com outras faixas: {shown}")
+        cur.executemany(f"""
+            INSERT INTO {SHARD_TABLE} (engine, start_id, end_id) VALUES (%s, %s, %s)
+            ON CONFLICT (engine, start_id) DO NOTHING
+        """, rows)
+        cur.execute(f"SELECT count(*) FROM {SHARD_TABLE} WHERE engine = %s AND start_id >= %s AND start_id < %s",
+                    (engine, start_id, end_id))
+        total = cur.fetchone()[0]
+    conn.commit()
+    return total
+
+
+def _fail_expired(cur, engine: str, max_attempts: int) -> int:
+    cur.execute(f"""
+        UPDATE {SHARD_TABLE} SET
+            status = %s, lease_expires_at = NULL, updated_at = now(),
+            last_error = COALESCE(last_error || ' | ', '') || 'lease vencido na última tentativa (' || worker || ')'
+        WHERE engine = %s AND status = %s AND lease_expires_at < now() AND attempts >= %s
+    """, (SHARD_FAILED, engine, SHARD_LEASED, max_attempts))
+    return cur.rowcount
+
+
+def expire_leases(conn, engine: str, max_attempts: int = 3) -> int:
+    """
+    Marca como 'failed' os shards com lease vencido que já esgotaram
+    max_attempts (o worker morreu na última tentativa); os demais vencidos
+    voltam a ser arrendados por lease_shard. Retorna quantos falharam.
+    """
+    with conn.cursor() as cur:
+        count = _fail_expired(cur, engine, max_attempts)
+    conn.commit()
+    return count
+
+
+def lease_shard(conn, engine: str, worker: str, lease_seconds: int = 300,
+                max_attempts: int = 3) -> tuple | None:
+    """
+    Arrenda o próximo shard livre para `worker`: pendente ou com lease
+    vencido (worker morto). FOR UPDATE SKIP LOCKED faz workers concorrentes
+    pegarem shards diferentes sem esperar uns pelos outros. Vencidos sem
+    tentativas restantes viram 'failed' (expire_leases).
+    Retorna (start_id, end_id, attempts) ou None se não houver shard livre.
+    """
+    with conn.cursor() as cur:
+        _fail_expired(cur, engine, max_attempts)
+        cur.execute(f"""
+            UPDATE {SHARD_TABLE} s SET
+                status = %s, worker = %s, attempts = s.attempts + 1,
+                leased_at = now(), lease_expires_at = now() + make_interval(secs => %s),
+                updated_at = now()
+            FROM (
+                SELECT engine, start_id FROM {SHARD_TABLE}
+                WHERE engine = %s AND attempts < %s
+                  AND (status = %s OR (status = %s AND lease_expires_at < now()))
+                ORDER BY start_id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            ) free
+            WHERE s.engine = free.engine AND s.start_id = free.start_id
+            RETURNING s.start_id, s.end_id, s.attempts
+        """, (SHARD_LEASED, worker, lease_seconds, engine, max_attempts, SHARD_PENDING, SHARD_LEASED))
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+
+def check_lease(cur, engine: str, start_id: int, worker: str) -> bool:
+    """
+    Confirma, na transação do cursor, que o shard ainda é de `worker`,
+    travando a linha até o commit. Usado antes de gravar os resultados:
+    um worker que perdeu o lease não grava por cima do novo dono.
+    """
+    cur.execute(f"""
+        SELECT 1 FROM {SHARD_TABLE}
+        WHERE engine = %s AND start_id = %s AND worker = %s AND status = %s
+        FOR UPDATE
+    """, (engine, start_id, worker, SHARD_LEASED))
+    return cur.fetchone() is not None
+
+
+def renew_lease(conn, engine: str, start_id: int, worker: str, lease_seconds: int = 300,
+                processed: int | None = None) -> bool:
+    """Heartbeat: estende o lease (e o progresso). False se o shard já não é deste worker."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {SHARD_TABLE} SET
+                lease_expires_at = now() + make_interval(secs => %s),
+                processed = COALESCE(%s, processed), updated_at = now()
+            WHERE engine = %s AND start_id = %s AND worker = %s AND status = %s
+        """, (lease_seconds, processed, engine, start_id, worker, SHARD_LEASED))
+        alive = cur.rowcount == 1
+    conn.commit()
+    return alive
+
+
+def finish_shard(conn, engine: str, start_id: int, worker: str, processed: int, inserted: int,
+                 failed: int, error: str | None = None, max_attempts: int = 3) -> bool:
+    """
+    Fecha o shard do worker: 'done' sem erro; com erro volta para 'pending'
+    (ou 'failed' se esgotou max_attempts). False se o lease já tinha sido perdido.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {SHARD_TABLE} SET
+                status = CASE WHEN %s IS NULL THEN %s
+                              WHEN attempts >= %s THEN %s ELSE %s END,
+                processed = %s, inserted = %s, failed = %s, last_error = %s,
+                lease_expires_at = NULL, updated_at = now()
+            WHERE engine = %s AND start_id = %s AND worker = %s AND status = %s
+        """, (error, SHARD_DONE, max_attempts, SHARD_FAILED, SHARD_PENDING,
+              processed, inserted, failed, error, engine, start_id, worker, SHARD_LEASED))
+        ok = cur.rowcount == 1
+    conn.commit()
+    return ok
+
+
+def requeue_shards(conn, engine: str, failed: bool = True, leased: bool = False) -> int:
+    """Devolve à fila os shards 'failed' (e/ou 'leased', ex.: após parar todos os workers), zerando attempts."""
+    statuses = [s for s, on in ((SHARD_FAILED, failed), (SHARD_LEASED, leased)) if on]
+    if not statuses:
+        return 0
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {SHARD_TABLE} SET status = %s, attempts = 0, worker = NULL,
+                lease_expires_at = NULL, updated_at = now()
+            WHERE engine = %s AND status IN %s
+        """, (SHARD_PENDING, engine, tuple(statuses)))
+        count = cur.rowcount
+    conn.commit()
+    return count
+
+
+def shard_status(conn, engine: str) -> Dict:
+    """
+    Progresso agregado: shards por status, shuffle_ids concluídos no
+    checkpoint (retrieval_progress) dentro das faixas planejadas e os
+    leases ativos por worker.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT status, count(*), COALESCE(sum(end_id - start_id), 0),
+                   COALESCE(sum(inserted), 0), COALESCE(sum(failed), 0)
+            FROM {SHARD_TABLE} WHERE engine = %s GROUP BY status
+        """, (engine,))
+        by_status = {status: {"shards": n, "ids": ids, "inserted": ins, "failed": fail}
+                     for status, n, ids, ins, fail in cur.fetchall()}
+
+        cur.execute(f"""
+            SELECT count(*) FROM {PROGRESS_TABLE} p
+            JOIN {SHARD_TABLE} s ON s.engine = p.engine
+             AND p.shuffle_id >= s.start_id AND p.shuffle_id < s.end_id
+            WHERE p.engine = %s AND p.status IN %s
+        """, (engine, DONE_STATUSES))
+        ids_done = cur.fetchone()[0]
+
+        cur.execute(f"""
+            SELECT worker, start_id, end_id, processed, attempts,
+                   extract(epoch FROM now() - leased_at),
+                   lease_expires_at < now()
+            FROM {SHARD_TABLE}
+            WHERE engine = %s AND status = %s
+            ORDER BY start_id
+        """, (engine, SHARD_LEASED))
+        leases: List[Dict] = [
+            {"worker": w, "start_id": s, "end_id": e, "processed": p, "attempts": a,
+             "age_seconds": round(float(age or 0)), "expired": bool(expired)}
+            for w, s, e, p, a, age, expired in cur.fetchall()
+        ]
+    conn.commit()
+
+    ids_total = sum(s["ids"] for s in by_status.values())
+    return {
+        "engine": engine,
+        "shards": by_status,
+        "ids_total": ids_total,
+        "ids_done": ids_done,
+        "leases": leases,
+    }
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import threading
+import unicodedata
+from typing import Dict, List
+
+try:
+    from cache_store import SQLiteStore
+    from search_engines import SearchEngine, apply_refiner
+except ImportError:  # importado como modules.search_cache
+    from modules.cache_store import SQLiteStore
+    from modules.search_engines import SearchEngine, apply_refiner
+
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "cache", "search_results.sqlite"
+)
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+
+class SearchCacheMiss(LookupError):
+    """Busca fora do cache no modo offline."""
+
+
+def normalize_query(query: str) -> str:
+    """Forma da query na chave: NFKC, minúsculas e espaços simples (pontuação fica: muda a busca)."""
+    return " ".join(unicodedata.normalize("NFKC", query or "").casefold().split())
+
+
+def cache_key(engine: str, query: str, num_results: int) -> str:
+    return f"{engine}|{num_results}|{normalize_query(query)}"
+
+
+def _raw(results: List[dict]) -> List[dict]:
+    """Página sem refinamento (entradas antigas podiam guardar refined_title refinado)."""
+    for r in results:
+        r["refined_title"] = r.get("title", "")
+    return results
+
+
+class CachedSearchEngine(SearchEngine):
+    """
+    Cache de SearchEngine.search em SQLite, chave (engine, query normalizada,
+    num_results). Guarda a página crua do mecanismo (refined_title = title)
+    e o horário da busca; o TitleRefiner, se houver, é passado aqui e roda
+    depois da consulta ao cache, em hits e em buscas novas. Assim quem usa
+    e quem não usa o refiner divide as mesmas entradas.
+
+    ttl_seconds: idade máxima de uma entrada para evitar a rede; entradas
+                 vencidas são rebuscadas, mas ainda servem se a rede falhar
+    offline: nunca chama o mecanismo; sem entrada (de qualquer idade)
+             levanta SearchCacheMiss
+    cache_empty: guarda páginas vazias (no ddgo costuma ser throttle)
+    title_refiner: aplicado aos resultados devolvidos (o mecanismo
+                   envolvido não pode ter o seu, senão o cache guardaria
+                   títulos refinados)
+
+    Entradas também podem vir das tabelas retrieved_news_* (seed_from_postgres).
+    """
+
+    def __init__(self, engine: SearchEngine | None, name: str, path: str = DEFAULT_CACHE_PATH,
+                 ttl_seconds: float | None = DEFAULT_TTL_SECONDS, offline: bool = False,
+                 cache_empty: bool = False, store: SQLiteStore | None = None,
+                 title_refiner=None):
+        if engine is None and not offline:
+            raise ValueError("CachedSearchEngine sem mecanismo só funciona com offline=True")
+        if getattr(engine, "title_refiner", None) is not None:
+            raise ValueError("CachedSearchEngine guarda páginas cruas: passe o TitleRefiner "
+                             "para o CachedSearchEngine, não para o mecanismo")
+        self.engine = engine
+        self.title_refiner = title_refiner
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.offline = offline
+        self.cache_empty = cache_empty
+        # sem TTL no SQLiteStore: entradas vencidas continuam lá para o offline e o fallback
+        self.store = store or SQLiteStore(path, table="search_results")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.network_calls = 0
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def _entry(self, key: str) -> Dict | None:
+        raw = self.store.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def _fresh(self, entry: Dict) -> bool:
+        return self.ttl_seconds is None or time.time() - entry["fetched_at"] <= self.ttl_seconds
+
+    def cached(self, query: str, num_results: int = 5) -> List[dict] | None:
+        """
+        Resultados que não precisam de rede (frescos, ou de qualquer idade no
+        offline) ou None. Permite a quem chama pular o rate limit nos hits.
+        """
+        entry = self._entry(cache_key(self.name, query, num_results))
+        if entry is not None and (self.offline or self._fresh(entry)):
+            self._count("hits" if self._fresh(entry) else "stale_hits")
+            return _raw(entry["results"])
+        if self.offline:
+            self._count("misses")
+            raise SearchCacheMiss(f"'{query[:60]}' não está no cache de {self.name} (modo offline)")
+        return None
+
+    def search(self, query: str, num_results: int = 5):
+        return apply_refiner(self.title_refiner, self._search_raw(query, num_results))
+
+    def _search_raw(self, query: str, num_results: int) -> List[dict]:
+        hit = self.cached(query, num_results)
+        if hit is not None:
+            return hit
+
+        key = cache_key(self.name, query, num_results)
+        stale = self._entry(key)
+        self._count("misses")
+        self._count("network_calls")
+        try:
+            results = self.engine.search(query, num_results=num_results)
+        except Exception as e:
+            if stale is None:
+                raise
+            print(f"[AVISO] Busca em {self.name} falhou ({e}); usando resultado vencido do cache")
+            self._count("stale_hits")
+            return _raw(stale["results"])
+
+        if results or self.cache_empty:
+            self.put(query, num_results, results)
+        return results
+
+    def put(self, query: str, num_results: int, results: List[dict], fetched_at: float | None = None) -> None:
+        self.put_many([(query, num_results, results)], fetched_at)
+
+    def put_many(self, pages, fetched_at: float | None = None) -> None:
+        """pages: [(query, num_results, results)]."""
+        fetched_at = fetched_at or time.time()
+        self.store.put_many({
+            cache_key(self.name, query, num_results): json.dumps(
+                {"query": query, "results": results, "fetched_at": fetched_at},
+                ensure_ascii=False,
+            ).encode("utf-8")
+            for query, num_results, results in pages
+        })
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "engine": self.name,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "network_calls": self.network_calls,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "entries": len(self.store),
+            }
+
+
+def seed_from_postgres(conn, cache: CachedSearchEngine, table: str, num_results: int = 10,
+                       fetched_at: float | None = None) -> int:
+    """
+    Copia as páginas já gravadas em `table` (retrieved_news_*) para o cache,
+    uma por search_title, na ordem em que foram inseridas. Linhas
+    placeholder (sem link) viram página vazia. Retorna quantas queries
+    foram gravadas.
+    """
+    pages: Dict[str, List[dict]] = {}
+    with conn.cursor(name="seed_search_cache") as cur:
+        cur.itersize = 5000
+        # ctid: ordem física = ordem do COPY, que é a ordem da página do mecanismo
+        cur.execute(f"""
+            SELECT search_title, original_title, refined_title, snippet, link, domain
+            FROM {table}
+            WHERE search_title IS NOT NULL
+            ORDER BY search_title, ctid
+        """)
+        for search_title, title, refined_title, snippet, link, domain in cur:
+            page = pages.setdefault(search_title, [])
+            if link and len(page) < num_results:
+                page.append({
+                    "title": title or "",
+                    # o cache guarda a página crua; o refiner roda na leitura
+                    "refined_title": title or "",
+                    "snippet": snippet or "",
+                    "link": link,
+                    "domain": domain or "",
+                })
+    conn.commit()
+
+    items = [(query, num_results, results) for query, results in pages.items()
+             if results or cache.cache_empty]
+    for i in range(0, len(items), 1000):
+        cache.put_many(items[i:i + 1000], fetched_at)
+    return len(items)
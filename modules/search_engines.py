@@ -1,12 +1,24 @@
-from newspaper import Article
-import numpy as np
 import http.client
 import json
-import os
-from dotenv import load_dotenv
-import requests
+import re
+import time
+import threading
 from urllib.parse import urlparse
-from ddgs import DDGS
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+# newspaper, numpy, ddgs e requests (via page_fetcher) são importados no
+# primeiro uso: importar o módulo para --help/configuração fica barato
+if TYPE_CHECKING:
+    import numpy as np
+    from page_fetcher import PageFetcher
+
+try:
+    from help import strip_site_suffix
+    from page_store import normalize_url
+except ImportError:  # importado como modules.search_engines
+    from modules.help import strip_site_suffix
+    from modules.page_store import normalize_url
 
 # 🔹 Classe base (interface)
 class SearchEngine:
@@ -17,43 +29,53 @@ class SearchEngine:
 
 
 class TitleRefiner:
-    def __init__(self, embedder, similarity_threshold: float = 0.85, min_full_len: int = 10):
+    def __init__(self, embedder, similarity_threshold: float = 0.85, min_full_len: int = 10,
+                 max_fetch_workers: int = 8, fetcher: "PageFetcher | None" = None):
         """
         embedder: instância do seu HuggingFaceEmbedder (com método .encode)
         similarity_threshold: limiar mínimo de similaridade para aceitar o novo título
         min_full_len: tamanho mínimo do título retornado pelo newspaper
                       (evita casos tipo "MSN" ser aceito)
+        max_fetch_workers: downloads simultâneos em refine_many
+        fetcher: PageFetcher (pool HTTP, limite por host, cache negativo);
+                 por padrão usa o compartilhado do processo
         """
         self.embedder = embedder
         self.similarity_threshold = similarity_threshold
         self.min_full_len = min_full_len
-
-    def _to_1d(self, v):
-        """
-        Converte a saída do embedder em um vetor 1D (np.array).
-        Funciona com formatos como [[tensor(...), tensor(...), ...]]
-        ou já np.array.
-        """
-        arr = np.array(v, dtype=float)
-
-        # [[x, x, x]] -> (1, D) -> (D,)
-        if arr.ndim > 1:
-            arr = arr.reshape(-1)
-
-        return arr
-
-    def _cosine_similarity(self, v1, v2) -> float:
-        v1 = self._to_1d(v1)
-        v2 = self._to_1d(v2)
-        denom = (np.linalg.norm(v1) * np.linalg.norm(v2))
-        if denom == 0:
-            return 0.0
-        return float(np.dot(v1, v2) / denom)
+        self.max_fetch_workers = max_fetch_workers
+        self._fetcher = fetcher
+
+    @property
+    def fetcher(self) -> "PageFetcher":
+        # o PageFetcher compartilhado (e o requests) só entra quando há o que baixar
+        if self._fetcher is None:
+            try:
+                from page_fetcher import get_default_fetcher
+            except ImportError:  # importado como modules.search_engines
+                from modules.page_fetcher import get_default_fetcher
+            self._fetcher = get_default_fetcher()
+        return self._fetcher
+
+    @staticmethod
+    def _rowwise_cosine(a: "np.ndarray", b: "np.ndarray") -> "np.ndarray":
+        """Similaridade coseno entre a[i] e b[i] para todas as linhas de uma vez."""
+        import numpy as np
+
+        denom = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+        dots = np.einsum("ij,ij->i", a, b)
+        return np.divide(dots, denom, out=np.zeros_like(dots), where=denom != 0)
 
     def _fetch_full_title(self, url: str) -> str | None:
+        html = self.fetcher.fetch(url)
+        if not html:
+            return None
         try:
+            from newspaper import Article
+
+            # parse do HTML já baixado pelo pool (sem novo download do newspaper)
             article = Article(url)
-            article.download()
+            article.download(input_html=html)
             article.parse()
             full_title = (article.title or "").strip()
 
@@ -62,7 +84,7 @@ class TitleRefiner:
                 return None
 
             return full_title
-        except Exception as e:
+        except Exception:
             # log simples, se quiser
             return None
 
@@ -71,33 +93,52 @@ class TitleRefiner:
         Se o título tiver "..." tenta completar com newspaper + similaridade.
         Caso contrário, retorna o título original.
         """
-        # se não parece truncado, não faz nada
-        if "..." not in original_title:
-            return original_title
+        return self.refine_many([(original_title, url)])[0]
+
+    def refine_many(self, items: List[Tuple[str, str]]) -> List[str]:
+        """
+        Versão em lote de refine para uma página de resultados [(título, url), ...]:
+        baixa as páginas dos títulos truncados em paralelo e calcula todas
+        as similaridades com uma única chamada ao embedder.
+        """
+        refined = [title for title, _ in items]
+
+        # só títulos truncados e com URL (sem URL não tem como usar newspaper)
+        todo = [i for i, (title, url) in enumerate(items) if "..." in (title or "") and url]
+        if not todo:
+            return refined
+
+        with ThreadPoolExecutor(max_workers=min(self.max_fetch_workers, len(todo))) as pool:
+            full_titles = list(pool.map(lambda i: self._fetch_full_title(items[i][1]), todo))
 
-        if not url:
-            # sem URL não tem como usar newspaper
-            return original_title
+        pairs = [(i, full) for i, full in zip(todo, full_titles) if full]
+        if not pairs:
+            return refined
 
-        full_title = self._fetch_full_title(url)
-        if not full_title:
-            return original_title
+        import numpy as np
 
-        # calcula embeddings usando .encode (não existe .embed)
+        originals = [items[i][0] for i, _ in pairs]
+        fulls = [full for _, full in pairs]
         try:
-            emb_original = self.embedder.encode(original_title)
-            emb_full = self.embedder.encode(full_title)
-        except Exception as e:
+            emb = np.asarray(self.embedder.encode(originals + fulls), dtype=np.float32)
+        except Exception:
             # se der qualquer problema no embedder, não quebra o fluxo
-            return original_title
+            return refined
 
-        similarity = self._cosine_similarity(emb_original, emb_full)
+        similarities = self._rowwise_cosine(emb[:len(pairs)], emb[len(pairs):])
+        for (i, full), similarity in zip(pairs, similarities):
+            if similarity >= self.similarity_threshold:
+                refined[i] = full
+        return refined
 
-        if similarity >= self.similarity_threshold:
-            return full_title
-        else:
-            return original_title
-        
+
+def apply_refiner(title_refiner: TitleRefiner | None, results: List[dict]) -> List[dict]:
+    """Preenche refined_title de todos os resultados com um único refine_many."""
+    if title_refiner and results:
+        refined = title_refiner.refine_many([(r["title"], r["link"]) for r in results])
+        for r, refined_title in zip(results, refined):
+            r["refined_title"] = refined_title
+    return results
 
 
 class GoogleSearchEngine(SearchEngine):
@@ -135,54 +176,239 @@ class GoogleSearchEngine(SearchEngine):
             title = item.get("title") or ""
             snippet = item.get("snippet", "")
             link = item.get("link")
-
-            # ✔️ aplica refinamento apenas quando possível
-            if self.title_refiner and link:
-                refined_title = self.title_refiner.refine(title, link)
-            else:
-                refined_title = title
-
             domain = urlparse(link).netloc.replace("www.", "") if link else ""
 
             results.append({
                 "title": title,
-                "refined_title": refined_title,
+                "refined_title": title,
                 "snippet": snippet,
                 "link": link,
                 "domain": domain
             })
 
-        return results
+        # ✔️ aplica refinamento apenas quando possível (uma vez para a página toda)
+        return apply_refiner(self.title_refiner, results)
 
 
 class DuckDuckGoSearchEngine(SearchEngine):
     """DuckDuckGo search returning results in Google-like format."""
     
     def __init__(self, title_refiner: TitleRefiner | None = None):
-        self.ddgs = DDGS()
+        self._ddgs = None
+        self._ddgs_lock = threading.Lock()
         self.title_refiner = title_refiner  # pode ser None se não quiser usar
 
+    @property
+    def ddgs(self):
+        # cliente DDGS criado na primeira busca (o import do ddgs é o mais caro do módulo)
+        with self._ddgs_lock:
+            if self._ddgs is None:
+                from ddgs import DDGS
+                self._ddgs = DDGS()
+            return self._ddgs
+
     def search(self, query: str, num_results: int = 5):
         results = []
         for r in self.ddgs.text(query, max_results=num_results):
             link = r.get("href") or r.get("url")
             title = r.get("title") or ""
-
-            if self.title_refiner and link:
-                refined_title = self.title_refiner.refine(title, link)
-            else:
-                refined_title = title
-
             snippet = r.get("body") or title
             domain = urlparse(link).netloc.replace("www.", "") if link else ""
             results.append({
                 "title": title,
-                "refined_title": refined_title,
+                "refined_title": title,
                 "snippet": snippet,
                 "link": link,
                 "domain": domain
             })
-        return results
-    
+        return apply_refiner(self.title_refiner, results)
+
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def result_key(url: str | None) -> str:
+    """URL do resultado na forma canônica do PageStore ("" sem link)."""
+    return normalize_url(url) if url else ""
+
+
+def normalize_title(title: str | None, domain: str | None = None) -> str:
+    """
+    Minúsculas e sem pontuação; o sufixo " - Site" / " | Site" que cada
+    mecanismo devolve de um jeito só é removido quando é o site de `domain`.
+    """
+    if not title:
+        return ""
+    title = strip_site_suffix(title, [domain])
+    return " ".join(_NON_WORD.sub(" ", title.lower()).split())
+
+
+class FederatedSearchEngine(SearchEngine):
+    """
+    Consulta vários mecanismos ao mesmo tempo e junta as páginas: intercala
+    por posição (1º de cada mecanismo, 2º de cada, ...), remove duplicatas
+    por URL ou título normalizados (título dentro do mesmo domínio) e marca em "engines" quem devolveu cada
+    resultado.
+
+    Cada mecanismo tem um orçamento de latência: o que não responder a tempo
+    fica de fora desta busca (a thread dele termina sozinha e, até lá, o
+    mecanismo é pulado nas buscas seguintes em vez de acumular chamadas).
+    Com `target`, a busca termina assim que houver `target` resultados
+    confiáveis com similaridade >= `similarity_threshold` com a query,
+    sem esperar os mecanismos restantes.
 
+    Uma instância usa cada mecanismo em no máximo uma thread por vez; para
+    buscas concorrentes, crie uma instância por worker (engine_factory).
+    """
 
+    def __init__(self, engines: Dict[str, SearchEngine], embedder=None,
+                 credible_domains_file: str | None = "./data/credible_sources.txt",
+                 target: int | None = None, similarity_threshold: float = 0.80,
+                 budget: float = 5.0, budgets: Dict[str, float] | None = None):
+        """
+        engines: {nome: mecanismo}; a ordem define a prioridade na intercalação
+        embedder: usado só no corte antecipado (similaridade query x título)
+        credible_domains_file: domínios confiáveis do corte (None = não exige)
+        target: resultados bons que encerram a busca (None = espera todos)
+        budget: segundos por mecanismo; budgets sobrescreve por nome
+        """
+        if not engines:
+            raise ValueError("FederatedSearchEngine precisa de pelo menos um mecanismo")
+        self.engines = dict(engines)
+        self.embedder = embedder
+        self.credible_domains_file = credible_domains_file
+        self.target = target
+        self.similarity_threshold = similarity_threshold
+        self.budgets = {name: (budgets or {}).get(name, budget) for name in self.engines}
+        self._pool = ThreadPoolExecutor(max_workers=len(self.engines), thread_name_prefix="federated")
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            name: {"calls": 0, "results": 0, "errors": 0, "timeouts": 0, "cut": 0, "busy": 0, "seconds": 0.0}
+            for name in self.engines
+        }
+
+    def _count(self, name: str, key: str, value=1) -> None:
+        with self._lock:
+            self._stats[name][key] += value
+
+    def _timed_search(self, name: str, query: str, num_results: int) -> List[dict]:
+        t0 = time.perf_counter()
+        try:
+            return self.engines[name].search(query, num_results=num_results)
+        finally:
+            self._count(name, "calls")
+            self._count(name, "seconds", time.perf_counter() - t0)
+
+    @staticmethod
+    def merge(pages: Dict[str, List[dict]], order: List[str], num_results: int) -> List[dict]:
+        """Intercala as páginas por posição seguindo `order` e remove duplicatas."""
+        merged, by_key = [], {}
+        longest = max((len(page) for page in pages.values()), default=0)
+        for rank in range(longest):
+            for name in order:
+                page = pages.get(name) or []
+                if rank >= len(page):
+                    continue
+                r = page[rank]
+                # título só é duplicata no mesmo domínio (amp/canônica, m./www.):
+                # a mesma manchete em outro veículo é outra fonte
+                url = result_key(r.get("link"))
+                domain = urlparse(url).hostname or (r.get("domain") or "").lower()
+                domain = domain.removeprefix("m.")
+                title = normalize_title(r.get("refined_title") or r.get("title"), domain)
+                keys = [k for k in (url, title and f"{domain}|{title}") if k]
+                seen = next((by_key[k] for k in keys if k in by_key), None)
+                if seen is not None:
+                    if name not in seen["engines"]:
+                        seen["engines"].append(name)
+                    continue
+                item = {**r, "engines": [name]}
+                merged.append(item)
+                for k in keys:
+                    by_key[k] = item
+        return merged[:num_results]
+
+    def _good_count(self, query: str, results: List[dict]) -> int:
+        """Resultados confiáveis e parecidos com a query (critério do corte antecipado)."""
+        if self.credible_domains_file:
+            try:
+                from prefilter import load_domain_set, is_credible
+            except ImportError:  # importado como modules.search_engines
+                from modules.prefilter import load_domain_set, is_credible
+            credible = load_domain_set(self.credible_domains_file)
+            results = [r for r in results if is_credible(r.get("domain"), credible)]
+        titles = [(r.get("refined_title") or r.get("title") or "").strip() for r in results]
+        titles = [t for t in titles if t]
+        if self.embedder is None or not titles:
+            return len(titles)
+
+        import numpy as np
+
+        vectors = np.asarray(self.embedder.encode([query] + titles), dtype=np.float32)
+        q, candidates = vectors[0], vectors[1:]
+        denom = np.linalg.norm(candidates, axis=1) * np.linalg.norm(q)
+        sims = np.divide(candidates @ q, denom, out=np.zeros(len(candidates), dtype=np.float32),
+                         where=denom != 0)
+        return int((sims >= self.similarity_threshold).sum())
+
+    def search(self, query: str, num_results: int = 5):
+        start = time.perf_counter()
+        futures = {}
+        with self._lock:
+            for name in self.engines:
+                previous = self._inflight.get(name)
+                if previous is not None and not previous.done():
+                    # ainda preso numa busca anterior que estourou o orçamento
+                    self._stats[name]["busy"] += 1
+                    continue
+                future = self._pool.submit(self._timed_search, name, query, num_results)
+                self._inflight[name] = future
+                futures[future] = name
+
+        pages, errors = {}, []
+        pending = set(futures)
+        while pending:
+            now = time.perf_counter()
+            expired = {f for f in pending if start + self.budgets[futures[f]] <= now}
+            for f in expired:
+                self._count(futures[f], "timeouts")
+            pending -= expired
+            if not pending:
+                break
+            timeout = min(start + self.budgets[futures[f]] for f in pending) - now
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for f in done:
+                name = futures[f]
+                try:
+                    pages[name] = f.result()
+                    self._count(name, "results", len(pages[name]))
+                except Exception as e:
+                    self._count(name, "errors")
+                    errors.append(e)
+                    print(f"[AVISO] Busca federada: {name} falhou para '{query[:60]}': {e}")
+            if self.target and pending and pages:
+                merged = self.merge(pages, list(self.engines), num_results)
+                if self._good_count(query, merged) >= self.target:
+                    for f in pending:
+                        self._count(futures[f], "cut")
+                    break
+
+        if not pages:
+            # nenhum mecanismo respondeu: erro para o retry de quem chamou
+            if errors:
+                raise errors[0]
+            raise TimeoutError(f"Nenhum mecanismo respondeu dentro do orçamento ({', '.join(self.engines)})")
+        return self.merge(pages, list(self.engines), num_results)
+
+    def stats(self) -> Dict[str, dict]:
+        """Por mecanismo: chamadas, latência média, erros, estouros de orçamento, cortes e buscas puladas."""
+        with self._lock:
+            out = {}
+            for name, s in self._stats.items():
+                out[name] = {**s, "seconds": round(s["seconds"], 3),
+                             "mean_latency": round(s["seconds"] / s["calls"], 3) if s["calls"] else None}
+            return out
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,150 @@
+import os
+import re
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+try:
+    from help import estimate_tokens
+except ImportError:  # importado como modules.token_budget
+    from modules.help import estimate_tokens
+
+
+# tokenizer do modelo juiz (gemma3:12b no Ollama): espelho sem gate do
+# google/gemma-3-12b-it (mesmo tokenizer, baixa sem token do HF);
+# pode ser trocado por variável de ambiente
+DEFAULT_TOKENIZER = os.getenv("JUDGE_TOKENIZER", "unsloth/gemma-3-12b-it")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=4)
+def _load_tokenizer(name: str):
+    from transformers import AutoTokenizer
+
+    try:
+        return AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        print(f"[AVISO] ============================================================\n"
+              f"[AVISO] Tokenizer {name} indisponível: {e}\n"
+              f"[AVISO] Orçamentos de tokens vão usar a ESTIMATIVA len/4, não o tokenizer real.\n"
+              f"[AVISO] Defina JUDGE_TOKENIZER (ou HF_TOKEN para repositórios com gate).\n"
+              f"[AVISO] ============================================================")
+        return None
+
+
+class TokenCounter:
+    """
+    Contagem de tokens com o tokenizer do modelo (HuggingFace). Sem acesso
+    ao tokenizer, cai para a estimativa help.estimate_tokens (len/4): o
+    aviso sai no carregamento e `stats()` / `exact` mostram qual está em uso.
+    """
+
+    def __init__(self, tokenizer_name: str | None = DEFAULT_TOKENIZER):
+        self.tokenizer_name = tokenizer_name
+        self.tokenizer = _load_tokenizer(tokenizer_name) if tokenizer_name else None
+        self.estimated_texts = 0
+
+    @property
+    def exact(self) -> bool:
+        """False quando as contagens são a estimativa len/4."""
+        return self.tokenizer is not None
+
+    def stats(self) -> dict:
+        return {
+            "tokenizer": self.tokenizer_name,
+            "exact": self.exact,
+            "fallback": None if self.exact else "len/4",
+            "estimated_texts": self.estimated_texts,
+        }
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            self.estimated_texts += len(texts)
+            return [estimate_tokens(t) for t in texts]
+        ids = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(x) for x in ids]
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Corta `text` em `max_tokens` tokens."""
+        if self.tokenizer is None:
+            return text[:max_tokens * 4]
+        ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        if len(ids) <= max_tokens:
+            return text
+        return self.tokenizer.decode(ids[:max_tokens])
+
+
+def chunk_text(text: str, counter: TokenCounter, chunk_tokens: int = 120) -> List[str]:
+    """
+    Divide o texto em trechos de até `chunk_tokens` tokens, respeitando
+    parágrafos e frases (frases maiores que o limite são cortadas).
+    """
+    sentences = []
+    for paragraph in text.split("\n"):
+        sentences.extend(s.strip() for s in _SENTENCE_END.split(paragraph) if s.strip())
+    if not sentences:
+        return []
+
+    chunks, current, used = [], [], 0
+    for sentence, n in zip(sentences, counter.count_many(sentences)):
+        if n > chunk_tokens:
+            sentence, n = counter.truncate(sentence, chunk_tokens), chunk_tokens
+        if current and used + n > chunk_tokens:
+            chunks.append(" ".join(current))
+            current, used = [], 0
+        current.append(sentence)
+        used += n
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def select_passages(text: str, query: str, embedder, budget_tokens: int = 1024,
+                    counter: TokenCounter | None = None, chunk_tokens: int = 120,
+                    separator: str = "\n[...]\n") -> str:
+    """
+    Reduz `text` a no máximo `budget_tokens` tokens mantendo os trechos mais
+    parecidos com `query` (similaridade coseno dos embeddings, um único
+    encode para a query e todos os trechos). Os trechos escolhidos voltam
+    na ordem original do texto. Textos que já cabem no orçamento não mudam.
+    """
+    if not text:
+        return text
+    counter = counter or TokenCounter()
+    if counter.count(text) <= budget_tokens:
+        return text
+
+    chunks = chunk_text(text, counter, chunk_tokens)
+    if not chunks:
+        return counter.truncate(text, budget_tokens)
+
+    # torch (HuggingFaceEmbedder) ou ndarray (ONNX / cache)
+    vectors = np.asarray(embedder.encode([query] + chunks), dtype=np.float32)
+    q, c = vectors[0], vectors[1:]
+    denom = np.linalg.norm(c, axis=1) * (np.linalg.norm(q) or 1.0)
+    scores = np.divide(c @ q, denom, out=np.zeros(len(chunks), dtype=np.float32), where=denom != 0)
+
+    sizes = counter.count_many(chunks)
+    sep_tokens = counter.count(separator)
+    chosen, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        cost = sizes[i] + (sep_tokens if chosen else 0)
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(int(i))
+        used += cost
+    if not chosen:
+        return counter.truncate(chunks[int(np.argmax(scores))], budget_tokens)
+    # o separador só marca os pontos onde houve corte
+    chosen.sort()
+    out = [chunks[chosen[0]]]
+    for prev, i in zip(chosen, chosen[1:]):
+        out.append((" " if i == prev + 1 else separator) + chunks[i])
+    return "".join(out)
@@ -0,0 +1,264 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import hnswlib  # opcional: busca aproximada para índices grandes
+except ImportError:
+    hnswlib = None
+
+
+DEFAULT_INDEX_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "cache", "vector_index"
+)
+
+
+class VectorIndex:
+    """
+    Índice local texto -> embedding normalizado, persistido em disco
+    ({name}.npy com os vetores + {name}.parquet com os textos).
+
+    Cada texto é codificado uma única vez; `ensure` só calcula os que ainda
+    não estão no índice. A busca é exata (produto interno em blocos com
+    numpy) ou aproximada com hnswlib, se estiver instalado e o índice tiver
+    pelo menos `hnsw_min_size` vetores.
+    """
+
+    def __init__(self, name: str = "titles", index_dir: str = DEFAULT_INDEX_DIR,
+                 dtype: str = "float16", hnsw_min_size: int = 50_000):
+        """
+        dtype: 'float16' ou 'float32' para os vetores salvos em disco
+        hnsw_min_size: a partir desse tamanho usa hnswlib (se disponível)
+        """
+        if dtype not in ("float16", "float32"):
+            raise ValueError("dtype do índice deve ser 'float16' ou 'float32'")
+        self.name = name
+        self.index_dir = index_dir
+        self.dtype = np.dtype(dtype)
+        self.hnsw_min_size = hnsw_min_size
+        self._lock = threading.RLock()
+
+        self.texts: List[str] = []
+        self._pos: Dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        self._hnsw = None
+        self._dirty = False
+        self._load()
+
+    # ---- arquivos ----
+    def _path(self, ext: str) -> str:
+        return os.path.join(self.index_dir, f"{self.name}.{ext}")
+
+    def _load(self) -> None:
+        if not os.path.exists(self._path("npy")):
+            return
+        vectors = np.load(self._path("npy")).astype(np.float32)
+        table = pq.read_table(self._path("parquet"))
+        self.texts = table.column("text").to_pylist()
+        self._pos = {t: i for i, t in enumerate(self.texts)}
+        self._vectors = vectors
+        self._size = len(self.texts)
+
+    def save(self) -> None:
+        """Grava o índice (arquivos temporários + rename: leitores nunca veem arquivo pela metade)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp = f".{os.getpid()}.tmp"
+            with open(self._path("npy") + tmp, "wb") as f:
+                np.save(f, self._vectors[:self._size].astype(self.dtype))
+            pq.write_table(pa.table({"text": self.texts}), self._path("parquet") + tmp)
+            for ext in ("npy", "parquet"):
+                os.replace(self._path(ext) + tmp, self._path(ext))
+            if self._hnsw is not None:
+                self._hnsw.save_index(self._path("hnsw"))
+            self._dirty = False
+
+    # ---- conteúdo ----
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._pos
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    def add(self, texts: Sequence[str], vectors) -> None:
+        """Adiciona textos novos (os já indexados são ignorados)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms != 0)
+
+        with self._lock:
+            new = [i for i, t in enumerate(texts) if t not in self._pos]
+            new = list({texts[i]: i for i in new}.values())
+            if not new:
+                return
+            if self._size == 0 and self._vectors.shape[1] != vectors.shape[1]:
+                self._vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            needed = self._size + len(new)
+            if needed > len(self._vectors):
+                # cresce em blocos para não copiar a matriz a cada lote
+                grown = np.zeros((max(needed, 2 * len(self._vectors)), vectors.shape[1]), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            self._vectors[self._size:needed] = vectors[new]
+            for j, i in enumerate(new):
+                self._pos[texts[i]] = self._size + j
+                self.texts.append(texts[i])
+            if self._hnsw is not None:
+                self._hnsw_add(range(self._size, needed))
+            self._size = needed
+            self._dirty = True
+
+    def ensure(self, texts: Iterable[str], embedder, add: bool = True) -> np.ndarray:
+        """
+        Vetores de `texts` (na ordem dada), codificando só os que faltam no
+        índice. Com add=False os textos novos não entram no índice.
+        """
+        texts = list(texts)
+        missing = list(dict.fromkeys(t for t in texts if t not in self._pos))
+        extra = {}
+        if missing:
+            vectors = np.asarray(embedder.encode(missing), dtype=np.float32)
+            if add:
+                self.add(missing, vectors)
+            else:
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms != 0)
+                extra = dict(zip(missing, vectors))
+        if not texts:
+            return np.zeros((0, self._vectors.shape[1]), dtype=np.float32)
+        with self._lock:
+            return np.stack([extra[t] if t in extra else self._vectors[self._pos[t]] for t in texts])
+
+    def as_embedder(self, embedder) -> "IndexedEmbedder":
+        return IndexedEmbedder(self, embedder)
+
+    # ---- busca ----
+    def _hnsw_add(self, rows) -> None:
+        rows = np.asarray(list(rows))
+        if len(rows) == 0:
+            return
+        if self._hnsw.get_current_count() + len(rows) > self._hnsw.get_max_elements():
+            self._hnsw.resize_index(2 * (self._hnsw.get_current_count() + len(rows)))
+        self._hnsw.add_items(self._vectors[rows], rows)
+
+    def _ann(self):
+        """Índice hnswlib (carregado do disco ou construído) quando compensa usá-lo."""
+        if hnswlib is None or self._size < self.hnsw_min_size:
+            return None
+        if self._hnsw is None:
+            dim = self._vectors.shape[1]
+            index = hnswlib.Index(space="ip", dim=dim)
+            path = self._path("hnsw")
+            if os.path.exists(path):
+                index.load_index(path, max_elements=2 * self._size)
+            else:
+                index.init_index(max_elements=2 * self._size, ef_construction=200, M=16)
+            self._hnsw = index
+            self._hnsw_add(range(index.get_current_count(), self._size))
+            index.set_ef(64)
+        return self._hnsw
+
+    def search(self, queries, k: int = 10, min_score: float | None = None,
+               block: int = 4096) -> List[List[Tuple[str, float]]]:
+        """
+        Para cada vetor de consulta, os `k` textos mais parecidos (coseno)
+        como [(texto, score), ...] em ordem decrescente.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms != 0)
+
+        with self._lock:
+            if self._size == 0:
+                return [[] for _ in range(len(queries))]
+            k = min(k, self._size)
+            ann = self._ann()
+            if ann is not None:
+                labels, distances = ann.knn_query(queries, k=k)
+                scores = 1.0 - distances
+            else:
+                labels = np.empty((len(queries), k), dtype=np.int64)
+                scores = np.empty((len(queries), k), dtype=np.float32)
+                vectors = self.vectors
+                for start in range(0, len(queries), block):
+                    sims = queries[start:start + block] @ vectors.T
+                    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                    top_scores = np.take_along_axis(sims, top, axis=1)
+                    order = np.argsort(-top_scores, axis=1)
+                    labels[start:start + block] = np.take_along_axis(top, order, axis=1)
+                    scores[start:start + block] = np.take_along_axis(top_scores, order, axis=1)
+            texts = self.texts
+
+        return [
+            [(texts[int(i)], float(s)) for i, s in zip(row_labels, row_scores)
+             if min_score is None or s >= min_score]
+            for row_labels, row_scores in zip(labels, scores)
+        ]
+
+    def search_texts(self, texts: Sequence[str], embedder, k: int = 10,
+                     min_score: float | None = None) -> List[List[Tuple[str, float]]]:
+        """search a partir de textos (os que não estão no índice são codificados, sem entrar nele)."""
+        if not texts:
+            return []
+        return self.search(self.ensure(texts, embedder, add=False), k=k, min_score=min_score)
+
+
+class IndexedEmbedder:
+    """Embedder que lê/grava os vetores no VectorIndex (mesma interface de encode)."""
+
+    def __init__(self, index: VectorIndex, embedder):
+        self.index = index
+        self.embedder = embedder
+
+    def encode(self, texts: List[str]):
+        import torch
+
+        if isinstance(texts, str):
+            texts = [texts]
+        return torch.from_numpy(self.index.ensure(texts, self.embedder))
+
+
+def sync_table(index: VectorIndex, conn, table: str, embedder,
+               columns: Sequence[str] = ("refined_title", "search_title"),
+               start_id: int | None = None, end_id: int | None = None,
+               batch_size: int = 4096) -> int:
+    """
+    Atualiza o índice com os textos de `table` (ex.: retrieved_news_google)
+    ainda não indexados, opcionalmente só na faixa [start_id, end_id) de
+    shuffle_id. Retorna quantos textos novos foram adicionados.
+    """
+    conditions, params = [], []
+    if start_id is not None:
+        conditions.append("shuffle_id >= %s")
+        params.append(start_id)
+    if end_id is not None:
+        conditions.append("shuffle_id < %s")
+        params.append(end_id)
+    where = f"AND {' AND '.join(conditions)}" if conditions else ""
+
+    texts = set()
+    with conn.cursor() as cur:
+        for column in columns:
+            cur.execute(f"""
+                SELECT DISTINCT btrim({column}) FROM {table}
+                WHERE {column} IS NOT NULL AND btrim({column}) <> '' {where}
+            """, params)
+            texts.update(row[0] for row in cur.fetchall())
+
+    missing = sorted(t for t in texts if t not in index)
+    for i in range(0, len(missing), batch_size):
+        part = missing[i:i + batch_size]
+        index.add(part, np.asarray(embedder.encode(part), dtype=np.float32))
+    index.save()
+    return len(missing)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escrita no Postgres: INSERT + commit por linha (como o
+get_response.py fazia) contra o BufferedWriter com INSERT multi-linha e COPY.
+
+Usa as mesmas variáveis POSTGRES_* do .env (docker-compose) e uma tabela
+descartável `bench_writer_results`, removida ao final.
+
+Exemplo:
+    python scripts/benchmark_scripts/bench_db_writer.py --rows 5000
+"""
+import os
+import sys
+import time
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+sys.path.append(MODULES_DIR)
+from db_writer import BufferedWriter, ensure_unique_key
+
+load_dotenv()
+
+TABLE = "bench_writer_results"
+COLUMNS = ("search_title", "shuffle_id", "response", "true_class")
+
+
+def reset_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE};")
+        cur.execute(f"""
+            CREATE TABLE {TABLE} (
+                id SERIAL PRIMARY KEY,
+                search_title TEXT,
+                shuffle_id INT,
+                response TEXT,
+                true_class TEXT
+            );
+        """)
+    conn.commit()
+    ensure_unique_key(conn, TABLE, ["shuffle_id"])
+
+
+def make_rows(n):
+    return [(f"Headline number {i} about\tsomething", i, "fake" if i % 2 else "real", "real")
+            for i in range(n)]
+
+
+def bench_per_row(conn, rows):
+    with conn.cursor() as cur:
+        for r in rows:
+            cur.execute(
+                f"INSERT INTO {TABLE} (search_title, shuffle_id, response, true_class) "
+                f"VALUES (%s, %s, %s, %s)", r
+            )
+            conn.commit()
+
+
+def bench_buffered(conn, rows, method, flush_rows):
+    with BufferedWriter(conn, TABLE, COLUMNS, key_columns=["shuffle_id"],
+                        method=method, flush_rows=flush_rows) as writer:
+        for r in rows:
+            writer.add(r)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escrita em lote no Postgres")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--flush_rows", type=int, default=500)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT", 5432)),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD")
+    )
+    rows = make_rows(args.rows)
+
+    cases = [
+        ("insert + commit por linha", lambda: bench_per_row(conn, rows)),
+        ("buffered (execute_values)", lambda: bench_buffered(conn, rows, "values", args.flush_rows)),
+        ("buffered (COPY)", lambda: bench_buffered(conn, rows, "copy", args.flush_rows)),
+        # segunda passada do COPY sobre a tabela cheia mede o caminho de upsert
+        ("buffered (COPY, upsert)", lambda: bench_buffered(conn, rows, "copy", args.flush_rows)),
+    ]
+
+    baseline = None
+    try:
+        for name, fn in cases:
+            if "upsert" not in name:
+                reset_table(conn)
+            t0 = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - t0
+            rate = args.rows / elapsed
+            baseline = baseline or rate
+            print(f"{name:<28} {rate:>10.0f} linhas/s  ({rate / baseline:.1f}x)")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE};")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
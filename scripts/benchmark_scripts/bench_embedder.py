@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark do HuggingFaceEmbedder em CPU: textos/s e pico de RSS.
+
+Cada tamanho roda em um subprocesso separado para que o pico de memória
+de um tamanho não contamine o seguinte. Para cada tamanho são medidas
+duas passadas: fria (cache vazio) e quente (tudo já no cache em disco).
+
+Exemplo:
+    python scripts/benchmark_scripts/bench_embedder.py --sizes 1000 10000 100000
+"""
+import os
+import sys
+import time
+import json
+import random
+import argparse
+import resource
+import subprocess
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '..', '..', 'data')
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+
+
+def load_titles(n: int) -> list:
+    """Títulos reais de data/Fake.csv + True.csv, repetidos/embaralhados até n."""
+    import pandas as pd
+
+    titles = []
+    for name in ('Fake.csv', 'True.csv'):
+        path = os.path.join(DATA_DIR, name)
+        if os.path.exists(path):
+            titles.extend(pd.read_csv(path, usecols=['title'])['title'].dropna().tolist())
+
+    if not titles:
+        # sem dataset local: gera títulos sintéticos com um vocabulário fixo
+        rng = random.Random(42)
+        vocab = ("trump obama senate vote court says report new police state war "
+                 "china russia election tax bill house white president news").split()
+        titles = [" ".join(rng.choices(vocab, k=rng.randint(6, 16))) for _ in range(5000)]
+
+    rng = random.Random(42)
+    out = []
+    while len(out) < n:
+        chunk = titles[:]
+        rng.shuffle(chunk)
+        # sufixo garante textos únicos (senão a passada fria usaria o cache)
+        out.extend(f"{t} #{len(out) + i}" for i, t in enumerate(chunk))
+    return out[:n]
+
+
+def run_single(size: int, model_name: str, batch_size: int, cache_dtype: str) -> dict:
+    sys.path.append(MODULES_DIR)
+    import torch
+    from embedder import HuggingFaceEmbedder
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    titles = load_titles(size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        embedder = HuggingFaceEmbedder(
+            model_name=model_name,
+            batch_size=batch_size,
+            cache_path=os.path.join(tmp, 'bench.sqlite'),
+            cache_dtype=cache_dtype,
+        )
+
+        t0 = time.perf_counter()
+        embedder.encode(titles)
+        cold = time.perf_counter() - t0
+
+        # LRU vazio força a leitura do disco, como em uma nova execução
+        embedder.cache._memory.clear()
+        t0 = time.perf_counter()
+        embedder.encode(titles)
+        warm = time.perf_counter() - t0
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "size": size,
+        "cold_texts_per_sec": round(size / cold, 1),
+        "warm_texts_per_sec": round(size / warm, 1),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do HuggingFaceEmbedder")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--model_name", type=str, default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--cache_dtype", type=str, default="float32", choices=["float16", "float32"])
+    parser.add_argument("--single", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        print(json.dumps(run_single(args.single, args.model_name, args.batch_size, args.cache_dtype)))
+        return
+
+    print(f"{'size':>8} | {'cold txt/s':>11} | {'warm txt/s':>11} | {'peak RSS (MB)':>13}")
+    for size in args.sizes:
+        out = subprocess.run(
+            [sys.executable, __file__, "--single", str(size),
+             "--model_name", args.model_name,
+             "--batch_size", str(args.batch_size),
+             "--cache_dtype", args.cache_dtype],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['size']:>8} | {r['cold_texts_per_sec']:>11} | "
+              f"{r['warm_texts_per_sec']:>11} | {r['peak_rss_mb']:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extração de páginas: páginas/s e tempo médio por etapa.
+
+Compara o pipeline antigo (newspaper + BeautifulSoup(html.parser) +
+trafilatura sobre str(soup), três parses por página) com o
+extract_page_content atual (um parse lxml compartilhado, extratores de
+texto em fallback).
+
+O corpus pode ser uma pasta de .html já salvos (mede só a extração) ou
+um arquivo com uma URL por linha (baixa as páginas uma vez e reaproveita
+o HTML nas duas variantes).
+
+Exemplos:
+    python scripts/benchmark_scripts/bench_extract.py --html_dir data/pages
+    python scripts/benchmark_scripts/bench_extract.py --urls urls.txt --limit 200
+"""
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+sys.path.append(MODULES_DIR)
+from extract_page_content import extract_page_content
+from page_fetcher import PageFetcher
+
+
+def legacy_extract(url, html):
+    """Mesmo trabalho do extract_page_content original, sem o download."""
+    import trafilatura
+    from bs4 import BeautifulSoup
+    from newspaper import Article
+
+    content = {}
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    content['newspaper_title'] = article.title
+    content['newspaper_text'] = article.text
+
+    soup = BeautifulSoup(article.html, "html.parser")
+    content['bs4_title'] = soup.title.get_text(strip=True) if soup.title else None
+    desc = soup.find("meta", property="og:description") or soup.find("meta", attrs={"name": "description"})
+    content['bs4_description'] = desc["content"] if desc else None
+    canonical = soup.find("link", rel="canonical")
+    content['bs4_link'] = canonical["href"] if canonical else None
+
+    dados = trafilatura.extract(str(soup), output_format="json", include_comments=False)
+    dados = json.loads(dados) if dados else {}
+    content['trafilatura_text'] = dados.get('text')
+    return content
+
+
+def load_corpus(args):
+    if args.html_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.html_dir, "*.htm*")))[:args.limit]:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append((f"file://{os.path.abspath(path)}", f.read()))
+        return pages
+
+    with open(args.urls) as f:
+        urls = [line.strip() for line in f if line.strip()][:args.limit]
+    t0 = time.perf_counter()
+    htmls = PageFetcher().fetch_many(urls, max_workers=args.fetch_workers)
+    elapsed = time.perf_counter() - t0
+    pages = [(u, h) for u, h in zip(urls, htmls) if h]
+    print(f"[INFO] {len(pages)}/{len(urls)} páginas baixadas em {elapsed:.1f}s "
+          f"({len(urls) / elapsed:.1f} URLs/s)")
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extract_page_content")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--html_dir", help="Pasta com páginas .html salvas")
+    group.add_argument("--urls", help="Arquivo com uma URL por linha")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--fetch_workers", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=1, help="Passadas sobre o corpus")
+    args = parser.parse_args()
+
+    pages = load_corpus(args)
+    if not pages:
+        print("[ERRO] Corpus vazio.")
+        return
+
+    n = len(pages) * args.repeat
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for url, html in pages:
+            try:
+                legacy_extract(url, html)
+            except Exception:
+                pass
+    legacy_rate = n / (time.perf_counter() - t0)
+
+    stages = defaultdict(float)
+    backends = defaultdict(int)
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for url, html in pages:
+            content = extract_page_content(url, html=html, store=False)
+            for stage, secs in content["timings"].items():
+                stages[stage] += secs
+            backends[content["text_backend"]] += 1
+    rate = n / (time.perf_counter() - t0)
+
+    print(f"\n{'antigo (3 parses)':<22} {legacy_rate:>8.1f} páginas/s")
+    print(f"{'atual (1 parse)':<22} {rate:>8.1f} páginas/s  ({rate / legacy_rate:.1f}x)")
+    print("\nTempo médio por etapa (ms/página):")
+    for stage, secs in stages.items():
+        print(f"  {stage:<12} {1000 * secs / n:>8.2f}")
+    print("\nExtrator de texto usado:")
+    for name, count in sorted(backends.items(), key=lambda kv: -kv[1]):
+        print(f"  {str(name):<12} {count:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Compara os backends de embedding em CPU: PyTorch (HuggingFaceEmbedder),
+ONNX Runtime fp32 e ONNX Runtime int8 (OnnxEmbedder).
+
+1. Paridade: drift do coseno entre os vetores de cada backend e os do
+   PyTorch nos títulos já recuperados (retrieved_news_{engine}), e quanto
+   muda a similaridade search_title x refined_title que o pré-filtro usa
+   (inclusive quantos pares trocam de lado em cada limiar).
+2. Desempenho: textos/s em lote (sem cache) e latência p50/p99 de um
+   encode de um único texto (caso do TitleRefiner / serviço).
+
+Sem Postgres (--no_db), usa os títulos de data/Fake.csv + True.csv.
+
+Exemplos:
+    python scripts/benchmark_scripts/bench_onnx_embedder.py --engine google --threads 4
+    python scripts/benchmark_scripts/bench_onnx_embedder.py --no_db --model_name ./models/distilbert-base-uncased
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+sys.path.append(MODULES_DIR)
+from bench_embedder import load_titles
+from prefilter import DEFAULT_THRESHOLDS
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def load_pairs(engine: str, limit: int) -> list:
+    """Pares (search_title, refined_title) de retrieved_news_{engine}."""
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT", 5432)),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD")
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT search_title, refined_title FROM retrieved_news_{engine}
+                WHERE refined_title IS NOT NULL AND btrim(refined_title) <> ''
+                ORDER BY md5(refined_title)
+                LIMIT %s
+            """, (limit,))
+            return [(a, b.strip()) for a, b in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def parity(reference: np.ndarray, candidate: np.ndarray, pairs_ref: np.ndarray,
+           pairs_cand: np.ndarray) -> dict:
+    drift = 1.0 - np.einsum("ij,ij->i", reference, candidate)
+    sim_diff = np.abs(pairs_ref - pairs_cand)
+    flips = {f"flips@{t}": int(((pairs_ref >= t) != (pairs_cand >= t)).sum()) for t in DEFAULT_THRESHOLDS}
+    return {
+        "drift_mean": float(drift.mean()),
+        "drift_p99": float(np.percentile(drift, 99)),
+        "drift_max": float(drift.max()),
+        "sim_diff_max": float(sim_diff.max()),
+        **flips,
+    }
+
+
+def pair_similarity(embedder, pairs) -> np.ndarray:
+    a = np.asarray(embedder.encode([p[0] for p in pairs]), dtype=np.float32)
+    b = np.asarray(embedder.encode([p[1] for p in pairs]), dtype=np.float32)
+    return np.einsum("ij,ij->i", a, b)
+
+
+def throughput(embedder, texts) -> float:
+    embedder.cache._memory.clear()
+    t0 = time.perf_counter()
+    embedder._forward(texts)  # sem cache: mede só o modelo
+    return len(texts) / (time.perf_counter() - t0)
+
+
+def latency(embedder, texts, n: int) -> tuple:
+    samples = []
+    for text in texts[:n]:
+        t0 = time.perf_counter()
+        embedder._forward([text])
+        samples.append(time.perf_counter() - t0)
+    p50, p99 = np.percentile(samples, [50, 99])
+    return p50 * 1000, p99 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridade e desempenho dos backends de embedding")
+    parser.add_argument("--model_name", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--engine", choices=["google", "ddgo"], default="google")
+    parser.add_argument("--no_db", action="store_true", help="Usa títulos do dataset em vez do Postgres")
+    parser.add_argument("--parity_size", type=int, default=5000, help="Pares para a checagem de paridade")
+    parser.add_argument("--bench_size", type=int, default=2000, help="Textos para medir textos/s")
+    parser.add_argument("--latency_calls", type=int, default=200, help="Encodes de 1 texto para p50/p99")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None, help="Threads intra-op (torch e ORT)")
+    args = parser.parse_args()
+
+    import torch
+    from embedder import load_embedder
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    if args.no_db:
+        titles = load_titles(2 * args.parity_size)
+        pairs = list(zip(titles[::2], titles[1::2]))
+    else:
+        pairs = load_pairs(args.engine, args.parity_size)
+    print(f"[INFO] {len(pairs)} pares para a checagem de paridade")
+    texts = list(dict.fromkeys(t for p in pairs for t in p))
+    bench_texts = load_titles(args.bench_size)
+
+    embedders = {}
+    for backend in args.backends:
+        kwargs = {"batch_size": args.batch_size, "cache_path": None}
+        if backend != "torch":
+            kwargs["intra_op_threads"] = args.threads
+        embedders[backend] = load_embedder(args.model_name, backend, **kwargs)
+
+    reference = embedders.get("torch") or load_embedder(args.model_name, "torch", cache_path=None)
+    ref_vectors = np.asarray(reference.encode(texts), dtype=np.float32)
+    ref_pairs = pair_similarity(reference, pairs)
+
+    print(f"\n{'backend':>10} | {'txt/s':>8} | {'p50 ms':>7} | {'p99 ms':>7} | "
+          f"{'drift mean':>10} | {'drift max':>9} | {'Δsim max':>8} | flips {'/'.join(map(str, DEFAULT_THRESHOLDS))}")
+    for backend, embedder in embedders.items():
+        vectors = np.asarray(embedder.encode(texts), dtype=np.float32)
+        p = parity(ref_vectors, vectors, ref_pairs, pair_similarity(embedder, pairs))
+        rate = throughput(embedder, bench_texts)
+        p50, p99 = latency(embedder, bench_texts, args.latency_calls)
+        flips = "/".join(str(p[f"flips@{t}"]) for t in DEFAULT_THRESHOLDS)
+        print(f"{backend:>10} | {rate:>8.1f} | {p50:>7.2f} | {p99:>7.2f} | "
+              f"{p['drift_mean']:>10.2e} | {p['drift_max']:>9.2e} | {p['sim_diff_max']:>8.4f} | {flips}")
+
+
+if __name__ == "__main__":
+    main()
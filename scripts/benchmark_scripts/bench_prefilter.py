@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark do prefilter_results na carga do notebook generate_prompts:
+um grupo de resultados por título (~20 por busca), filtrado título a título.
+
+Compara a versão antiga (relê credible_sources.txt a cada chamada, dois
+encode separados, cosine_similarity do sklearn e uma varredura com .copy()
+por limiar) com a atual. As duas usam o mesmo embedder com o cache já
+aquecido, para medir o custo do filtro e não o do modelo.
+
+Exemplo:
+    python scripts/benchmark_scripts/bench_prefilter.py --titles 2000 --per_title 20
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+DOMAINS_FILE = os.path.join(BASE_DIR, '..', '..', 'out', 'credible_sources.txt')
+sys.path.append(MODULES_DIR)
+from prefilter import prefilter_results
+from help import load_credible_domains
+from bench_embedder import load_titles
+
+
+def legacy_prefilter(results, original_title, embedder, credible_domains_file):
+    """prefilter_results como estava antes (referência)."""
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    credible_domains = load_credible_domains(credible_domains_file)
+    valid_items, valid_titles = [], []
+    for r in results:
+        t = r.get("refined_title")
+        if isinstance(t, str) and t.strip() != "":
+            valid_items.append(r)
+            valid_titles.append(t.strip())
+    if not valid_items:
+        return []
+
+    embeddings = embedder.encode(valid_titles)
+    original_emb = embedder.encode([original_title])
+    sim_scores = cosine_similarity(original_emb, embeddings)[0]
+
+    filtered_results = []
+    for th in [0.85, 0.80, 0.70]:
+        filtered_results = []
+        for i, score in enumerate(sim_scores):
+            if score >= th:
+                r = valid_items[i].copy()
+                r["similarity"] = float(score)
+                r["credible"] = r["domain"] in credible_domains
+                filtered_results.append(r)
+        if filtered_results:
+            break
+    if not filtered_results:
+        for i, score in enumerate(sim_scores):
+            r = valid_items[i].copy()
+            r["similarity"] = float(score)
+            r["credible"] = r["domain"] in credible_domains
+            filtered_results.append(r)
+    return filtered_results
+
+
+def make_workload(n_titles, per_title):
+    """[(título buscado, [resultados])] com domínios confiáveis, subdomínios e desconhecidos."""
+    rng = random.Random(42)
+    domains = load_credible_domains(DOMAINS_FILE)
+    pool = domains + [f"edition.{d}" for d in domains[:10]] + [f"blog{i}.example.org" for i in range(50)]
+    titles = load_titles(n_titles * (per_title + 1))
+    workload = []
+    for i in range(n_titles):
+        group = titles[i * (per_title + 1):(i + 1) * (per_title + 1)]
+        results = [{
+            "refined_title": t if rng.random() > 0.05 else None,
+            "original_title": t,
+            "domain": rng.choice(pool),
+            "snippet": "",
+            "search_title": group[0],
+            "shuffle_id": i,
+        } for t in group[1:]]
+        workload.append((group[0], results))
+    return workload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do prefilter_results")
+    parser.add_argument("--titles", type=int, default=2000)
+    parser.add_argument("--per_title", type=int, default=20)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    from embedder import HuggingFaceEmbedder
+
+    workload = make_workload(args.titles, args.per_title)
+    embedder = HuggingFaceEmbedder(model_name=args.model, cache_path=None,
+                                   memory_cache_size=args.titles * (args.per_title + 1) * 2)
+
+    # aquece o cache de embeddings com todos os textos
+    for title, results in workload:
+        prefilter_results(results, title, embedder, DOMAINS_FILE)
+
+    timings = {}
+    for name, fn in (("antigo", legacy_prefilter), ("atual", prefilter_results)):
+        t0 = time.perf_counter()
+        kept = sum(len(fn(results, title, embedder, DOMAINS_FILE)) for title, results in workload)
+        timings[name] = time.perf_counter() - t0
+        print(f"{name:<8} {args.titles / timings[name]:>10.0f} títulos/s  "
+              f"({1000 * timings[name] / args.titles:.3f} ms/título, {kept} resultados mantidos)")
+    print(f"speedup: {timings['antigo'] / timings['atual']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
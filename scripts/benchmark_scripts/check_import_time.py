@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Verifica o orçamento de tempo de import (python -X importtime).
+
+- Cada módulo de modules/ é importado em um processo novo: o tempo
+  cumulativo precisa ficar abaixo do orçamento e nenhum pacote pesado
+  (torch, transformers, sklearn, newspaper, ddgs, trafilatura) pode ser
+  carregado só pelo import.
+- Cada script de scripts/ roda com --help: mesmo orçamento de pacotes
+  pesados e um limite de tempo total (argparse não deve carregar modelos).
+
+Sai com código 1 se algo estourar (dá para usar em CI / pre-commit).
+
+Exemplos:
+    python scripts/benchmark_scripts/check_import_time.py
+    python scripts/benchmark_scripts/check_import_time.py --module_budget 0.3 --repeat 5
+"""
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', '..'))
+MODULES_DIR = os.path.join(ROOT_DIR, 'modules')
+
+HEAVY_PACKAGES = ("torch", "transformers", "sklearn", "newspaper", "ddgs", "trafilatura", "onnxruntime")
+
+# módulos que carregam um pacote pesado de propósito (o pacote é a função deles)
+ALLOWED_HEAVY = {
+    "prefilter_ner": (),
+}
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def importtime(args, cwd) -> tuple:
+    """(tempo total do processo em s, {pacote: cumulativo em s}) de um processo com -X importtime."""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=cwd,
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    cumulative = {}
+    for match in _LINE.finditer(proc.stderr):
+        name = match.group(4)
+        cumulative[name] = max(cumulative.get(name, 0.0), int(match.group(2)) / 1e6)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "erro")
+    return elapsed, cumulative
+
+
+def heavy_loaded(cumulative: dict) -> list:
+    return sorted({name.split(".")[0] for name in cumulative} & set(HEAVY_PACKAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de tempo de import dos módulos e scripts")
+    parser.add_argument("--module_budget", type=float, default=0.5, help="Segundos por import de módulo")
+    parser.add_argument("--script_budget", type=float, default=3.0, help="Segundos por 'script --help'")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por alvo (vale a menor)")
+    parser.add_argument("--modules", nargs="*", default=None, help="Só estes módulos")
+    parser.add_argument("--skip_scripts", action="store_true")
+    args = parser.parse_args()
+
+    failures = []
+    modules = args.modules or sorted(
+        os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(MODULES_DIR, "*.py"))
+    )
+
+    print(f"{'módulo':<24} | {'import (s)':>10} | pesados")
+    for module in modules:
+        try:
+            runs = [importtime(["-c", f"import {module}"], MODULES_DIR) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{module:<24} | {'erro':>10} | {e}")
+            failures.append(module)
+            continue
+        seconds = min(r[1].get(module, 0.0) for r in runs)
+        heavy = [h for h in heavy_loaded(runs[0][1]) if h not in ALLOWED_HEAVY.get(module, ())]
+        flag = "" if seconds <= args.module_budget and not heavy else "  <-- estourou"
+        print(f"{module:<24} | {seconds:>10.3f} | {', '.join(heavy) or '-'}{flag}")
+        if flag:
+            failures.append(module)
+
+    if not args.skip_scripts:
+        print(f"\n{'script --help':<56} | {'total (s)':>9} | pesados")
+        for script in sorted(glob.glob(os.path.join(ROOT_DIR, "scripts", "*", "*.py"))):
+            name = os.path.relpath(script, ROOT_DIR)
+            if script == os.path.abspath(__file__):
+                continue
+            try:
+                runs = [importtime([script, "--help"], ROOT_DIR) for _ in range(args.repeat)]
+            except RuntimeError as e:
+                print(f"{name:<56} | {'erro':>9} | {e}")
+                failures.append(name)
+                continue
+            seconds = min(r[0] for r in runs)
+            heavy = heavy_loaded(runs[0][1])
+            flag = "" if seconds <= args.script_budget and not heavy else "  <-- estourou"
+            print(f"{name:<56} | {seconds:>9.2f} | {', '.join(heavy) or '-'}{flag}")
+            if flag:
+                failures.append(name)
+
+    if failures:
+        print(f"\n[ERRO] {len(failures)} alvo(s) fora do orçamento: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n[OK] Todos os imports dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
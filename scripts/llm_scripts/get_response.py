@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import pandas as pd
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import urllib3
@@ -19,23 +18,23 @@ MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
 # Adiciona o path para importar a LLM (duas pastas acima)
 sys.path.append(MODULES_DIR)
 from llm_base import LLM  # ajuste o nome do arquivo se necessário
+from db_writer import BufferedWriter, ensure_unique_key
+from dataset import shuffle_class_map
 
 
 
 def load_shuffle_classes(data_dir):
-    """Carrega os CSVs Fake/True e retorna um dict shuffle_id -> true_class"""
-    fake_df = pd.read_csv(os.path.join(data_dir, 'Fake.csv'))
-    true_df = pd.read_csv(os.path.join(data_dir, 'True.csv'))
-    fake_df['class'] = 'fake'
-    true_df['class'] = 'real'
-    df = pd.concat([fake_df, true_df], axis=0).drop_duplicates(subset='title')
-    df_shuffled = df.sample(frac=1, random_state=42).reset_index(drop=True)
-    df_shuffled['shuffle_id'] = df_shuffled.index
-    # Mapeia shuffle_id para a classe verdadeira
-    return df_shuffled.set_index('shuffle_id')['class'].to_dict()
-
-
-def main(test_name: str, start_id: int = 0, end_id: int = None):
+    """Retorna um dict shuffle_id -> true_class (a partir do parquet canônico do dataset)"""
+    return shuffle_class_map(data_dir)
+
+
+RESULT_COLUMNS = ("search_title", "shuffle_id", "response", "true_class")
+
+
+def main(test_name: str, start_id: int = 0, end_id: int = None,
+         concurrency: int = 8, rpm: float = None, tpm: float = None,
+         flush_rows: int = 200, flush_seconds: float = 5.0, chunk_size: int = 256,
+         dedupe: bool = False):
     # Conexão com o banco usando SQLAlchemy
     user = os.getenv("POSTGRES_USER")
     password = os.getenv("POSTGRES_PASSWORD")
@@ -43,28 +42,16 @@ def main(test_name: str, start_id: int = 0, end_id: int = None):
     port = os.getenv("POSTGRES_PORT")
     db = os.getenv("POSTGRES_DB")
 
-    engine = create_engine(f"postgresql://{user}:{password}@{host}:{port}/{db}")
+    # psycopg2 explícito: cursor nomeado (stream_results) e COPY do BufferedWriter
+    engine = create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{db}")
 
     # Carrega mapeamento shuffle_id -> true_class
     shuffle_to_class = load_shuffle_classes(DATA_DIR)
 
-    # Tabela de prompts
+    # Cria tabela de resultados se não existir (agora com true_class)
     table_name = f"{test_name}_prompts"
-    query = f"SELECT * FROM {table_name} ORDER BY shuffle_id;"
-
-    print('Search table', table_name)
-    with engine.begin() as conn: 
-        result = conn.execute(text(query))
-        rows = result.fetchall()  # pega todos de uma vez
-        prompts_data = [dict(row._mapping) for row in rows]
-        # Filtra no Python pelo shuffle_id
-        if start_id is not None:
-            prompts_data = [row for row in prompts_data if row['shuffle_id'] >= start_id]
-        if end_id is not None:
-            prompts_data = [row for row in prompts_data if row['shuffle_id'] < end_id]
-
-        # Cria tabela de resultados se não existir (agora com true_class)
-        results_table = f"{test_name}_results"
+    results_table = f"{test_name}_results"
+    with engine.begin() as conn:
         conn.execute(text(f"""
             CREATE TABLE IF NOT EXISTS {results_table} (
                 id SERIAL PRIMARY KEY,
@@ -75,48 +62,63 @@ def main(test_name: str, start_id: int = 0, end_id: int = None):
             );
         """))
 
-        res = conn.execute(text(f"SELECT shuffle_id FROM {results_table};"))
-        existing_ids = {row[0] for row in res.fetchall()}
-
-        prompts_data = [row for row in prompts_data if row['shuffle_id'] not in existing_ids]
+    # Intervalo e "ainda sem resposta" (anti-join) filtrados no próprio Postgres
+    query = text(f"""
+        SELECT p.search_title, p.shuffle_id, p.prompt
+        FROM {table_name} p
+        WHERE p.shuffle_id >= :start_id
+          AND (CAST(:end_id AS INT) IS NULL OR p.shuffle_id < :end_id)
+          AND NOT EXISTS (
+              SELECT 1 FROM {results_table} r WHERE r.shuffle_id = p.shuffle_id
+          )
+        ORDER BY p.shuffle_id;
+    """)
+    params = {"start_id": start_id or 0, "end_id": end_id}
 
     # Inicializa a LLM Groq
     groq_llm = LLM(
         model="llama-3.1-8b-instant",
         api_key_env="GROQ_API_KEY",
-        endpoint="https://api.groq.com/openai/v1/chat/completions"
+        endpoint="https://api.groq.com/openai/v1/chat/completions",
+        max_concurrency=concurrency,
+        requests_per_minute=rpm,
+        tokens_per_minute=tpm,
     )
 
-    # Processa cada prompt e salva no banco
-    with engine.connect() as conn:  # begin() garante commit automático
-        for idx, row in enumerate(prompts_data, 1):
-            prompt = row.get('prompt')
-            search_title = row.get('search_title')
-            shuffle_id = row.get('shuffle_id')
-            true_class = shuffle_to_class.get(shuffle_id, None)
-
-            try:
-                response = groq_llm.generate(prompt)
-                print(f"\nPrompt {idx} (shuffle_id={shuffle_id}):")
+    # Processa os prompts em blocos concorrentes e salva no banco em lotes
+    # (COPY + upsert por shuffle_id, então reexecuções não duplicam linhas)
+    raw_conn = engine.raw_connection()
+    ensure_unique_key(raw_conn, results_table, ["shuffle_id"], dedupe=dedupe)
+    print('Search table', table_name)
+    processed = 0
+    # stream_results usa um cursor nomeado (server-side): a memória fica
+    # limitada a um bloco de chunk_size linhas, seja qual for o tamanho da tabela
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_size) as conn, \
+            BufferedWriter(raw_conn, results_table, RESULT_COLUMNS, key_columns=["shuffle_id"],
+                           flush_rows=flush_rows, flush_seconds=flush_seconds) as writer:
+        result = conn.execute(query, params)
+        for chunk in result.mappings().partitions(chunk_size):
+            responses = groq_llm.generate_many([row['prompt'] for row in chunk])
+
+            for row, response in zip(chunk, responses):
+                processed += 1
+                search_title = row['search_title']
+                shuffle_id = row['shuffle_id']
+                true_class = shuffle_to_class.get(shuffle_id, None)
+
+                if isinstance(response, Exception):
+                    print(f"Erro ao processar prompt {processed} (shuffle_id={shuffle_id}): {response}")
+                    continue
+
+                print(f"\nPrompt {processed} (shuffle_id={shuffle_id}):")
                 print(f"Resposta: {response} | Classe real: {true_class}")
 
-                # Insere no banco
-                conn.execute(
-                    text(f"""
-                        INSERT INTO {results_table} 
-                        (search_title, shuffle_id, response, true_class) 
-                        VALUES (:search_title, :shuffle_id, :response, :true_class)
-                    """),
-                    {
-                        "search_title": search_title,
-                        "shuffle_id": shuffle_id,
-                        "response": response,
-                        "true_class": true_class
-                    }
-                )
-                conn.commit() 
-            except Exception as e:
-                print(f"Erro ao processar prompt {idx} (shuffle_id={shuffle_id}): {e}")
+                writer.add((search_title, shuffle_id, response, true_class))
+
+    raw_conn.close()
+    groq_llm.close()
+    print(f"[INFO] {writer.written} respostas gravadas em {results_table}")
+    print(f"[INFO] Cache de respostas da LLM: {groq_llm.cache_stats()}")
 
 
 if __name__ == "__main__":
@@ -124,7 +126,16 @@ if __name__ == "__main__":
     parser.add_argument("test_name", type=str, help="Nome do teste (prefixo da tabela de prompts)")
     parser.add_argument("--start_id", type=int, default=0, help="ID inicial do shuffle para processar")
     parser.add_argument("--end_id", type=int, default=None, help="ID final do shuffle para processar")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requisições simultâneas à LLM")
+    parser.add_argument("--rpm", type=float, default=None, help="Limite de requisições por minuto do provedor")
+    parser.add_argument("--tpm", type=float, default=None, help="Limite de tokens por minuto do provedor")
+    parser.add_argument("--flush_rows", type=int, default=200, help="Grava no banco a cada N respostas")
+    parser.add_argument("--flush_seconds", type=float, default=5.0, help="Grava no banco a cada T segundos")
+    parser.add_argument("--chunk_size", type=int, default=256, help="Prompts lidos do banco por bloco")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Apaga shuffle_ids duplicados já gravados (fica a linha mais recente)")
     args = parser.parse_args()
 
     print('Executing test name', args.test_name)
-    main(args.test_name, args.start_id, args.end_id)
+    main(args.test_name, args.start_id, args.end_id, args.concurrency, args.rpm, args.tpm,
+         args.flush_rows, args.flush_seconds, args.chunk_size, args.dedupe)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Reexecuta a extração sobre o acervo local de páginas (cache/pages.sqlite),
+sem baixar nada de novo. Útil depois de mudar o extract_page_content:
+incremente EXTRACTOR_VERSION e rode este script para regravar os campos.
+
+Exemplos:
+    python scripts/page_scripts/replay_extract.py
+    python scripts/page_scripts/replay_extract.py --force --csv replay.csv
+"""
+import os
+import sys
+import time
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+sys.path.append(MODULES_DIR)
+from extract_page_content import EXTRACTOR_VERSION, extract_page_content
+from page_store import DEFAULT_STORE_PATH, PageStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reextrai o conteúdo das páginas guardadas")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Arquivo do PageStore")
+    parser.add_argument("--force", action="store_true",
+                        help="Reextrai mesmo as páginas que já têm campos da versão atual")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--csv", default=None, help="Salva url/title/text_backend/tamanho do texto em CSV")
+    args = parser.parse_args()
+
+    store = PageStore(args.store, max_bytes=None)
+    print(f"[INFO] Acervo: {store.stats()} | versão do extrator: {EXTRACTOR_VERSION}")
+
+    rows = []
+    done = reused = empty = 0
+    t0 = time.perf_counter()
+    for url, chash, html in store.iter_pages():
+        if args.limit and done >= args.limit:
+            break
+        content = None if args.force else store.get_extracted(chash, EXTRACTOR_VERSION)
+        if content is not None:
+            reused += 1
+        else:
+            # store=False: extrai de novo; a gravação é feita abaixo
+            content = extract_page_content(url, html=html, store=False)
+            content.pop("timings", None)
+            store.put_extracted(chash, EXTRACTOR_VERSION, content)
+        done += 1
+        if not content.get("text"):
+            empty += 1
+        rows.append({
+            "url": url,
+            "title": content.get("title"),
+            "text_backend": content.get("text_backend"),
+            "text_len": len(content.get("text") or ""),
+        })
+    elapsed = time.perf_counter() - t0
+
+    print(f"[OK] {done} páginas em {elapsed:.1f}s ({done / max(elapsed, 1e-9):.1f} páginas/s) | "
+          f"reaproveitadas: {reused} | sem texto: {empty}")
+
+    if args.csv:
+        import pandas as pd
+        pd.DataFrame(rows).to_csv(args.csv, index=False)
+        print(f"[INFO] Resumo salvo em {args.csv}")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
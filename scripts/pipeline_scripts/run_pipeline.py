@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Detector de ponta a ponta em streaming (versão em script do laço do
+detector.ipynb): busca -> refinamento -> pré-filtro -> prompt -> LLM ->
+gravação, cada etapa com a sua concorrência e filas limitadas entre elas.
+
+Entrada: faixa de shuffle_id do dataset canônico (respostas gravadas em
+{test}_results, pulando os shuffle_id já respondidos) ou manchetes pelo
+stdin, uma por linha (respostas em JSON lines no stdout).
+
+Exemplos:
+    python scripts/pipeline_scripts/run_pipeline.py --engine ddgo --test test1 --start_id 0 --end_id 500
+    python scripts/pipeline_scripts/run_pipeline.py --engine google --refine --claim_cache --start_id 500 --end_id 1000
+    python scripts/pipeline_scripts/run_pipeline.py --engine federated --budget 3 --target 5 --start_id 0 --end_id 500
+    python scripts/pipeline_scripts/run_pipeline.py --engine google --offline --test test2 --start_id 0 --end_id 2000
+    cat manchetes.txt | python scripts/pipeline_scripts/run_pipeline.py --stdin --engine google --no_db
+"""
+import os
+import sys
+import json
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '..', '..', 'data')
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+DEFAULT_DOMAINS_FILE = os.path.join(BASE_DIR, '..', '..', 'out', 'credible_sources.txt')
+sys.path.append(MODULES_DIR)
+from pipeline import RESULT_COLUMNS, build_detector, frame_items, headline_items
+from retrieval_runner import ENGINE_RATE_LIMITS
+
+
+def make_engine_factory(args, embedder):
+    from search_engines import DuckDuckGoSearchEngine, FederatedSearchEngine, GoogleSearchEngine
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    builders = {
+        "google": lambda: GoogleSearchEngine(api_key=api_key),
+        "ddgo": lambda: DuckDuckGoSearchEngine(),
+    }
+    if args.search_cache or args.offline:
+        from cache_store import SQLiteStore
+        from search_cache import DEFAULT_CACHE_PATH, CachedSearchEngine
+
+        # um SQLiteStore para todas as threads; no offline o mecanismo real nem é criado
+        store = SQLiteStore(DEFAULT_CACHE_PATH, table="search_results")
+        ttl = args.cache_ttl_days * 24 * 3600 if args.cache_ttl_days else None
+        builders = {
+            name: (lambda name=name, build=build: CachedSearchEngine(
+                None if args.offline else build(), name, ttl_seconds=ttl, offline=args.offline, store=store))
+            for name, build in builders.items()
+        }
+
+    if args.engine == "federated":
+        # uma instância por worker de busca (cada uma com o seu cliente ddgo)
+        return lambda: FederatedSearchEngine(
+            {name: build() for name, build in builders.items()},
+            embedder=embedder, credible_domains_file=args.credible_file,
+            target=args.target, budget=args.budget,
+        )
+    return builders[args.engine]
+
+
+def make_llm(args):
+    from llm_base import LLM, LOCAL_LLM
+
+    if args.local:
+        return LOCAL_LLM(model=args.llm_model, max_concurrency=args.concurrency)
+    return LLM(
+        model=args.llm_model,
+        api_key_env="GROQ_API_KEY",
+        endpoint="https://api.groq.com/openai/v1/chat/completions",
+        max_concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+    )
+
+
+def answered_ids(raw_conn, table: str, start_id: int, end_id: int | None) -> set:
+    with raw_conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT shuffle_id FROM {table}
+            WHERE shuffle_id >= %s AND (%s::INT IS NULL OR shuffle_id < %s)
+        """, (start_id, end_id, end_id))
+        return {row[0] for row in cur.fetchall()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector de fake news em streaming")
+    parser.add_argument("--engine", choices=["google", "ddgo", "federated"], default="ddgo",
+                        help="federated = google + ddgo em paralelo, resultados juntos e sem duplicatas")
+    parser.add_argument("--budget", type=float, default=5.0, help="(federated) Segundos por mecanismo")
+    parser.add_argument("--target", type=int, default=None,
+                        help="(federated) Encerra a busca com N resultados confiáveis e parecidos")
+    parser.add_argument("--search_cache", action="store_true",
+                        help="Reaproveita buscas já feitas (cache/search_results.sqlite)")
+    parser.add_argument("--cache_ttl_days", type=float, default=30, help="Validade do cache de buscas (0 = sem)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Só o cache de buscas, sem rede (manchetes fora do cache falham)")
+    parser.add_argument("--test", default="test1", help="Modo do prompt_builder; grava {test}_results")
+    parser.add_argument("--start_id", type=int, default=0, help="shuffle_id inicial (inclusivo)")
+    parser.add_argument("--end_id", type=int, default=None, help="shuffle_id final (exclusivo)")
+    parser.add_argument("--stdin", action="store_true", help="Lê manchetes do stdin (uma por linha)")
+    parser.add_argument("--no_db", action="store_true", help="Não grava no Postgres (só stdout)")
+    parser.add_argument("--no_resume", action="store_true", help="Reprocessa shuffle_ids já respondidos")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Apaga shuffle_ids duplicados já gravados em {test}_results (fica a linha mais recente)")
+    parser.add_argument("--num_results", type=int, default=10)
+    parser.add_argument("--top_x", type=int, default=10, help="Resultados mantidos por manchete")
+    parser.add_argument("--refine", action="store_true", help="Completa títulos truncados (TitleRefiner)")
+    parser.add_argument("--claim_cache", action="store_true",
+                        help="Reaproveita veredictos de manchetes iguais/parecidas (cache/claims.sqlite)")
+    parser.add_argument("--credible_file", default=DEFAULT_DOMAINS_FILE)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2", help="Embedder")
+    parser.add_argument("--backend", choices=["torch", "onnx", "onnx-int8"], default="torch",
+                        help="Backend do embedder (onnx/onnx-int8 = ONNX Runtime em CPU)")
+    parser.add_argument("--llm_model", default="llama-3.1-8b-instant")
+    parser.add_argument("--local", action="store_true", help="Usa a LLM local (Ollama) em vez da Groq")
+    parser.add_argument("--retrieve_workers", type=int, default=4)
+    parser.add_argument("--refine_workers", type=int, default=4)
+    parser.add_argument("--prefilter_workers", type=int, default=1)
+    parser.add_argument("--classify_batch", type=int, default=16, help="Prompts por chamada a generate_many")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requisições simultâneas à LLM")
+    parser.add_argument("--rpm", type=float, default=None)
+    parser.add_argument("--tpm", type=float, default=None)
+    parser.add_argument("--rate", type=float, default=None, help="Buscas por segundo (padrão por mecanismo)")
+    parser.add_argument("--queue_size", type=int, default=64, help="Itens por fila entre etapas")
+    args = parser.parse_args()
+
+    from embedder import load_embedder
+
+    embedder = load_embedder(args.model, args.backend)
+    title_refiner = None
+    if args.refine:
+        from search_engines import TitleRefiner
+        title_refiner = TitleRefiner(embedder=embedder, similarity_threshold=0.85)
+    claim_cache = None
+    if args.claim_cache:
+        from claim_cache import ClaimCache
+        claim_cache = ClaimCache(embedder)
+
+    rate, burst = ENGINE_RATE_LIMITS[args.engine]
+    if args.rate is not None:
+        rate = args.rate
+
+    class_map = None
+    if args.stdin:
+        items = headline_items(sys.stdin)
+    else:
+        from dataset import load_shuffled, shuffle_class_map
+        df = load_shuffled(DATA_DIR, columns=("shuffle_id", "title"),
+                           start_id=args.start_id, end_id=args.end_id)
+        class_map = shuffle_class_map(DATA_DIR)
+
+    raw_conn = None
+    writer = None
+    results_table = f"{args.test}_results"
+    if not args.no_db:
+        import psycopg2
+        from db_writer import BufferedWriter, ensure_unique_key
+
+        raw_conn = psycopg2.connect(
+            host=os.getenv("POSTGRES_HOST"),
+            port=int(os.getenv("POSTGRES_PORT", 5432)),
+            dbname=os.getenv("POSTGRES_DB"),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD")
+        )
+        with raw_conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {results_table} (
+                    id SERIAL PRIMARY KEY,
+                    search_title TEXT,
+                    shuffle_id INT,
+                    response TEXT,
+                    true_class TEXT
+                );
+            """)
+        raw_conn.commit()
+        ensure_unique_key(raw_conn, results_table, ["shuffle_id"], dedupe=args.dedupe)
+        if not args.stdin and not args.no_resume:
+            done = answered_ids(raw_conn, results_table, args.start_id, args.end_id)
+            df = df[~df["shuffle_id"].isin(done)]
+            print(f"[INFO] {len(done)} shuffle_ids já respondidos em {results_table}", file=sys.stderr)
+        writer = BufferedWriter(raw_conn, results_table, RESULT_COLUMNS, key_columns=["shuffle_id"])
+
+    if not args.stdin:
+        print(f"[INFO] Processando {len(df)} títulos (shuffle_id {args.start_id} -> {args.end_id})",
+              file=sys.stderr)
+        items = frame_items(df)
+
+    llm = make_llm(args)
+    pipeline = build_detector(
+        make_engine_factory(args, embedder), embedder, llm, mode=args.test,
+        title_refiner=title_refiner, claim_cache=claim_cache, writer=writer, class_map=class_map,
+        source=f"{args.engine}/{args.test}/{args.llm_model}",
+        credible_domains_file=args.credible_file, num_results=args.num_results, top_x=args.top_x,
+        retrieve_workers=args.retrieve_workers, refine_workers=args.refine_workers,
+        prefilter_workers=args.prefilter_workers, classify_batch=args.classify_batch,
+        rate=rate, burst=burst, queue_size=args.queue_size,
+    )
+
+    failed = 0
+    semantic = 0
+    try:
+        for item in pipeline.run(items):
+            if item.get("cached") == "semantic":
+                semantic += 1
+            if item.get("error"):
+                failed += 1
+                print(f"[ERRO] shuffle_id={item['shuffle_id']}: {item['error']}", file=sys.stderr)
+            if args.stdin or args.no_db:
+                print(json.dumps({
+                    "shuffle_id": item["shuffle_id"],
+                    "headline": item["headline"],
+                    "response": item.get("response"),
+                    "cached": item.get("cached"),
+                    "num_results": len(item.get("results") or []),
+                    "error": item.get("error"),
+                }, ensure_ascii=False), flush=True)
+    finally:
+        llm.close()
+        if claim_cache is not None:
+            claim_cache.close()  # grava os índices de embeddings alterados
+        if writer is not None:
+            writer.close()
+            print(f"[INFO] {writer.written} respostas gravadas em {results_table}", file=sys.stderr)
+        if raw_conn is not None:
+            raw_conn.close()
+
+    print(f"[RESUMO] {pipeline.report()}", file=sys.stderr)
+    print(f"[RESUMO] Falhas: {failed}", file=sys.stderr)
+    if claim_cache is not None:
+        print(f"[RESUMO] Claim cache: {claim_cache.stats()}", file=sys.stderr)
+        if semantic and writer is not None:
+            print(f"[AVISO] {semantic} manchetes respondidas por uma manchete parecida não foram gravadas "
+                  f"em {results_table} (rode sem --claim_cache para classificá-las)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Geração dos prompts {test}_prompts a partir de retrieved_news_{engine},
+em lote para a faixa de shuffle_id inteira (versão em script dos
+notebooks generate_prompts*.ipynb).
+
+Em vez de filtrar o DataFrame título a título, o pré-filtro roda sobre a
+tabela toda (prefilter.prefilter_frame): um encode para todos os títulos,
+similaridade e limiares vetorizados por grupo. As tabelas de prompts são
+gravadas com COPY, substituindo apenas os shuffle_id da faixa processada.
+
+Exemplos:
+    python scripts/prompt_scripts/generate_prompts.py --engine google --start_id 0 --end_id 2000
+    python scripts/prompt_scripts/generate_prompts.py --engine ddgo --tests test1 test2 --stats
+"""
+import os
+import sys
+import time
+import argparse
+from itertools import groupby
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+DEFAULT_DOMAINS_FILE = os.path.join(BASE_DIR, '..', '..', 'out', 'credible_sources.txt')
+sys.path.append(MODULES_DIR)
+from prefilter import prefilter_frame
+from prompt_builder import build_prompt
+from help import estimate_tokens
+from db_writer import BufferedWriter
+
+RESULT_FIELDS = ["refined_title", "original_title", "domain", "snippet",
+                 "search_title", "shuffle_id", "similarity", "credible"]
+PROMPT_COLUMNS = ("search_title", "shuffle_id", "prompt", "num_results",
+                  "approx_tokens", "prompt_length_chars")
+STATS_COLUMNS = ("search_title", "shuffle_id", "total_before", "duplicates_removed",
+                 "non_similar_removed", "totat_after", "top_x_count")
+
+
+def load_results(engine, table, start_id, end_id):
+    query = text(f"""
+        SELECT search_title, original_title, refined_title, snippet, domain, shuffle_id
+        FROM {table}
+        WHERE shuffle_id >= :start_id
+          AND (CAST(:end_id AS INT) IS NULL OR shuffle_id < :end_id)
+    """)
+    return pd.read_sql(query, engine, params={"start_id": start_id, "end_id": end_id})
+
+
+def group_results(kept: pd.DataFrame) -> dict:
+    """search_title -> lista de resultados (dicts), convertendo o DataFrame uma única vez."""
+    records = kept[RESULT_FIELDS].to_dict("records")
+    # kept já vem ordenado por search_title
+    return {title: list(rows) for title, rows in groupby(records, key=lambda r: r["search_title"])}
+
+
+def make_prompt_rows(stats: pd.DataFrame, results_by_title: dict, mode: str) -> list:
+    rows = []
+    for title, shuffle_id in zip(stats["search_title"], stats["shuffle_id"]):
+        filtered_results = results_by_title.get(title, [])
+        prompt = build_prompt(mode=mode, title_to_check=title, results_filtered=filtered_results)
+        rows.append((title, int(shuffle_id), prompt, len(filtered_results),
+                     estimate_tokens(prompt), len(prompt)))
+    return rows
+
+
+def write_table(raw_conn, table, columns, column_types, rows):
+    """Cria a tabela se preciso e substitui as linhas dos shuffle_id presentes em `rows`."""
+    with raw_conn.cursor() as cur:
+        cols = ", ".join(f"{c} {column_types.get(c, 'BIGINT')}" for c in columns)
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols});")
+    raw_conn.commit()
+    with BufferedWriter(raw_conn, table, columns, key_columns=["shuffle_id"],
+                        mode="replace", flush_rows=max(len(rows), 1)) as writer:
+        writer.add_many(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera as tabelas {test}_prompts em lote")
+    parser.add_argument("--engine", choices=["google", "ddgo"], default="google",
+                        help="Lê retrieved_news_{engine}")
+    parser.add_argument("--start_id", type=int, default=0, help="shuffle_id inicial (inclusivo)")
+    parser.add_argument("--end_id", type=int, default=None, help="shuffle_id final (exclusivo)")
+    parser.add_argument("--tests", nargs="+", default=["test1", "test2", "test3", "test4"],
+                        help="Modos do prompt_builder; grava {test}_prompts")
+    parser.add_argument("--top_x", type=int, default=10, help="Resultados mantidos por título")
+    parser.add_argument("--credible_file", default=DEFAULT_DOMAINS_FILE)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--batch_size", type=int, default=256, help="Textos por forward pass do embedder")
+    parser.add_argument("--index", action="store_true",
+                        help="Lê/grava os embeddings no índice local de títulos (cache/vector_index)")
+    parser.add_argument("--stats", action="store_true",
+                        help="Também grava retrieved_news_{engine}_prefilter_stats")
+    args = parser.parse_args()
+
+    from embedder import HuggingFaceEmbedder
+
+    user = os.getenv("POSTGRES_USER")
+    password = os.getenv("POSTGRES_PASSWORD")
+    host = os.getenv("POSTGRES_HOST", "localhost")
+    port = os.getenv("POSTGRES_PORT")
+    db = os.getenv("POSTGRES_DB")
+    engine = create_engine(f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{db}")
+
+    source = f"retrieved_news_{args.engine}"
+    t0 = time.perf_counter()
+    df = load_results(engine, source, args.start_id, args.end_id)
+    print(f"[INFO] {len(df)} linhas / {df['search_title'].nunique()} títulos lidos de {source} "
+          f"({time.perf_counter() - t0:.1f}s)")
+    if df.empty:
+        return
+
+    t0 = time.perf_counter()
+    embedder = HuggingFaceEmbedder(model_name=args.model, batch_size=args.batch_size)
+    index = None
+    if args.index:
+        from vector_index import VectorIndex
+        index = VectorIndex(name=args.model.replace("/", "__"))
+        embedder = index.as_embedder(embedder)
+    kept, stats = prefilter_frame(df, embedder, credible_domains_file=args.credible_file,
+                                  top_x=args.top_x)
+    if index is not None:
+        index.save()
+    results_by_title = group_results(kept)
+    print(f"[INFO] Pré-filtro: {len(kept)} resultados mantidos ({time.perf_counter() - t0:.1f}s)")
+
+    raw_conn = engine.raw_connection()
+    try:
+        for test in args.tests:
+            t0 = time.perf_counter()
+            rows = make_prompt_rows(stats, results_by_title, test)
+            write_table(raw_conn, f"{test}_prompts", PROMPT_COLUMNS,
+                        {"search_title": "TEXT", "prompt": "TEXT"}, rows)
+            print(f"[OK] {len(rows)} prompts gravados em {test}_prompts ({time.perf_counter() - t0:.1f}s)")
+
+        if args.stats:
+            rows = list(stats[list(STATS_COLUMNS)].itertuples(index=False, name=None))
+            write_table(raw_conn, f"{source}_prefilter_stats", STATS_COLUMNS,
+                        {"search_title": "TEXT"}, rows)
+            print(f"[OK] Estatísticas gravadas em {source}_prefilter_stats")
+    finally:
+        raw_conn.close()
+
+
+if __name__ == "__main__":
+    main()
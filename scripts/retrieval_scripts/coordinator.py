@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Coordenador do retrieval em shards (fila retrieval_shards no Postgres).
+
+Subcomandos:
+    plan     divide [start_id, end_id) em shards e marca no checkpoint os
+             shuffle_ids que já estão em retrieved_news_{engine}
+    run      (plan opcional) + sobe N processos retrieval_worker.py nesta
+             máquina e mostra o progresso agregado até terminarem
+    status   progresso agregado (todas as máquinas); --watch atualiza
+    requeue  devolve à fila os shards 'failed' (e, com --leased, os arrendados)
+
+Workers em outras máquinas só precisam do mesmo .env (Postgres) e de
+`retrieval_worker.py --engine ...`; o lease (FOR UPDATE SKIP LOCKED) evita
+faixas sobrepostas e shards de workers mortos voltam à fila quando o
+lease vence.
+
+Exemplos:
+    python scripts/retrieval_scripts/coordinator.py plan --engine ddgo --start_id 0 --end_id 20000 --shard_size 250
+    python scripts/retrieval_scripts/coordinator.py run --engine ddgo --processes 4 --rate 2 --start_id 0 --end_id 20000
+    python scripts/retrieval_scripts/coordinator.py status --engine ddgo --watch 30
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '..', '..', 'data')
+LOG_DIR = os.path.join(BASE_DIR, '..', '..', 'logs')
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+WORKER_SCRIPT = os.path.join(BASE_DIR, 'retrieval_worker.py')
+sys.path.append(MODULES_DIR)
+from retrieval_progress import ensure_progress_table, backfill_from_results
+from retrieval_runner import ENGINE_RATE_LIMITS
+from retrieval_shards import ensure_shard_table, expire_leases, plan_shards, requeue_shards, shard_status
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT", 5432)),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD")
+    )
+
+
+def plan(conn, args) -> None:
+    end_id = args.end_id
+    if end_id is None:
+        from dataset import load_shuffled
+        end_id = int(load_shuffled(DATA_DIR, columns=("shuffle_id",))["shuffle_id"].max()) + 1
+    backfilled = backfill_from_results(conn, args.engine, f"retrieved_news_{args.engine}")
+    if backfilled:
+        print(f"[INFO] {backfilled} shuffle_ids já presentes em retrieved_news_{args.engine} marcados como concluídos")
+    try:
+        total = plan_shards(conn, args.engine, args.start_id, end_id, args.shard_size)
+    except ValueError as e:
+        print(f"[ERRO] {e}")
+        sys.exit(1)
+    print(f"[INFO] {total} shards de até {args.shard_size} ids em [{args.start_id}, {end_id})")
+
+
+def format_status(status: dict, rate: float | None = None) -> str:
+    shards = status["shards"]
+    total, done = status["ids_total"], status["ids_done"]
+    pct = 100 * done / total if total else 0.0
+    counts = ", ".join(f"{name} {shards.get(name, {}).get('shards', 0)}"
+                       for name in ("done", "leased", "pending", "failed"))
+    line = f"[PROGRESSO] {status['engine']}: {done}/{total} ids ({pct:.1f}%) | shards: {counts}"
+    if rate:
+        eta = (total - done) / rate
+        line += f" | {rate:.2f} ids/s | ETA {eta / 60:.0f} min"
+    lines = [line]
+    for lease in status["leases"]:
+        flag = "  (lease vencido: volta à fila ou falha, se sem tentativas)" if lease["expired"] else ""
+        lines.append(f"    {lease['worker']:<32} shard {lease['start_id']}-{lease['end_id']} "
+                     f"{lease['processed']} títulos, {lease['age_seconds']}s, tentativa {lease['attempts']}{flag}")
+    return "\n".join(lines)
+
+
+def report_status(conn, engine: str, max_attempts: int, rate: float | None = None) -> dict:
+    failed = expire_leases(conn, engine, max_attempts)
+    if failed:
+        print(f"[AVISO] {failed} shards com lease vencido e sem tentativas restantes marcados como 'failed'")
+    status = shard_status(conn, engine)
+    print(format_status(status, rate), flush=True)
+    return status
+
+
+def watch(conn, engine: str, interval: float, max_attempts: int, until=None) -> None:
+    """Mostra o status a cada `interval` s (taxa entre leituras) até `until()` ser True."""
+    last = None
+    while True:
+        now = time.monotonic()
+        done = shard_status(conn, engine)["ids_done"]
+        rate = None
+        if last is not None and now > last[0]:
+            rate = (done - last[1]) / (now - last[0])
+        report_status(conn, engine, max_attempts, rate)
+        last = (now, done)
+        if until is not None and until():
+            return
+        time.sleep(interval)
+
+
+def run(conn, args) -> None:
+    if args.start_id is not None:
+        plan(conn, args)
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    # o limite de buscas/s vale para o conjunto (mesmo IP): cada processo fica com
+    # uma fração, também quando vale o padrão do engine
+    total_rate = args.rate if args.rate else ENGINE_RATE_LIMITS[args.engine][0]
+    rate = total_rate / args.processes
+    procs = []
+    for i in range(args.processes):
+        cmd = [sys.executable, WORKER_SCRIPT, "--engine", args.engine, "--workers", str(args.workers),
+               "--lease_seconds", str(args.lease_seconds), "--max_attempts", str(args.max_attempts)]
+        cmd += ["--rate", str(rate)]
+        log_path = os.path.join(LOG_DIR, f"retrieval_worker_{args.engine}_{i}.log")
+        log = open(log_path, "a")
+        procs.append((subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT), log))
+        print(f"[INFO] Worker {i} iniciado (pid {procs[-1][0].pid}), log em {log_path}")
+
+    def stop_all(*_):
+        print("[AVISO] Encerrando workers (os shards deles voltam à fila quando o lease vencer)")
+        for proc, _ in procs:
+            proc.terminate()
+        sys.exit(1)
+
+    signal.signal(signal.SIGINT, stop_all)
+    signal.signal(signal.SIGTERM, stop_all)
+    try:
+        watch(conn, args.engine, args.interval, args.max_attempts, until=lambda: all(p.poll() is not None for p, _ in procs))
+    finally:
+        for _, log in procs:
+            log.close()
+    codes = [p.returncode for p, _ in procs]
+    print(f"[RESUMO] Workers encerrados (códigos de saída: {codes})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordena o retrieval em shards")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("--engine", choices=["google", "ddgo"], required=True)
+
+    def planning(p, required: bool):
+        p.add_argument("--start_id", type=int, default=0 if required else None,
+                       help="shuffle_id inicial (inclusivo)" + ("" if required else "; se dado, planeja antes"))
+        p.add_argument("--end_id", type=int, default=None, help="shuffle_id final (exclusivo; padrão: fim do dataset)")
+        p.add_argument("--shard_size", type=int, default=500, help="shuffle_ids por shard")
+
+    p_plan = sub.add_parser("plan", help="Cria os shards")
+    common(p_plan)
+    planning(p_plan, required=True)
+
+    p_run = sub.add_parser("run", help="Sobe workers locais e acompanha o progresso")
+    common(p_run)
+    planning(p_run, required=False)
+    p_run.add_argument("--processes", type=int, default=4, help="Processos worker nesta máquina")
+    p_run.add_argument("--workers", type=int, default=4, help="Buscas simultâneas por processo")
+    p_run.add_argument("--rate", type=float, default=None,
+                       help="Buscas por segundo somando todos os processos (padrão: o limite do engine)")
+    p_run.add_argument("--lease_seconds", type=int, default=300)
+    p_run.add_argument("--max_attempts", type=int, default=3)
+    p_run.add_argument("--interval", type=float, default=30, help="Segundos entre relatórios de progresso")
+
+    p_status = sub.add_parser("status", help="Progresso agregado")
+    common(p_status)
+    p_status.add_argument("--watch", type=float, default=None, help="Atualiza a cada N segundos")
+    p_status.add_argument("--max_attempts", type=int, default=3,
+                          help="Lease vencido com N tentativas vira 'failed' (igual ao dos workers)")
+
+    p_requeue = sub.add_parser("requeue", help="Devolve shards à fila")
+    common(p_requeue)
+    p_requeue.add_argument("--leased", action="store_true",
+                           help="Também os arrendados (só com todos os workers parados)")
+
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        ensure_progress_table(conn)
+        ensure_shard_table(conn)
+        if args.command == "plan":
+            plan(conn, args)
+        elif args.command == "run":
+            run(conn, args)
+        elif args.command == "status":
+            if args.watch:
+                watch(conn, args.engine, args.watch, args.max_attempts)
+            else:
+                report_status(conn, args.engine, args.max_attempts)
+        elif args.command == "requeue":
+            count = requeue_shards(conn, args.engine, failed=True, leased=args.leased)
+            print(f"[OK] {count} shards devolvidos à fila")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,4 +10,24 @@ python scripts/retrieval_ddgo.py --start_id 0 --end_id 10
 nohup python scripts/retrieval_ddgo.py --start_id 10 --end_id 2000 > logs/retrieval_ddgo.log 2>&1 &
 nohup python scripts/retrieval_ddgo.py --start_id 0 --end_id 2000 > logs/retrieval_ddgo_2.log 2>&1 &
 nohup python scripts/retrieval_ddgo.py --start_id 2000 --end_id 5000 > logs/retrieval_ddgo_2000_5000.log 2>&1 &
-nohup python scripts/retrieval_ddgo.py --start_id 2000 --end_id 5000 > logs/retrieval_ddgo_2000_5000_2.log 2>&1 &
\ No newline at end of file
+nohup python scripts/retrieval_ddgo.py --start_id 2000 --end_id 5000 > logs/retrieval_ddgo_2000_5000_2.log 2>&1 &
+## Retrieve paralelo (um processo por faixa já satura a rede)
+nohup python ./scripts/retrieval_scripts/retrieval_ddgo.py --start_id 0 --end_id 5000 --workers 4 > logs/retrieval_ddgo_parallel.log 2>&1 &
+nohup python ./scripts/retrieval_scripts/retrieval_google.py --start_id 0 --end_id 5000 --workers 8 --rate 5 > logs/retrieval_google_parallel.log 2>&1 &
+
+## Retomar a partir do checkpoint (retrieval_progress) e retentar falhas antigas
+python ./scripts/retrieval_scripts/retrieval_ddgo.py --start_id 2000 --end_id 5000 --import_reports out/failed_titles_report_ddgo_*.csv --only_failed
+
+## Indexa os títulos recuperados (incremental: só codifica os novos)
+python ./scripts/retrieval_scripts/sync_title_index.py --engines google ddgo
+
+## Retrieval em shards (fila no Postgres; workers em várias máquinas)
+python ./scripts/retrieval_scripts/coordinator.py plan --engine ddgo --start_id 5000 --end_id 20000 --shard_size 250
+nohup python ./scripts/retrieval_scripts/coordinator.py run --engine ddgo --processes 4 --workers 4 --rate 2 > logs/coordinator_ddgo.log 2>&1 &
+nohup python ./scripts/retrieval_scripts/retrieval_worker.py --engine ddgo --workers 4 --rate 0.5 > logs/retrieval_worker_ddgo_remote.log 2>&1 &
+python ./scripts/retrieval_scripts/coordinator.py status --engine ddgo
+python ./scripts/retrieval_scripts/coordinator.py requeue --engine ddgo
+
+## Cache de buscas: copia o que já está no Postgres e roda os experimentos sem rede
+python ./scripts/retrieval_scripts/seed_search_cache.py --engines google ddgo
+python ./scripts/pipeline_scripts/run_pipeline.py --engine google --offline --test test1 --start_id 0 --end_id 2000
@@ -16,10 +16,6 @@ load_dotenv()
 # -------------------------------
 ENV_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env'))
 load_dotenv(ENV_PATH)
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    print("[ERRO] GOOGLE_API_KEY não encontrada no .env")
-    sys.exit(1)
 
 # -------------------------------
 # 1️⃣ Receber parâmetros
@@ -27,10 +23,23 @@ if not API_KEY:
 parser = argparse.ArgumentParser()
 parser.add_argument("--start_id", type=int, default=0, help="ID inicial do shuffle para processar")
 parser.add_argument("--end_id", type=int, default=None, help="ID final do shuffle para processar")
+parser.add_argument("--workers", type=int, default=8, help="Buscas simultâneas")
+parser.add_argument("--rate", type=float, default=None, help="Limite de buscas por segundo no Serper")
+parser.add_argument("--no_resume", action="store_true", help="Reprocessa shuffle_ids já concluídos")
+parser.add_argument("--max_attempts", type=int, default=3, help="Desiste de um shuffle_id após N falhas")
+parser.add_argument("--only_failed", action="store_true", help="Processa apenas shuffle_ids com status 'failed' (inclusive os que esgotaram --max_attempts)")
+parser.add_argument("--import_reports", type=str, nargs="*", default=[], help="CSVs failed_titles_report_<engine>_* a importar como falhas (só linhas deste engine)")
+parser.add_argument("--search_cache", action="store_true", help="Reaproveita buscas já feitas (cache/search_results.sqlite)")
 args = parser.parse_args()
 start_id = args.start_id
 end_id = args.end_id
 
+# checado depois do argparse: --help não precisa da chave
+API_KEY = os.getenv("GOOGLE_API_KEY")
+if not API_KEY:
+    print("[ERRO] GOOGLE_API_KEY não encontrada no .env")
+    sys.exit(1)
+
 # -------------------------------
 # 2️⃣ Configurar diretórios
 # -------------------------------
@@ -43,43 +52,41 @@ OUTPUT_DIR = os.path.join(BASE_DIR, '..', '..', 'out')
 # Adicionar modules ao sys.path
 sys.path.append(MODULES_DIR)
 from search_engines import GoogleSearchEngine, TitleRefiner
-from embedder import HuggingFaceEmbedder 
-
-# -------------------------------
-# 3️⃣ Carregar CSVs
-# -------------------------------
-fake_df = pd.read_csv(os.path.join(DATA_DIR, 'Fake.csv'))
-true_df = pd.read_csv(os.path.join(DATA_DIR, 'True.csv'))
-fake_df['class'] = 'fake'
-true_df['class'] = 'true'
-df = pd.concat([fake_df, true_df], axis=0).drop_duplicates(subset='title')
-
-# -------------------------------
-# 4️⃣ Shuffle fixo e criar shuffle_id
-# -------------------------------
-df_shuffled = df.sample(frac=1, random_state=42).reset_index(drop=True)
-df_shuffled['shuffle_id'] = df_shuffled.index
+from embedder import HuggingFaceEmbedder
+from dataset import load_shuffled
+from retrieval_runner import run_retrieval, ENGINE_RATE_LIMITS
+from retrieval_progress import (
+    ensure_progress_table, backfill_from_results, import_failure_reports,
+    done_shuffle_ids, failed_shuffle_ids,
+)
 
 # -------------------------------
-# 5️⃣ Selecionar intervalo
+# 3️⃣ Carregar títulos do intervalo (parquet canônico: Fake + True,
+#    sem duplicatas, shuffle fixo com random_state=42 -> shuffle_id)
 # -------------------------------
+sample_df = load_shuffled(DATA_DIR, columns=('shuffle_id', 'title'), start_id=start_id, end_id=end_id)
 if end_id is None:
-    end_id = len(df_shuffled)
-sample_df = df_shuffled[(df_shuffled['shuffle_id'] >= start_id) & (df_shuffled['shuffle_id'] < end_id)]
+    end_id = int(sample_df['shuffle_id'].max()) + 1 if len(sample_df) else start_id
 print(f"[INFO] Processando {len(sample_df)} títulos (shuffle_id {start_id} -> {end_id})")
 
 # -------------------------------
-# 6️⃣ Inicializar SearchEngine
+# 4️⃣ Inicializar SearchEngine
 # -------------------------------
 
 title_refiner = TitleRefiner(
     embedder=HuggingFaceEmbedder(model_name="sentence-transformers/all-MiniLM-L6-v2"),
     similarity_threshold=0.85
 )
-search_engine = GoogleSearchEngine(api_key=API_KEY, title_refiner=title_refiner)
+if args.search_cache:
+    from search_cache import CachedSearchEngine
+    # o cache guarda páginas cruas: o refiner roda no CachedSearchEngine
+    search_engine = CachedSearchEngine(GoogleSearchEngine(api_key=API_KEY), "google",
+                                       title_refiner=title_refiner)
+else:
+    search_engine = GoogleSearchEngine(api_key=API_KEY, title_refiner=title_refiner)
 
 # -------------------------------
-# 7️⃣ Conectar ao Postgres
+# 5️⃣ Conectar ao Postgres
 # -------------------------------
 try:
     conn = psycopg2.connect(
@@ -89,102 +96,68 @@ try:
         user=os.getenv("POSTGRES_USER"),
         password=os.getenv("POSTGRES_PASSWORD")
     )
-    cur = conn.cursor()
     print("[INFO] Conexão com Postgres realizada com sucesso")
 except Exception as e:
     print(f"[ERRO] Falha ao conectar no Postgres: {e}")
     sys.exit(1)
 
 # -------------------------------
-# 8️⃣ Inicializar listas de sucesso/falha
-# -------------------------------
-failed_titles = []
-success_count = 0
-
-# -------------------------------
-# 9️⃣ Iterar sobre os títulos
-# -------------------------------
-for idx, row in sample_df.iterrows():
-    title_1 = row['title']
-    shuffle_id = row['shuffle_id']
-    print(f"[INFO] Processando shuffle_id {shuffle_id}: {title_1[:60]}...")
-
-    try:
-        results = search_engine.search(title_1, num_results=10)
-    except Exception as e:
-        print(f"[ERRO] Falha na busca do título: {e}")
-        failed_titles.append({'title': title_1, 'shuffle_id': shuffle_id, 'reason': f'Busca falhou: {e}'})
-        continue
-
-    records_to_insert = [
-        (
-            title_1,
-            r.get('title'),
-            r.get('refined_title'),
-            r.get('snippet'),
-            r.get('link'),
-            r.get('domain'),
-            shuffle_id  # novo campo
-        )
-        for r in results
-    ]
-
-
-    if not records_to_insert:
-        records_to_insert = [
-            (
-                    title_1,      # string
-                    None,    # string
-                    None,              # refined_title
-                    None,              # snippet
-                    None,              # link
-                    None,              # domain
-                    shuffle_id         # int
-                )
-        ]
-        print(f"[AVISO] Nenhum resultado para inserir para shuffle_id {shuffle_id}")
-        failed_titles.append({'title': title_1, 'shuffle_id': shuffle_id, 'reason': 'Nenhum resultado inserido'})
-
-    try:
-        INSERT_QUERY = """
-            INSERT INTO retrieved_news_google (
-                search_title,
-                original_title,
-                refined_title,
-                snippet,
-                link,
-                domain,
-                shuffle_id
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """
-
-        # Supondo que records_to_insert agora contenha também refined_title
-        # Cada tupla: (search_title, original_title, refined_title, snippet, link, domain, shuffle_id)
-        cur.executemany(INSERT_QUERY, records_to_insert)
-        conn.commit()
-        success_count += len(records_to_insert)
-        print(f"[INFO] Inseridos {len(records_to_insert)} registros para shuffle_id {shuffle_id}")
-    except Exception as e:
-        conn.rollback()
-        print(f"[ERRO] Falha ao inserir batch para shuffle_id {shuffle_id}: {e}")
-        failed_titles.append({'title': title_1, 'shuffle_id': shuffle_id, 'reason': f'Insert batch falhou: {e}'})
-
-
-# -------------------------------
-# 10️⃣ Fechar conexão
-# -------------------------------
-cur.close()
+# 6️⃣ Retomar do checkpoint (pula shuffle_ids concluídos)
+# -------------------------------
+ENGINE_NAME = "google"
+if not args.no_resume:
+    ensure_progress_table(conn)
+    backfilled = backfill_from_results(conn, ENGINE_NAME, "retrieved_news_google")
+    if backfilled:
+        print(f"[INFO] {backfilled} shuffle_ids já presentes em retrieved_news_google marcados como concluídos")
+    if args.import_reports:
+        imported = import_failure_reports(conn, ENGINE_NAME, args.import_reports)
+        print(f"[INFO] {imported} falhas importadas dos relatórios CSV")
+
+    # --only_failed é a retentativa explícita: ignora o limite de max_attempts
+    done_ids = done_shuffle_ids(conn, ENGINE_NAME, start_id, end_id,
+                                None if args.only_failed else args.max_attempts)
+    sample_df = sample_df[~sample_df['shuffle_id'].isin(done_ids)]
+    if args.only_failed:
+        retry_ids = failed_shuffle_ids(conn, ENGINE_NAME, start_id, end_id)
+        sample_df = sample_df[sample_df['shuffle_id'].isin(retry_ids)]
+    print(f"[INFO] Restam {len(sample_df)} títulos após o checkpoint ({len(done_ids)} pulados)")
+
+# -------------------------------
+# 7️⃣ Buscar títulos em paralelo (escritor único em lote)
+# -------------------------------
+rate, burst = ENGINE_RATE_LIMITS["google"]
+if args.rate is not None:
+    rate = args.rate
+
+success_count, failed_titles = run_retrieval(
+    items=zip(sample_df['shuffle_id'].tolist(), sample_df['title'].tolist()),
+    engine_factory=lambda: search_engine,
+    conn=conn,
+    table="retrieved_news_google",
+    num_results=10,
+    workers=args.workers,
+    rate=rate,
+    burst=burst,
+    progress_engine=None if args.no_resume else ENGINE_NAME,
+    insert_placeholder_on_empty=True,
+)
+
+# -------------------------------
+# 8️⃣ Fechar conexão
+# -------------------------------
 conn.close()
 print("[INFO] Script finalizado com sucesso")
 
 # -------------------------------
-# 11️⃣ Criar CSV de relatório
+# 9️⃣ Criar CSV de relatório
 # -------------------------------
 if failed_titles:
     report_df = pd.DataFrame(failed_titles)
+    # engine no nome e na coluna: import_failure_reports só importa as falhas do próprio engine
+    report_df.insert(0, "engine", ENGINE_NAME)
     now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    report_path = os.path.join(OUTPUT_DIR, f'failed_titles_report_{now_str}.csv')
+    report_path = os.path.join(OUTPUT_DIR, f'failed_titles_report_{ENGINE_NAME}_{now_str}.csv')
     report_df.to_csv(report_path, index=False)
     print(f"[INFO] Relatório de falhas salvo em: {report_path}")
 
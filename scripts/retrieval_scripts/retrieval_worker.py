@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Worker de retrieval por shards: arrenda um shard da fila retrieval_shards
+(criada pelo coordinator.py), busca os títulos da faixa que ainda não estão
+concluídos no checkpoint e fecha o shard; repete até a fila acabar.
+
+Vários workers (na mesma máquina ou em outras, apontando para o mesmo
+Postgres) dividem a fila sem sobreposição: o lease usa
+SELECT ... FOR UPDATE SKIP LOCKED, é renovado por heartbeat e, se o
+worker morrer, volta para a fila quando vence. Cada gravação confere o
+lease na mesma transação, então um worker "zumbi" não duplica linhas.
+
+Normalmente é iniciado pelo coordinator.py (run); para outras máquinas:
+    python scripts/retrieval_scripts/retrieval_worker.py --engine ddgo --workers 4 --rate 0.5
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '..', '..', 'data')
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+sys.path.append(MODULES_DIR)
+from retrieval_runner import ENGINE_RATE_LIMITS, run_retrieval
+from retrieval_progress import ensure_progress_table, done_shuffle_ids
+from retrieval_shards import ensure_shard_table, lease_shard, renew_lease, finish_shard, check_lease
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT", 5432)),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD")
+    )
+
+
+def make_engine_factory(engine: str):
+    """Mesma configuração dos scripts retrieval_google/retrieval_ddgo (com TitleRefiner)."""
+    from embedder import HuggingFaceEmbedder
+    from search_engines import DuckDuckGoSearchEngine, GoogleSearchEngine, TitleRefiner
+
+    title_refiner = TitleRefiner(
+        embedder=HuggingFaceEmbedder(model_name="sentence-transformers/all-MiniLM-L6-v2"),
+        similarity_threshold=0.85
+    )
+    if engine == "google":
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            print("[ERRO] GOOGLE_API_KEY não encontrada no .env")
+            sys.exit(1)
+        search_engine = GoogleSearchEngine(api_key=api_key, title_refiner=title_refiner)
+        return lambda: search_engine
+    return lambda: DuckDuckGoSearchEngine(title_refiner)
+
+
+class Heartbeat(threading.Thread):
+    """Renova o lease a cada lease_seconds/3; seta `lost` se o shard foi para outro worker."""
+
+    def __init__(self, conn, engine, start_id, worker, lease_seconds, progress):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.args = (engine, start_id, worker, lease_seconds)
+        self.progress = progress
+        self.lost = threading.Event()
+        self._done = threading.Event()
+
+    def run(self):
+        interval = max(1.0, self.args[3] / 3)
+        while not self._done.wait(interval):
+            try:
+                if not renew_lease(self.conn, *self.args, processed=self.progress[0]):
+                    self.lost.set()
+                    return
+            except Exception as e:
+                self.conn.rollback()
+                print(f"[AVISO] Falha no heartbeat do shard {self.args[1]}: {e}")
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def process_shard(args, engine_factory, conn, ctl_conn, worker, shard):
+    from dataset import load_shuffled
+
+    start_id, end_id, attempt = shard
+    table = f"retrieved_news_{args.engine}"
+    df = load_shuffled(DATA_DIR, columns=('shuffle_id', 'title'), start_id=start_id, end_id=end_id)
+    done_ids = done_shuffle_ids(conn, args.engine, start_id, end_id, args.max_attempts)
+    df = df[~df['shuffle_id'].isin(done_ids)]
+    print(f"[INFO] Shard {start_id}-{end_id} (tentativa {attempt}): {len(df)} títulos "
+          f"({len(done_ids)} já concluídos)")
+
+    progress = [0]
+    heartbeat = Heartbeat(ctl_conn, args.engine, start_id, worker, args.lease_seconds, progress)
+
+    def done():
+        progress[0] += 1
+
+    rate, burst = ENGINE_RATE_LIMITS[args.engine]
+    if args.rate is not None:
+        rate = args.rate
+
+    heartbeat.start()
+    error = None
+    inserted, failed_titles = 0, []
+    t0 = time.perf_counter()
+    try:
+        inserted, failed_titles = run_retrieval(
+            items=zip(df['shuffle_id'].tolist(), df['title'].tolist()),
+            engine_factory=engine_factory,
+            conn=conn,
+            table=table,
+            num_results=10,
+            workers=args.workers,
+            rate=rate,
+            burst=burst,
+            progress_engine=args.engine,
+            insert_placeholder_on_empty=args.engine == "google",
+            fence=lambda cur: check_lease(cur, args.engine, start_id, worker),
+            stop=heartbeat.lost.is_set,
+            on_done=done,
+        )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        print(f"[ERRO] Shard {start_id}-{end_id}: {error}")
+    finally:
+        heartbeat.stop()
+
+    if heartbeat.lost.is_set():
+        print(f"[AVISO] Lease do shard {start_id}-{end_id} perdido; outro worker continua a faixa")
+        return
+    if finish_shard(ctl_conn, args.engine, start_id, worker, processed=progress[0], inserted=inserted,
+                    failed=len(failed_titles), error=error, max_attempts=args.max_attempts):
+        print(f"[OK] Shard {start_id}-{end_id}: {progress[0]} títulos, {inserted} linhas, "
+              f"{len(failed_titles)} falhas ({time.perf_counter() - t0:.0f}s)")
+    else:
+        print(f"[AVISO] Shard {start_id}-{end_id} não pôde ser fechado: lease perdido")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de retrieval por shards (fila no Postgres)")
+    parser.add_argument("--engine", choices=["google", "ddgo"], required=True)
+    parser.add_argument("--worker_id", default=None, help="Identificação do worker (padrão: host:pid)")
+    parser.add_argument("--workers", type=int, default=4, help="Buscas simultâneas neste processo")
+    parser.add_argument("--rate", type=float, default=None, help="Buscas por segundo neste processo")
+    parser.add_argument("--lease_seconds", type=int, default=300, help="Validade do lease sem heartbeat")
+    parser.add_argument("--max_attempts", type=int, default=3, help="Tentativas por shard / por shuffle_id")
+    parser.add_argument("--wait", type=float, default=0,
+                        help="Com a fila vazia, espera N segundos por shards novos (0 = encerra)")
+    parser.add_argument("--max_shards", type=int, default=None, help="Encerra após N shards")
+    args = parser.parse_args()
+
+    worker = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect()      # gravações dos resultados (thread do RetrievalWriter)
+    ctl_conn = connect()  # lease / heartbeat
+    ensure_progress_table(conn)
+    ensure_shard_table(ctl_conn)
+    engine_factory = make_engine_factory(args.engine)
+    print(f"[INFO] Worker {worker} pronto ({args.engine})")
+
+    shards = 0
+    try:
+        while args.max_shards is None or shards < args.max_shards:
+            shard = lease_shard(ctl_conn, args.engine, worker, args.lease_seconds, args.max_attempts)
+            if shard is None:
+                if not args.wait:
+                    break
+                time.sleep(args.wait)
+                continue
+            process_shard(args, engine_factory, conn, ctl_conn, worker, shard)
+            shards += 1
+    finally:
+        conn.close()
+        ctl_conn.close()
+    print(f"[RESUMO] Worker {worker}: {shards} shards processados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Popula o cache local de buscas (cache/search_results.sqlite) com as
+páginas já gravadas em retrieved_news_google / retrieved_news_ddgo, para
+que rodar os experimentos de novo (run_pipeline/serve com --search_cache
+ou --offline) não gaste cota nem rede.
+
+Exemplos:
+    python scripts/retrieval_scripts/seed_search_cache.py --engines google ddgo
+    python scripts/retrieval_scripts/seed_search_cache.py --engines google --stats
+"""
+import os
+import sys
+import time
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+sys.path.append(MODULES_DIR)
+from cache_store import SQLiteStore
+from search_cache import DEFAULT_CACHE_PATH, CachedSearchEngine, seed_from_postgres
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Popula o cache de buscas a partir do Postgres")
+    parser.add_argument("--engines", nargs="*", default=["google", "ddgo"],
+                        help="Tabelas retrieved_news_{engine} a copiar")
+    parser.add_argument("--num_results", type=int, default=10,
+                        help="num_results das buscas que geraram as tabelas (entra na chave)")
+    parser.add_argument("--cache_path", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--cache_empty", action="store_true",
+                        help="Também guarda páginas vazias (placeholders do google)")
+    parser.add_argument("--stats", action="store_true", help="Só mostra o tamanho do cache")
+    args = parser.parse_args()
+
+    store = SQLiteStore(args.cache_path, table="search_results")
+    if args.stats:
+        print(f"[INFO] Cache {args.cache_path}: {len(store)} entradas")
+        return
+
+    conn = psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT", 5432)),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD")
+    )
+    try:
+        for engine in args.engines:
+            cache = CachedSearchEngine(None, engine, offline=True, cache_empty=args.cache_empty, store=store)
+            table = f"retrieved_news_{engine}"
+            t0 = time.perf_counter()
+            try:
+                seeded = seed_from_postgres(conn, cache, table, num_results=args.num_results)
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"[ERRO] Falha ao ler {table}: {e}")
+                continue
+            print(f"[OK] {table}: {seeded} queries no cache ({time.perf_counter() - t0:.1f}s)")
+    finally:
+        conn.close()
+    print(f"[RESUMO] Cache {args.cache_path}: {len(store)} entradas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Atualiza o índice local de embeddings (cache/vector_index) com os títulos
+de retrieved_news_google / retrieved_news_ddgo que ainda não foram
+indexados. Rode depois de cada lote de retrieval; só os textos novos são
+codificados.
+
+Com --query, busca no índice os títulos mais parecidos com um texto
+(ex.: "claims parecidas já buscadas").
+
+Exemplos:
+    python scripts/retrieval_scripts/sync_title_index.py --engines google ddgo
+    python scripts/retrieval_scripts/sync_title_index.py --engines ddgo --start_id 2000 --end_id 5000
+    python scripts/retrieval_scripts/sync_title_index.py --query "Pope Francis endorses Donald Trump" --k 5
+"""
+import os
+import sys
+import time
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+sys.path.append(MODULES_DIR)
+from vector_index import VectorIndex, sync_table
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza o índice local de títulos")
+    parser.add_argument("--engines", nargs="*", default=["google", "ddgo"],
+                        help="Tabelas retrieved_news_{engine} a indexar (vazio = só consulta)")
+    parser.add_argument("--start_id", type=int, default=None)
+    parser.add_argument("--end_id", type=int, default=None)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--query", nargs="*", default=None, help="Textos a buscar no índice")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    from embedder import HuggingFaceEmbedder
+
+    embedder = HuggingFaceEmbedder(model_name=args.model)
+    # um índice por modelo: vetores de modelos diferentes não são comparáveis
+    index = VectorIndex(name=args.model.replace("/", "__"))
+    print(f"[INFO] Índice {index.name}: {len(index)} textos")
+
+    if args.engines:
+        conn = psycopg2.connect(
+            host=os.getenv("POSTGRES_HOST"),
+            port=int(os.getenv("POSTGRES_PORT", 5432)),
+            dbname=os.getenv("POSTGRES_DB"),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD")
+        )
+        try:
+            for engine in args.engines:
+                table = f"retrieved_news_{engine}"
+                t0 = time.perf_counter()
+                added = sync_table(index, conn, table, embedder,
+                                   start_id=args.start_id, end_id=args.end_id)
+                print(f"[OK] {table}: {added} textos novos ({time.perf_counter() - t0:.1f}s) | "
+                      f"total no índice: {len(index)}")
+        finally:
+            conn.close()
+
+    for text, matches in zip(args.query or [], index.search_texts(args.query or [], embedder, k=args.k)):
+        print(f"\n>>> {text}")
+        for match, score in matches:
+            print(f"  {score:.3f}  {match}")
+
+
+if __name__ == "__main__":
+    main()
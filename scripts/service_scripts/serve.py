@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Serviço HTTP de classificação com o modelo sempre carregado
+(modules/classify_service.py): o embedder, os domínios confiáveis, os
+mecanismos de busca e a sessão da LLM são carregados uma vez na subida.
+
+Endpoints:
+    POST /classify        {"headline": "...", "mode": "test1"}
+    POST /classify/batch  {"headlines": ["...", "..."]}
+    GET  /metrics         p50/p99 por endpoint e por etapa, micro-batches do embedder, caches
+    GET  /health
+
+Exemplos:
+    python scripts/service_scripts/serve.py --engine google --port 8000
+    python scripts/service_scripts/serve.py --engine ddgo --local --llm_model gemma3:12b --claim_cache
+    python scripts/service_scripts/serve.py --engine federated --budget 2 --target 5
+    curl -s localhost:8000/classify -H 'Content-Type: application/json' \\
+         -d '{"headline": "Pope Francis endorses Donald Trump"}'
+"""
+import os
+import sys
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES_DIR = os.path.join(BASE_DIR, '..', '..', 'modules')
+DEFAULT_DOMAINS_FILE = os.path.join(BASE_DIR, '..', '..', 'out', 'credible_sources.txt')
+sys.path.append(MODULES_DIR)
+from classify_service import ClassifyService, create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP do detector de fake news")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--engine", choices=["google", "ddgo", "federated"], default="google",
+                        help="federated = google + ddgo em paralelo, resultados juntos e sem duplicatas")
+    parser.add_argument("--budget", type=float, default=3.0, help="(federated) Segundos por mecanismo")
+    parser.add_argument("--target", type=int, default=5,
+                        help="(federated) Encerra a busca com N resultados confiáveis e parecidos")
+    parser.add_argument("--search_cache", action="store_true",
+                        help="Reaproveita buscas já feitas (cache/search_results.sqlite)")
+    parser.add_argument("--cache_ttl_days", type=float, default=7, help="Validade do cache de buscas (0 = sem)")
+    parser.add_argument("--test", default="test1", help="Modo padrão do prompt_builder")
+    parser.add_argument("--num_results", type=int, default=10)
+    parser.add_argument("--top_x", type=int, default=10)
+    parser.add_argument("--refine", action="store_true", help="Completa títulos truncados (TitleRefiner)")
+    parser.add_argument("--claim_cache", action="store_true", help="Reaproveita veredictos de manchetes parecidas")
+    parser.add_argument("--credible_file", default=DEFAULT_DOMAINS_FILE)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2", help="Embedder")
+    parser.add_argument("--backend", choices=["torch", "onnx", "onnx-int8"], default="torch",
+                        help="Backend do embedder (onnx/onnx-int8 = ONNX Runtime em CPU)")
+    parser.add_argument("--llm_model", default="llama-3.1-8b-instant")
+    parser.add_argument("--local", action="store_true", help="Usa a LLM local (Ollama) em vez da Groq")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requisições simultâneas à LLM")
+    parser.add_argument("--retrieve_workers", type=int, default=8, help="Buscas simultâneas")
+    parser.add_argument("--max_batch", type=int, default=256, help="Textos por micro-batch do embedder")
+    parser.add_argument("--max_wait_ms", type=float, default=5.0, help="Espera máxima para formar o micro-batch")
+    args = parser.parse_args()
+
+    import uvicorn
+    from embedder import BatchingEmbedder, load_embedder
+    from llm_base import LLM, LOCAL_LLM
+    from search_engines import DuckDuckGoSearchEngine, FederatedSearchEngine, GoogleSearchEngine
+
+    # um único BatchingEmbedder para o serviço, o refiner, o claim cache e a
+    # busca federada: encodes de requisições simultâneas viram uma chamada ao modelo
+    embedder = BatchingEmbedder(load_embedder(args.model, args.backend),
+                                max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+    api_key = os.getenv("GOOGLE_API_KEY")
+    builders = {
+        "google": lambda: GoogleSearchEngine(api_key=api_key),
+        "ddgo": lambda: DuckDuckGoSearchEngine(),
+    }
+    if args.search_cache:
+        from cache_store import SQLiteStore
+        from search_cache import DEFAULT_CACHE_PATH, CachedSearchEngine
+
+        store = SQLiteStore(DEFAULT_CACHE_PATH, table="search_results")
+        ttl = args.cache_ttl_days * 24 * 3600 if args.cache_ttl_days else None
+        builders = {
+            name: (lambda name=name, build=build: CachedSearchEngine(build(), name, ttl_seconds=ttl, store=store))
+            for name, build in builders.items()
+        }
+    if args.engine == "federated":
+        engine_factory = lambda: FederatedSearchEngine(
+            {name: build() for name, build in builders.items()},
+            embedder=embedder, credible_domains_file=args.credible_file,
+            target=args.target, budget=args.budget,
+        )
+    else:
+        engine_factory = builders[args.engine]
+
+    if args.local:
+        llm = LOCAL_LLM(model=args.llm_model, max_concurrency=args.concurrency)
+    else:
+        llm = LLM(
+            model=args.llm_model,
+            api_key_env="GROQ_API_KEY",
+            endpoint="https://api.groq.com/openai/v1/chat/completions",
+            max_concurrency=args.concurrency,
+        )
+
+    title_refiner = None
+    if args.refine:
+        from search_engines import TitleRefiner
+        title_refiner = TitleRefiner(embedder=embedder, similarity_threshold=0.85)
+    claim_cache = None
+    if args.claim_cache:
+        from claim_cache import ClaimCache
+        claim_cache = ClaimCache(embedder)
+
+    service = ClassifyService(
+        engine_factory, embedder, llm, mode=args.test, title_refiner=title_refiner,
+        claim_cache=claim_cache, credible_domains_file=args.credible_file,
+        num_results=args.num_results, top_x=args.top_x, retrieve_workers=args.retrieve_workers,
+        max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+        engine_name=args.engine, llm_model=args.llm_model,
+    )
+    # um único processo: o modelo e os pools ficam na memória dele
+    uvicorn.run(create_app(service), host=args.host, port=args.port, workers=1)
+
+
+if __name__ == "__main__":
+    main()